@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+"""
+_DBSUploadEngine_
+
+Upload blocks to DBS through a set of worker threads that keep their
+DBS api (and its connection) for their whole life, with a concurrency
+limit that adapts to the DBS response and per-block retries.
+"""
+
+import collections
+import logging
+import random
+import threading
+import time
+import traceback
+import Queue
+
+# HTTP codes from the DBS frontend which are worth a retry
+TRANSIENT_HTTP_CODES = (408, 500, 502, 503, 504)
+
+
+def classifyUploadError(name, ex):
+    """
+    _classifyUploadError_
+
+    Classify an exception raised by insertBulkBlock for block name as
+      duplicate - the block already is in DBS
+      proxy - the frontend failed, the block may or may not be in DBS
+      transient - temporary DBS failure, the upload can be retried
+      error - anything else
+    The HTTP code of the exception is used when it has one.
+    """
+    exString = str(ex)
+    if 'Block %s already exists' % name in exString:
+        return 'duplicate'
+    code = getattr(ex, 'code', None)
+    if 'Proxy Error' in exString or code == 502:
+        return 'proxy'
+    if code in TRANSIENT_HTTP_CODES:
+        return 'transient'
+    return 'error'
+
+
+class DBSUploadEngine(object):
+    """
+    _DBSUploadEngine_
+
+    Blocks are queued with put() and the results are put in the results
+    queue as {'name', 'success', 'error'} dictionaries, 'success' being
+    uploaded, check or error.
+
+    At most maxConcurrency uploads run at the same time.  The limit is
+    increased by one after a limit's worth of good uploads and halved
+    after a proxy or transient error, or when an insert takes more than
+    latencyFactor times the base latency.  The base latency is the 10th
+    percentile of the per file latencies of the last latencyWindow
+    successful inserts, so it follows DBS when it gets slower for good.
+    """
+    def __init__(self, apiFactory, maxConcurrency = 4, maxRetries = 3,
+                 retryDelay = 1.0, latencyFactor = 2.0, latencyWindow = 100):
+        """
+        __init__
+
+        apiFactory is called once by each worker thread to get its DbsApi.
+        """
+        self.apiFactory = apiFactory
+        self.maxConcurrency = max(1, maxConcurrency)
+        self.maxRetries = maxRetries
+        self.retryDelay = retryDelay
+        self.latencyFactor = latencyFactor
+
+        self.workInput = Queue.Queue()
+        self.results = Queue.Queue()
+        self.workers = []
+
+        self.condition = threading.Condition()
+        self.limit = float(self.maxConcurrency)
+        self.active = 0
+        self.fileLatencies = collections.deque(maxlen = max(1, latencyWindow))
+
+        self.resetStats()
+        return
+
+    def start(self):
+        """
+        _start_
+
+        Start the worker threads if they are not running.
+        """
+        if self.workers:
+            return
+        for _ in range(self.maxConcurrency):
+            worker = threading.Thread(target = self.uploadWorker)
+            worker.setDaemon(True)
+            worker.start()
+            self.workers.append(worker)
+        return
+
+    def stop(self):
+        """
+        _stop_
+
+        Stop the worker threads once the queued blocks are uploaded.
+        """
+        for _ in self.workers:
+            self.workInput.put('STOP')
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+        return
+
+    def put(self, name, block):
+        """
+        _put_
+
+        Queue the encoded block name for upload.
+        """
+        self.workInput.put({'name': name, 'block': block, 'queued': time.time()})
+        return
+
+    def resetStats(self):
+        """
+        _resetStats_
+
+        Start a new period for the upload metrics.
+        """
+        with self.condition:
+            self.statsStart = time.time()
+            self.latencies = []
+            self.publicationLags = []
+            self.counts = {'uploaded': 0, 'check': 0, 'error': 0, 'retries': 0}
+        return
+
+    def stats(self):
+        """
+        _stats_
+
+        Return the upload metrics since the last resetStats call.
+        """
+        with self.condition:
+            latencies = sorted(self.latencies)
+            lags = sorted(self.publicationLags)
+            result = dict(self.counts)
+            result['concurrency'] = int(self.limit)
+        elapsed = time.time() - self.statsStart
+        result['throughput'] = result['uploaded'] / elapsed if elapsed > 0 else 0.0
+        result['latencyMean'] = sum(latencies) / len(latencies) if latencies else 0.0
+        result['latencyP95'] = latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0
+        result['latencyMax'] = latencies[-1] if latencies else 0.0
+        result['lagMax'] = lags[-1] if lags else 0.0
+        return result
+
+    def acquire(self):
+        """
+        _acquire_
+
+        Wait until an upload can start under the concurrency limit.
+        """
+        with self.condition:
+            while self.active >= int(self.limit):
+                self.condition.wait()
+            self.active += 1
+        return
+
+    def baseLatency(self):
+        """
+        _baseLatency_
+
+        Per file latency of the fast successful inserts of the window, to be
+        called with the condition held.
+        """
+        if not self.fileLatencies:
+            return None
+        return sorted(self.fileLatencies)[len(self.fileLatencies) // 10]
+
+    def release(self, latency = None, backoff = False, nFiles = 1):
+        """
+        _release_
+
+        Finish an upload and adapt the concurrency limit to its outcome.
+        latency is only given for successful inserts of nFiles files.
+        """
+        with self.condition:
+            self.active -= 1
+            if latency is not None:
+                self.latencies.append(latency)
+                fileLatency = latency / max(1, nFiles)
+                baseLatency = self.baseLatency()
+                if baseLatency is not None and fileLatency > self.latencyFactor * baseLatency:
+                    backoff = True
+                self.fileLatencies.append(fileLatency)
+            if backoff:
+                self.limit = max(1.0, self.limit / 2)
+            elif latency is not None:
+                self.limit = min(float(self.maxConcurrency), self.limit + 1.0 / int(self.limit))
+            self.condition.notifyAll()
+        return
+
+    def upload(self, dbsApi, name, block):
+        """
+        _upload_
+
+        Upload a block, retrying the transient failures with a jittered
+        exponential backoff.  Return the result dictionary.
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            startTime = time.time()
+            try:
+                dbsApi.insertBulkBlock(blockDump = block)
+            except Exception as ex:
+                kind = classifyUploadError(name, ex)
+                if kind == 'duplicate':
+                    # nothing was inserted, the latency says nothing about DBS
+                    self.release()
+                    logging.error("Had duplicate entry for block %s. Ignoring for now.", name)
+                    logging.debug("Exception: %s", str(ex))
+                    return {'name': name, 'success': "uploaded"}
+                if kind == 'error':
+                    self.release()
+                    msg = "Error trying to process block %s through DBS.\n" % name
+                    msg += str(ex)
+                    logging.error(msg)
+                    logging.error(str(traceback.format_exc()))
+                    logging.debug("block: %s \n", block)
+                    return {'name': name, 'success': "error", 'error': msg}
+
+                self.release(backoff = True)
+                if attempt >= self.maxRetries:
+                    if kind == 'proxy':
+                        # This is probably a successful insertion that went bad.
+                        # Put it on the check list
+                        logging.error("Got a proxy error for block (%s).", name)
+                        logging.error(str(traceback.format_exc()))
+                        return {'name': name, 'success': "check"}
+                    msg = "Error trying to process block %s through DBS after %d retries.\n" % (name, attempt)
+                    msg += str(ex)
+                    logging.error(msg)
+                    return {'name': name, 'success': "error", 'error': msg}
+
+                delay = random.uniform(0, self.retryDelay * 2 ** attempt)
+                attempt += 1
+                with self.condition:
+                    self.counts['retries'] += 1
+                logging.warning("Retrying block %s in %.1f secs after a %s error: %s", name, delay, kind, str(ex))
+                time.sleep(delay)
+            else:
+                self.release(time.time() - startTime, nFiles = len(block.get('files', [])))
+                return {'name': name, 'success': "uploaded"}
+
+    def uploadWorker(self):
+        """
+        _uploadWorker_
+
+        Upload the queued blocks until told to stop.
+        """
+        dbsApi = None
+        while True:
+            work = self.workInput.get()
+            if work == 'STOP':
+                break
+
+            name = work.get('name', None)
+            block = work.get('block', None)
+            try:
+                if dbsApi is None:
+                    dbsApi = self.apiFactory()
+                logging.debug("About to call insert block with block: %s", block)
+                result = self.upload(dbsApi, name, block)
+            except Exception as ex:
+                msg = "Error trying to process block %s through DBS.\n" % name
+                msg += str(ex)
+                logging.error(msg)
+                result = {'name': name, 'success': "error", 'error': msg}
+
+            with self.condition:
+                self.counts[result['success']] += 1
+                if result['success'] == "uploaded":
+                    self.publicationLags.append(time.time() - work['queued'])
+            self.results.put(result)
+        return
@@ -30,7 +30,6 @@ import threading
 import logging
 import Queue
 import traceback
-import multiprocessing
 
 from WMCore.DAOFactory import DAOFactory
 
@@ -41,6 +40,7 @@ from WMCore.Algorithms.MiscAlgos           import sortListByKey
 
 from WMComponent.DBS3Buffer.DBSBufferUtil  import DBSBufferUtil
 from WMComponent.DBS3Buffer.DBSBufferBlock import DBSBufferBlock
+from WMComponent.DBS3Buffer.DBSUploadEngine import DBSUploadEngine
 
 from dbs.apis.dbsClient import DbsApi
 
@@ -80,67 +80,6 @@ def createDictionaryFromConfig(configSection):
     return final
 
 
-def uploadWorker(workInput, results, dbsUrl):
-    """
-    _uploadWorker_
-
-    Put JSONized blocks in the workInput
-    Get confirmation in the output
-    """
-
-    # Init DBS Stuff
-    logging.debug("Creating dbsAPI with address %s", dbsUrl)
-    dbsApi = DbsApi(url = dbsUrl)
-
-
-    while True:
-
-        try:
-            work = workInput.get()
-        except (EOFError, IOError):
-            crashMessage = "Hit EOF/IO in getting new work\n"
-            crashMessage += "Assuming this is a graceful break attempt.\n"
-            logging.error(crashMessage)
-            break
-
-        if work == 'STOP':
-            # Then halt the process
-            break
-
-        name  = work.get('name', None)
-        block = work.get('block', None)
-
-        # Do stuff with DBS
-        try:
-            logging.debug("About to call insert block with block: %s", block)
-            dbsApi.insertBulkBlock(blockDump = block)
-            results.put({'name': name, 'success': "uploaded"})
-        except Exception as ex:
-            exString = str(ex)
-            if 'Block %s already exists' % name in exString:
-                # Then this is probably a duplicate
-                # Ignore this for now
-                logging.error("Had duplicate entry for block %s. Ignoring for now.", name)
-                logging.debug("Exception: %s", exString)
-                logging.debug("Traceback: %s", str(traceback.format_exc()))
-                results.put({'name': name, 'success': "uploaded"})
-            elif 'Proxy Error' in exString:
-                # This is probably a successfully inserton that went bad.
-                # Put it on the check list
-                msg = "Got a proxy error for block (%s)." % name
-                logging.error(msg)
-                logging.error(str(traceback.format_exc()))
-                results.put({'name': name, 'success': "check"})
-            else:
-                msg =  "Error trying to process block %s through DBS.\n" % name
-                msg += exString
-                logging.error(msg)
-                logging.error(str(traceback.format_exc()))
-                logging.debug("block: %s \n", block)
-                results.put({'name': name, 'success': "error", 'error': msg})
-
-    return
-
 class DBSUploadException(WMException):
     """
     Holds the exception info for
@@ -174,11 +113,12 @@ class DBSUploadPoller(BaseWorkerThread):
                                      logger = myThread.logger,
                                      dbinterface = myThread.dbi)
 
-        self.pool   = []
+        self.engine = None
         self.blocksToCheck = []
-        self.workInput  = None
         self.workResult = None
         self.nProc  = getattr(self.config.DBS3Upload, 'nProcesses', 4)
+        self.nRetries   = getattr(self.config.DBS3Upload, 'dbsNRetries', 3)
+        self.retryDelay = getattr(self.config.DBS3Upload, 'dbsRetryDelay', 1.0)
         self.wait   = getattr(self.config.DBS3Upload, 'dbsWaitTime', 2)
         self.nTries = getattr(self.config.DBS3Upload, 'dbsNTries', 300)
         self.physicsGroup   = getattr(self.config.DBS3Upload, "physicsGroup", "NoGroup")
@@ -190,7 +130,7 @@ class DBSUploadPoller(BaseWorkerThread):
         # List of blocks currently in processing
         self.queuedBlocks = []
 
-        # Set up the pool of worker processes
+        # Set up the upload engine
         self.setupPool()
 
         # Setting up any cache objects
@@ -210,26 +150,31 @@ class DBSUploadPoller(BaseWorkerThread):
         """
         _setupPool_
 
-        Set up the processing pool for work
+        Set up the upload engine, its worker threads keep their DbsApi
+        from one polling cycle to the next.
         """
-        if len(self.pool) > 0:
+        if self.engine is not None:
             # Then something already exists.  Continue
             return
 
-        self.workInput  = multiprocessing.Queue()
-        self.workResult = multiprocessing.Queue()
-
-        # Starting up the pool:
-        for _ in range(self.nProc):
-            p = multiprocessing.Process(target = uploadWorker,
-                                        args = (self.workInput,
-                                                self.workResult,
-                                                self.dbsUrl))
-            p.start()
-            self.pool.append(p)
+        self.engine = DBSUploadEngine(apiFactory = self.makeDbsApi,
+                                      maxConcurrency = self.nProc,
+                                      maxRetries = self.nRetries,
+                                      retryDelay = self.retryDelay)
+        self.workResult = self.engine.results
+        self.engine.start()
 
         return
 
+    def makeDbsApi(self):
+        """
+        _makeDbsApi_
+
+        Create a DbsApi for an upload worker.
+        """
+        logging.debug("Creating dbsAPI with address %s", self.dbsUrl)
+        return DbsApi(url = self.dbsUrl)
+
     def __del__(self):
         """
         __del__
@@ -243,33 +188,11 @@ class DBSUploadPoller(BaseWorkerThread):
         """
         _close_
 
-        Kill all connections and terminate
+        Stop the upload engine
         """
-        terminate = False
-        for _ in self.pool:
-            try:
-                self.workInput.put('STOP')
-            except Exception as ex:
-                # Something very strange happens here
-                # It's like it raises a blank exception
-                # Upon being told to return
-                msg =  "Hit some exception in deletion\n"
-                msg += str(ex)
-                logging.debug(msg)
-                terminate = True
-        try:
-            self.workInput.close()
-            self.workResult.close()
-        except Exception:
-            # What are you going to do?
-            pass
-        for proc in self.pool:
-            if terminate:
-                proc.terminate()
-            else:
-                proc.join()
-        self.pool = []
-        self.workInput = None
+        if self.engine is not None:
+            self.engine.stop()
+        self.engine = None
         self.workResult = None
         return
 
@@ -282,6 +205,7 @@ class DBSUploadPoller(BaseWorkerThread):
         """
         logging.debug("terminating. doing one more pass before we die")
         self.algorithm(params)
+        self.close()
 
 
     def algorithm(self, parameters = None):
@@ -557,8 +481,8 @@ class DBSUploadPoller(BaseWorkerThread):
                 # New block that needs to be added to DBSBuffer.
                 createInDBSBuffer.append(block)
 
-        # Build the pool if it was closed
-        if len(self.pool) == 0:
+        # Build the upload engine if it was closed
+        if self.engine is None:
             self.setupPool()
 
         # First handle new and updated blocks
@@ -632,7 +556,7 @@ class DBSUploadPoller(BaseWorkerThread):
             
             encodedBlock = block.convertToDBSBlock()
             logging.info("About to insert block %s", block.getName())
-            self.workInput.put({'name': block.getName(), 'block': encodedBlock})
+            self.engine.put(block.getName(), encodedBlock)
             self.blockCount += 1
             if self.produceCopy:
                 import json
@@ -704,7 +628,7 @@ class DBSUploadPoller(BaseWorkerThread):
                 block = result["name"]
                 self.blocksToCheck.append(block)
             else:
-                logging.error("Error found in multiprocess during process of block %s", result.get('name'))
+                logging.error("Error found in the upload of block %s", result.get('name'))
                 logging.error(result['error'])
                 # Continue to the next block
                 # Block will remain in pending status until it is transferred
@@ -749,9 +673,15 @@ class DBSUploadPoller(BaseWorkerThread):
             name = block.getName()
             del self.blockCache[name]
 
-        # Clean up the pool so we don't have stuff waiting around
-        if len(self.pool) > 0:
-            self.close()
+        if self.engine is not None:
+            stats = self.engine.stats()
+            logging.info("Uploaded %d blocks (%d to check, %d failed, %d retries) at %.2f blocks/sec, "
+                         "latency mean %.2f p95 %.2f max %.2f secs, max publication lag %.2f secs, "
+                         "concurrency %d", stats['uploaded'], stats['check'], stats['error'],
+                         stats['retries'], stats['throughput'], stats['latencyMean'],
+                         stats['latencyP95'], stats['latencyMax'], stats['lagMax'],
+                         stats['concurrency'])
+            self.engine.resetStats()
 
         # And we're done
         return
@@ -25,6 +25,7 @@ from WMCore.WMException          import WMException
 from WMCore.DataStructs.Run import Run
 from WMCore.WMBS.File       import File
 from WMCore.WMBS.Job        import Job
+from WMCore.WMBS.ParentageResolver import ParentageResolver
 
 from WMCore.JobStateMachine.ChangeState import ChangeState
 from WMComponent.DBS3Buffer.DBSBufferFile import DBSBufferFile
@@ -78,6 +79,7 @@ class AccountantWorker(WMConnectionBase):
         self.getFullJobInfo          = self.daofactory(classname = "Jobs.LoadForErrorHandler")
         self.getJobTaskNameAction    = self.daofactory(classname = "Jobs.GetFWJRTaskName")
         self.pnn_to_psn              = self.daofactory(classname = "Locations.GetPNNtoPSNMapping").execute()
+        self.parentageResolver       = ParentageResolver(self.getParentInfoAction)
         
         self.dbsStatusAction       = self.dbsDaoFactory(classname = "DBSBufferFiles.SetStatus")
         self.dbsParentStatusAction = self.dbsDaoFactory(classname = "DBSBufferFiles.GetParentStatus")
@@ -154,6 +156,7 @@ class AccountantWorker(WMConnectionBase):
         self.parentageBinds    = []
         self.parentageBindsForMerge = []
         self.jobsWithSkippedFiles = {}
+        self.parentageResolver.clear()
         gc.collect()
         return
 
@@ -222,23 +225,38 @@ class AccountantWorker(WMConnectionBase):
 
         return
 
-    def __call__(self, parameters):
+    def loadJobReports(self, parameters):
+        """
+        _loadJobReports_
+
+        Load the framework job reports of a list of completed jobs and set
+        their job ID, return them in the same order. It doesn't use the
+        database, so the JobAccountantPoller can run it in another thread.
+        """
+        jobReports = []
+        for job in parameters:
+            fwkJobReport = self.loadJobReport(job)
+            fwkJobReport.setJobID(job['id'])
+            jobReports.append(fwkJobReport)
+        return jobReports
+
+    def __call__(self, parameters, jobReports = None):
         """
         __call__
 
         Handle a completed job.  The parameters dictionary will contain the job
-        ID and the path to the framework job report.
+        ID and the path to the framework job report.  The job reports are
+        loaded here unless they were already loaded with loadJobReports.
         """
         returnList = []
         self.reset()
 
-        for job in parameters:
+        if jobReports is None:
+            jobReports = self.loadJobReports(parameters)
+
+        for job, fwkJobReport in zip(parameters, jobReports):
             logging.info("Handling %s" % job["fwjr_path"])
 
-            # Load the job and set the ID
-            fwkJobReport = self.loadJobReport(job)
-            fwkJobReport.setJobID(job['id'])
-            
             jobSuccess = self.handleJob(jobID = job["id"],
                                         fwkJobReport = fwkJobReport)
 
@@ -385,37 +403,10 @@ class AccountantWorker(WMConnectionBase):
         _findDBSParents_
 
         Find the parent of the file in DBS
-        This is meant to be called recursively
-        """
-        parentsInfo = self.getParentInfoAction.execute([lfn],
-                                                       conn = self.getDBConn(),
-                                                       transaction = self.existingTransaction())
-        newParents = set()
-        for parentInfo in parentsInfo:
-            # This will catch straight to merge files that do not have redneck
-            # parents.  We will mark the straight to merge file from the job
-            # as a child of the merged parent.
-            if int(parentInfo["merged"]) == 1:
-                newParents.add(parentInfo["lfn"])
-
-            elif parentInfo['gpmerged'] == None:
-                continue
-
-            # Handle the files that result from merge jobs that aren't redneck
-            # children.  We have to setup parentage and then check on whether or
-            # not this file has any redneck children and update their parentage
-            # information.
-            elif int(parentInfo["gpmerged"]) == 1:
-                newParents.add(parentInfo["gplfn"])
-
-            # If that didn't work, we've reached the great-grandparents
-            # And we have to work via recursion
-            else:
-                parentSet = self.findDBSParents(lfn = parentInfo['gplfn'])
-                for parent in parentSet:
-                    newParents.add(parent)
-
-        return newParents
+        """
+        return self.parentageResolver.findParents([lfn],
+                                                  conn = self.getDBConn(),
+                                                  transaction = self.existingTransaction())[lfn]
 
     def addFileToWMBS(self, jobType, fwjrFile, jobMask, task, jobID = None):
         """
@@ -906,9 +897,11 @@ class AccountantWorker(WMConnectionBase):
         """
         outputLFNs = [f['lfn'] for f in self.mergedOutputFiles]
         bindList         = []
+        parentsByLFN = self.parentageResolver.findParents(outputLFNs,
+                                                          conn = self.getDBConn(),
+                                                          transaction = self.existingTransaction())
         for lfn in outputLFNs:
-            newParents = self.findDBSParents(lfn = lfn)
-            for parentLFN in newParents:
+            for parentLFN in parentsByLFN[lfn]:
                 bindList.append({'child': lfn, 'parent': parentLFN})
 
         # Now all the parents should exist
@@ -8,6 +8,7 @@ Poll WMBS for complete jobs and process their framework job reports.
 import time
 import threading
 import logging
+import Queue
 
 from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
 from WMCore.Agent.Harness import Harness
@@ -24,11 +25,77 @@ class JobAccountantPollerException(WMException):
     from the worker).
     """
 
+class JobReportLoader(threading.Thread):
+    """
+    _JobReportLoader_
+
+    Load the job reports of the slices of completed jobs in the background,
+    while the previous slices are being accounted.  At most depth loaded
+    slices wait for the accounting.
+    """
+    def __init__(self, worker, slices, depth):
+        threading.Thread.__init__(self, name = "JobReportLoader")
+        self.setDaemon(True)
+        self.worker = worker
+        self.slices = slices
+        self.loaded = Queue.Queue(depth)
+        self.stopped = threading.Event()
+        return
+
+    def run(self):
+        """
+        _run_
+
+        Load the slices in order, stop at the first error or when stopped.
+        """
+        for jobsSlice in self.slices:
+            startTime = time.time()
+            try:
+                result = (self.worker.loadJobReports(jobsSlice), time.time() - startTime, None)
+            except Exception as ex:
+                logging.exception("Failed to load job reports: %s" % str(ex))
+                result = (None, time.time() - startTime, ex)
+
+            while not self.stopped.isSet():
+                try:
+                    self.loaded.put(result, timeout = 1)
+                    break
+                except Queue.Full:
+                    continue
+            if self.stopped.isSet() or result[2] is not None:
+                return
+        return
+
+    def getReports(self):
+        """
+        _getReports_
+
+        Wait for the job reports of the next slice, return them with the time
+        it took to load them.  Raise the error hit while loading them if any.
+        """
+        jobReports, loadTime, error = self.loaded.get()
+        if error is not None:
+            raise error
+        return jobReports, loadTime
+
+    def stop(self):
+        """
+        _stop_
+
+        Stop loading and wait for the thread to finish.
+        """
+        self.stopped.set()
+        self.join()
+        return
+
 class JobAccountantPoller(BaseWorkerThread):
     def __init__(self, config):
         BaseWorkerThread.__init__(self)
         self.config = config
         self.accountantWorkSize = getattr(self.config.JobAccountant, 'accountantWorkSize', 100)
+        # number of slices of job reports loaded ahead of the accounting, 0
+        # loads them in the accounting thread
+        self.pipelineDepth = getattr(self.config.JobAccountant, 'accountantPipelineDepth', 1)
         # initialize the alert framework (if available - config.Alert present)
         #    self.sendAlert will be then be available
         self.initAlerts(compName = "JobAccountant")
@@ -66,25 +133,54 @@ class JobAccountantPoller(BaseWorkerThread):
             logging.debug("No work to do; exiting")
             return
 
-        while len(completeJobs) > 0:
-            try:
-                jobsSlice = completeJobs[:self.accountantWorkSize]
-                completeJobs = completeJobs[self.accountantWorkSize:]
-                self.accountantWorker(jobsSlice)
-                logging.info("Remaining completed jobs to process: %d" % len(completeJobs))
-            except WMException:
-                myThread = threading.currentThread()
-                if getattr(myThread, 'transaction', None) != None:
-                    myThread.transaction.rollback()
-                raise
-            except Exception as ex:
-                myThread = threading.currentThread()
-                if getattr(myThread, 'transaction', None) != None:
-                    myThread.transaction.rollback()
-                msg =  "Hit general exception in JobAccountantPoller while using worker.\n"
-                msg += str(ex)
-                logging.error(msg)
-                self.sendAlert(6, msg = msg)
-                raise JobAccountantPollerException(msg)
+        slices = [completeJobs[i:i + self.accountantWorkSize]
+                  for i in xrange(0, len(completeJobs), self.accountantWorkSize)]
+        remainingJobs = len(completeJobs)
+
+        loader = None
+        if self.pipelineDepth > 0 and len(slices) > 1:
+            loader = JobReportLoader(self.accountantWorker, slices, self.pipelineDepth)
+            loader.start()
+
+        loadTotal = waitTotal = accountTotal = 0.0
+        try:
+            for jobsSlice in slices:
+                startTime = time.time()
+                if loader:
+                    jobReports, loadTime = loader.getReports()
+                else:
+                    jobReports = self.accountantWorker.loadJobReports(jobsSlice)
+                    loadTime = time.time() - startTime
+                waitTime = time.time() - startTime
+
+                self.accountantWorker(jobsSlice, jobReports)
+                accountTime = time.time() - startTime - waitTime
+
+                loadTotal += loadTime
+                waitTotal += waitTime
+                accountTotal += accountTime
+                remainingJobs -= len(jobsSlice)
+                logging.info("Accounted %d jobs: %.2f secs loading reports, %.2f secs waiting for them, "
+                             "%.2f secs accounting" % (len(jobsSlice), loadTime, waitTime, accountTime))
+                logging.info("Remaining completed jobs to process: %d" % remainingJobs)
+        except WMException:
+            myThread = threading.currentThread()
+            if getattr(myThread, 'transaction', None) != None:
+                myThread.transaction.rollback()
+            raise
+        except Exception as ex:
+            myThread = threading.currentThread()
+            if getattr(myThread, 'transaction', None) != None:
+                myThread.transaction.rollback()
+            msg =  "Hit general exception in JobAccountantPoller while using worker.\n"
+            msg += str(ex)
+            logging.error(msg)
+            self.sendAlert(6, msg = msg)
+            raise JobAccountantPollerException(msg)
+        finally:
+            if loader:
+                loader.stop()
 
+        logging.info("Accounted %d jobs in %d slices: %.2f secs loading reports, %.2f secs waiting for them, "
+                     "%.2f secs accounting" % (len(completeJobs), len(slices), loadTotal, waitTotal, accountTotal))
         return
@@ -27,6 +27,7 @@ from WMCore.WMBS.Subscription               import Subscription
 from WMCore.WMBS.Workflow                   import Workflow
 from WMCore.WMSpec.WMWorkload               import WMWorkload, WMWorkloadHelper
 from WMCore.FwkJobReport.Report             import Report
+from WMCore.DataStructs.JobStore            import JobStore
 
 
 def retrieveWMSpec(workflow = None, wmWorkloadURL = None):
@@ -122,11 +123,13 @@ def capResourceEstimates(jobGroups, nCores, constraints):
 def saveJob(job, workflow, sandbox, wmTask = None, jobNumber = 0,
             owner = None, ownerDN = None, ownerGroup = '', ownerRole = '',
             scramArch = None, swVersion = None, agentNumber = 0, numberOfCores = 1,
-            inputDataset = None, inputDatasetLocations = None, allowOpportunistic=False):
+            inputDataset = None, inputDatasetLocations = None, allowOpportunistic=False,
+            jobStore = None):
     """
     _saveJob_
 
-    Actually do the mechanics of saving the job to a pickle file
+    Actually do the mechanics of saving the job to a pickle file, or
+    to the pack file of its job collection if a JobStore is given
     """
     if wmTask:
             # If we managed to load the task,
@@ -151,6 +154,10 @@ def saveJob(job, workflow, sandbox, wmTask = None, jobNumber = 0,
     job['inputDatasetLocations'] = inputDatasetLocations
     job['allowOpportunistic'] = allowOpportunistic
 
+    if jobStore is not None:
+        jobStore.addJob(job)
+        return
+
     output = open(os.path.join(cacheDir, 'job.pkl'), 'w')
     pickle.dump(job, output, pickle.HIGHEST_PROTOCOL)
     output.close()
@@ -184,6 +191,7 @@ def creatorProcess(work, jobCacheDir):
         inputDataset = work.get('inputDataset', None)
         inputDatasetLocations = work.get('inputDatasetLocations', None)
         allowOpportunistic = work.get('allowOpportunistic', False)
+        packJobs     = work.get('packJobs', False)
 
         if ownerDN == None:
             ownerDN = owner
@@ -209,6 +217,10 @@ def creatorProcess(work, jobCacheDir):
                                    wmWorkload = wmWorkload,
                                    cache = False)
 
+        jobStore = None
+        if packJobs:
+            jobStore = JobStore(usePack = True)
+
         for job in wmbsJobGroup.jobs:
             jobNumber += 1
             saveJob(job = job, workflow = workflow,
@@ -225,7 +237,11 @@ def creatorProcess(work, jobCacheDir):
                     numberOfCores = numberOfCores,
                     inputDataset = inputDataset,
                     inputDatasetLocations = inputDatasetLocations,
-                    allowOpportunistic = allowOpportunistic)
+                    allowOpportunistic = allowOpportunistic,
+                    jobStore = jobStore)
+
+        if jobStore is not None:
+            jobStore.flush()
 
     except Exception as ex:
         # Register as failure; move on
@@ -380,6 +396,8 @@ class JobCreatorPoller(BaseWorkerThread):
         self.limit          = getattr(config.JobCreator, 'fileLoadLimit', 500)
         self.agentNumber    = int(getattr(config.Agent, 'agentNumber', 0))
         self.glideinLimits  = getattr(config.JobCreator, 'GlideInRestriction', None)
+        # save the jobs of a job collection in one pack file instead of a job.pkl per job
+        self.packJobs       = getattr(config.JobCreator, 'packJobs', False)
 
         # initialize the alert framework (if available - config.Alert present)
         #    self.sendAlert will be then be available
@@ -618,6 +636,7 @@ class JobCreatorPoller(BaseWorkerThread):
                     tempDict['agentNumber'] = self.agentNumber
                     tempDict['inputDatasetLocations'] = wmbsJobGroup.getLocationsForJobs()
                     tempDict['allowOpportunistic'] = allowOpport
+                    tempDict['packJobs'] = self.packJobs
 
                     jobGroup = creatorProcess(work = tempDict,
                                               jobCacheDir = self.jobCacheDir)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+"""
+_JobAssigner_
+
+Site assignment engine used by the JobSubmitterPoller.
+
+The jobs are kept ordered by priority and age between polling cycles and the
+resource control thresholds are turned into free slot counters per site and
+per site/task type, so checking whether a site can take a job is O(1).
+"""
+
+import logging
+
+
+class JobAssigner(object):
+    """
+    _JobAssigner_
+
+    Keep the cached jobs in one list per priority, sorted by timestamp, and
+    hand out free slots from the latest thresholds to the highest priority
+    and oldest jobs first.
+
+    Each job is assigned to the first of its possible sites that still has
+    free pending and overall slots both for the site and for the job task
+    type, exactly as the JobSubmitterPoller always did. Within a cycle the
+    free slots only go down, so once all the sites of a job are full every
+    other job of the same group (same task type and set of sites) is skipped
+    without looking at its sites, and the scan stops when all the groups or
+    all the sites are full.
+    """
+    def __init__(self):
+        self.jobQueues = {}
+        self.unsorted = set()
+        self.removed = {}
+        self.groups = {}
+        self.groupJobs = {}
+
+        self.thresholds = {}
+        self.siteFree = {}
+        self.taskFree = {}
+        self.taskPriority = {}
+        self.openSites = 0
+        return
+
+    def reset(self):
+        """
+        _reset_
+
+        Forget about all the jobs, to be called when the job cache is rebuilt.
+        """
+        self.jobQueues = {}
+        self.unsorted = set()
+        self.removed = {}
+        self.groups = {}
+        self.groupJobs = {}
+        return
+
+    def addJob(self, jobPrio, job):
+        """
+        _addJob_
+
+        Queue a job from the JobSubmitterPoller cache. Only the timestamp,
+        id, type and possibleLocations of the job are used.
+        """
+        if job['id'] in self.removed.get(jobPrio, ()):
+            # the job was removed and comes back, drop the old entry first
+            self._dropRemoved(jobPrio)
+
+        sites = tuple(job['possibleLocations'])
+        groupKey = (job['type'], frozenset(sites))
+        group = self.groups.setdefault(groupKey, len(self.groups))
+        self.groupJobs[group] = self.groupJobs.get(group, 0) + 1
+
+        entry = (job['timestamp'], job['id'], job['type'], sites, group)
+        self.jobQueues.setdefault(jobPrio, []).append(entry)
+        self.unsorted.add(jobPrio)
+        return
+
+    def removeJob(self, jobPrio, jobID):
+        """
+        _removeJob_
+
+        Remove a job from the queues. The queues are only compacted on the
+        next call to assign(), so removing many jobs is cheap.
+        """
+        if jobPrio in self.jobQueues:
+            self.removed.setdefault(jobPrio, set()).add(jobID)
+        return
+
+    def numberOfJobs(self):
+        """
+        _numberOfJobs_
+
+        Number of queued jobs, including the ones removed since the last
+        assign() call.
+        """
+        return sum([len(x) for x in self.jobQueues.values()])
+
+    def _dropRemoved(self, jobPrio):
+        """
+        _dropRemoved_
+
+        Drop the jobs removed since the last compaction from a queue.
+        """
+        removed = self.removed.pop(jobPrio, set())
+        keep = []
+        for entry in self.jobQueues[jobPrio]:
+            if entry[1] in removed:
+                self.groupJobs[entry[4]] -= 1
+                if self.groupJobs[entry[4]] == 0:
+                    del self.groupJobs[entry[4]]
+            else:
+                keep.append(entry)
+        if keep:
+            self.jobQueues[jobPrio] = keep
+        else:
+            del self.jobQueues[jobPrio]
+            self.unsorted.discard(jobPrio)
+        return
+
+    def _compact(self):
+        """
+        _compact_
+
+        Drop the removed jobs from the queues and sort the queues in which
+        new jobs were added.
+        """
+        for jobPrio in self.removed.keys():
+            self._dropRemoved(jobPrio)
+
+        for jobPrio in self.unsorted:
+            # only the newly added jobs are out of order, timsort handles
+            # that in close to linear time
+            self.jobQueues[jobPrio].sort()
+        self.unsorted = set()
+        return
+
+    def setThresholds(self, rcThresholds):
+        """
+        _setThresholds_
+
+        Compute the free slots of every site and site/task type from the
+        thresholds returned by ResourceControl.listThresholdsForSubmit. The
+        pending job counters of rcThresholds are updated as jobs get assigned.
+        """
+        self.thresholds = rcThresholds
+        self.siteFree = {}
+        self.taskFree = {}
+        self.taskPriority = {}
+        self.openSites = 0
+
+        for siteName, siteInfo in rcThresholds.items():
+            try:
+                totalPendingSlots = siteInfo["total_pending_slots"]
+                totalPendingJobs = siteInfo["total_pending_jobs"]
+                totalRunningSlots = siteInfo["total_running_slots"]
+                totalRunningJobs = siteInfo["total_running_jobs"]
+            except KeyError as ex:
+                logging.error("Invalid thresholds for site %s: %s", siteName, str(ex))
+                continue
+
+            siteFree = min(totalPendingSlots - totalPendingJobs,
+                           totalPendingSlots + totalRunningSlots - totalPendingJobs - totalRunningJobs)
+            self.siteFree[siteName] = siteFree
+            if siteFree > 0:
+                self.openSites += 1
+
+            for jobType, taskInfo in siteInfo.get('thresholds', {}).items():
+                try:
+                    taskPendingSlots = taskInfo["pending_slots"]
+                    taskPendingJobs = taskInfo["task_pending_jobs"]
+                    taskRunningSlots = taskInfo["max_slots"]
+                    taskRunningJobs = taskInfo["task_running_jobs"]
+                    taskPriority = taskInfo["priority"]
+                except KeyError as ex:
+                    logging.error("Invalid key for site %s and job type %s\n%s", siteName, jobType, str(ex))
+                    continue
+
+                self.taskFree[(siteName, jobType)] = min(taskPendingSlots - taskPendingJobs,
+                                                         taskPendingSlots + taskRunningSlots -
+                                                         taskPendingJobs - taskRunningJobs)
+                self.taskPriority[(siteName, jobType)] = taskPriority
+        return
+
+    def _takeSlot(self, siteName, jobType):
+        """
+        _takeSlot_
+
+        Book a pending slot at a site for a job of the given type.
+        """
+        self.siteFree[siteName] -= 1
+        if self.siteFree[siteName] == 0:
+            self.openSites -= 1
+        self.taskFree[(siteName, jobType)] -= 1
+
+        self.thresholds[siteName]["total_pending_jobs"] += 1
+        self.thresholds[siteName]['thresholds'][jobType]["task_pending_jobs"] += 1
+        return
+
+    def assign(self, maxJobs):
+        """
+        _assign_
+
+        Assign up to maxJobs jobs to sites, from the highest to the lowest
+        priority and from the oldest to the newest job. Returns a list of
+        (job priority, job id, site name, task priority) tuples. The assigned
+        jobs stay queued until they are removed with removeJob().
+        """
+        assigned = []
+        saturated = set()
+        unknown = set()
+
+        self._compact()
+        for jobPrio in sorted(self.jobQueues.keys(), reverse=True):
+            if len(assigned) >= maxJobs or self.openSites == 0 or \
+               len(saturated) == len(self.groupJobs):
+                break
+
+            for (_, jobID, jobType, sites, group) in self.jobQueues[jobPrio]:
+                if group in saturated:
+                    continue
+
+                for siteName in sites:
+                    if self.siteFree.get(siteName, 0) <= 0:
+                        if siteName not in self.siteFree and siteName not in unknown:
+                            logging.warn("Have a job for %s which is not in the resource control", siteName)
+                            unknown.add(siteName)
+                        continue
+
+                    if self.taskFree.get((siteName, jobType), 0) <= 0:
+                        continue
+
+                    self._takeSlot(siteName, jobType)
+                    assigned.append((jobPrio, jobID, siteName, self.taskPriority[(siteName, jobType)]))
+                    break
+                else:
+                    # all the sites are full, and they will stay full
+                    saturated.add(group)
+                    if len(saturated) == len(self.groupJobs):
+                        break
+                    continue
+
+                if len(assigned) >= maxJobs or self.openSites == 0:
+                    break
+
+        logging.debug("Assigned %d jobs, %d job groups with no free slots left.",
+                      len(assigned), len(saturated))
+        return assigned
@@ -11,12 +11,8 @@ Submit jobs for execution.
 
 import logging
 import threading
+import time
 import os.path
-from operator import itemgetter
-try:
-    import cPickle as pickle
-except ImportError:
-    import pickle
 
 from WMCore.DAOFactory        import DAOFactory
 from WMCore.WMExceptions      import WM_JOB_ERROR_CODES
@@ -25,9 +21,11 @@ from WMCore.JobStateMachine.ChangeState       import ChangeState
 from WMCore.WorkerThreads.BaseWorkerThread    import BaseWorkerThread
 from WMCore.ResourceControl.ResourceControl   import ResourceControl
 from WMCore.DataStructs.JobPackage            import JobPackage
+from WMCore.DataStructs.JobStore              import JobStore
 from WMCore.FwkJobReport.Report               import Report
 from WMCore.WMException                       import WMException
 from WMCore.BossAir.BossAirAPI                import BossAirAPI
+from WMComponent.JobSubmitter.JobAssigner     import JobAssigner
 
 
 class JobSubmitterPollerException(WMException):
@@ -67,11 +65,20 @@ class JobSubmitterPoller(BaseWorkerThread):
         self.packageSize = getattr(self.config.JobSubmitter, 'packageSize', 500)
         self.collSize = getattr(self.config.JobSubmitter, 'collectionSize', self.packageSize * 1000)
         self.maxTaskPriority = getattr(self.config.BossAir, 'maxTaskPriority', 1e7)
+        # incremental refresh only asks for jobs which changed state since the last
+        # query (minus an overlap for late transactions), with a full refresh every
+        # skipRefreshCount cycles
+        self.incrementalRefresh = getattr(self.config.JobSubmitter, 'incrementalRefresh', False)
+        self.refreshOverlap = int(getattr(self.config.JobSubmitter, 'refreshOverlap', 300))
 
         # Additions for caching-based JobSubmitter
         self.cachedJobIDs = set()
         self.cachedJobs = {}
+        self.cachedJobPrio = {}
         self.jobDataCache = {}
+        self.jobAssigner = JobAssigner()
+        # loads the jobs from their pack file or job.pkl
+        self.jobStore = JobStore()
         self.jobsToPackage = {}
         self.sandboxPackage = {}
         self.locationDict = {}
@@ -79,6 +86,7 @@ class JobSubmitterPoller(BaseWorkerThread):
         self.drainSites = set()
         self.abortSites = set()
         self.refreshPollingCount = 0
+        self.refreshHighWaterMark = None
 
         try:
             if not getattr(self.config.JobSubmitter, 'submitDir', None):
@@ -101,6 +109,7 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         # Now the DAOs
         self.listJobsAction = self.daoFactory(classname="Jobs.ListForSubmitter")
+        self.listLeftStateAction = self.daoFactory(classname="Jobs.ListLeftState")
         self.setLocationAction = self.daoFactory(classname="Jobs.SetLocation")
         self.locationAction = self.daoFactory(classname="Locations.GetSiteInfo")
         self.setFWJRPathAction = self.daoFactory(classname="Jobs.SetFWJRPath")
@@ -220,14 +229,29 @@ class JobSubmitterPoller(BaseWorkerThread):
           - Batch ID
           - Path to sanbox
           - Path to cache directory
+
+        In incremental mode only the jobs that changed state since the previous
+        query are retrieved, jobs that left the created state in the meantime
+        are removed from the cache.
         """
         badJobs = dict([(x, []) for x in range(71101, 71105)])
         dbJobs = set()
+        leftJobs = None
 
         logging.info("Refreshing priority cache with currently %i jobs", len(self.cachedJobIDs))
 
-        if self.cacheRefreshSize == -1 or len(self.cachedJobIDs) < self.cacheRefreshSize or \
+        if self.incrementalRefresh and self.refreshHighWaterMark is not None and \
+           self.refreshPollingCount < self.skipRefreshCount:
+            since = self.refreshHighWaterMark - self.refreshOverlap
+            self.refreshHighWaterMark = int(time.time())
+            newJobs = self.listJobsAction.execute(since=since)
+            leftJobs = set(self.listLeftStateAction.execute(state="created", since=since))
+            self.refreshPollingCount += 1
+            logging.info("Found %s new jobs to be submitted and %s jobs which left the created state since %s.",
+                         len(newJobs), len(leftJobs), since)
+        elif self.cacheRefreshSize == -1 or len(self.cachedJobIDs) < self.cacheRefreshSize or \
            self.refreshPollingCount >= self.skipRefreshCount:
+            self.refreshHighWaterMark = int(time.time())
             newJobs = self.listJobsAction.execute()
             self.refreshPollingCount = 0
             logging.info("Found %s new jobs to be submitted.", len(newJobs))
@@ -249,23 +273,20 @@ class JobSubmitterPoller(BaseWorkerThread):
             if jobCount % 5000 == 0:
                 logging.info("Processed %d/%d new jobs.", jobCount, len(newJobs))
 
-            pickledJobPath = os.path.join(newJob["cache_dir"], "job.pkl")
-
-            if not os.path.isfile(pickledJobPath):
-                # Then we have a problem - there's no file
-                logging.error("Could not find pickled jobObject %s", pickledJobPath)
-                badJobs[71103].append(newJob)
-                continue
             try:
-                jobHandle = open(pickledJobPath, "r")
-                loadedJob = pickle.load(jobHandle)
-                jobHandle.close()
+                loadedJob = self.jobStore.loadJob(newJob["cache_dir"], jobID)
             except Exception as ex:
-                msg = "Error while loading pickled job object %s\n" % pickledJobPath
+                msg = "Error while loading pickled job object %s\n" % newJob["cache_dir"]
                 msg += str(ex)
                 logging.error(msg)
                 raise JobSubmitterPollerException(msg)
 
+            if loadedJob is None:
+                # Then we have a problem - there's no file
+                logging.error("Could not find pickled jobObject in %s", newJob["cache_dir"])
+                badJobs[71103].append(newJob)
+                continue
+
             loadedJob['retry_count'] = newJob['retry_count']
 
             # figure out possible locations for job
@@ -318,6 +339,8 @@ class JobSubmitterPoller(BaseWorkerThread):
 
             # now add basic information keyed by the jobid
             self.cachedJobs[jobPrio][jobID] = newJob
+            self.cachedJobPrio[jobID] = jobPrio
+            self.jobAssigner.addJob(jobPrio, newJob)
 
             # allow job baggage to override numberOfCores
             #       => used for repacking to get more slots/disk
@@ -359,6 +382,9 @@ class JobSubmitterPoller(BaseWorkerThread):
 
             self.jobDataCache[jobID] = jobInfo
 
+        # close the pack files opened to load the new jobs
+        self.jobStore.clear()
+
         # Register failures in submission
         for errorCode in badJobs:
             if badJobs[errorCode]:
@@ -369,8 +395,12 @@ class JobSubmitterPoller(BaseWorkerThread):
         self.flushJobPackages()
 
         # We need to remove any jobs from the cache that were not returned in
-        # the last call to the database.
-        jobIDsToPurge = self.cachedJobIDs - dbJobs
+        # the last call to the database (or that left the created state since
+        # the previous one in incremental mode).
+        if leftJobs is None:
+            jobIDsToPurge = self.cachedJobIDs - dbJobs
+        else:
+            jobIDsToPurge = (leftJobs - dbJobs) & self.cachedJobIDs
         self.cachedJobIDs -= jobIDsToPurge
 
         if len(jobIDsToPurge) == 0:
@@ -378,10 +408,10 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         for jobid in jobIDsToPurge:
             self.jobDataCache.pop(jobid, None)
-            for jobPrio in self.cachedJobs:
-                if self.cachedJobs[jobPrio].pop(jobid, None):
-                    # then the jobid was found, go to the next one
-                    break
+            jobPrio = self.cachedJobPrio.pop(jobid, None)
+            if jobPrio is not None:
+                self.cachedJobs[jobPrio].pop(jobid, None)
+                self.jobAssigner.removeJob(jobPrio, jobid)
 
         logging.info("Done pruning killed jobs, moving on to submit.")
         return
@@ -464,7 +494,10 @@ class JobSubmitterPoller(BaseWorkerThread):
             logging.info("Draining or Aborted sites have changed, the cache will be rebuilt.")
             self.cachedJobIDs = set()
             self.cachedJobs = {}
+            self.cachedJobPrio = {}
             self.jobDataCache = {}
+            self.jobAssigner.reset()
+            self.refreshHighWaterMark = None
 
         self.currentRcThresholds = rcThresholds
         self.abortSites = newAbortSites
@@ -485,97 +518,40 @@ class JobSubmitterPoller(BaseWorkerThread):
           - Path to sanbox
           - Path to cache directory
           - SE name of the site to run at
+
+        The job ordering and the free slot bookkeeping are done by the
+        JobAssigner, see its documentation for the details.
         """
         jobsToSubmit = {}
         jobsToUncache = []
-        jobsCount = 0
-        exitLoop = False
-
-        # iterate over jobs from the highest to the lowest prio
-        for jobPrio in sorted(self.cachedJobs, reverse=True):
-
-            # then we're completely done and have our basket full of jobs to submit
-            if exitLoop:
-                break
-
-            # start eating through the elder jobs first
-            for job in sorted(self.cachedJobs[jobPrio].values(), key=itemgetter('timestamp')):
-                jobid = job['id']
-                jobType = job['type']
-                possibleSites = job['possibleLocations']
-
-                # now look for sites with free pending slots
-                for siteName in possibleSites:
-                    if siteName not in self.currentRcThresholds:
-                        logging.warn("Have a job for %s which is not in the resource control", siteName)
-                        continue
-
-                    try:
-                        totalPendingSlots = self.currentRcThresholds[siteName]["total_pending_slots"]
-                        totalPendingJobs = self.currentRcThresholds[siteName]["total_pending_jobs"]
-                        totalRunningSlots = self.currentRcThresholds[siteName]["total_running_slots"]
-                        totalRunningJobs = self.currentRcThresholds[siteName]["total_running_jobs"]
-
-                        taskPendingSlots = self.currentRcThresholds[siteName]['thresholds'][jobType]["pending_slots"]
-                        taskPendingJobs = self.currentRcThresholds[siteName]['thresholds'][jobType]["task_pending_jobs"]
-                        taskRunningSlots = self.currentRcThresholds[siteName]['thresholds'][jobType]["max_slots"]
-                        taskRunningJobs = self.currentRcThresholds[siteName]['thresholds'][jobType]["task_running_jobs"]
-                        taskPriority = self.currentRcThresholds[siteName]['thresholds'][jobType]["priority"]
-                    except KeyError as ex:
-                        msg = "Invalid key for site %s and job type %s\n" % (siteName, jobType)
-                        msg += str(ex)
-                        logging.error(msg)
-                        continue
-
-                    # check if site has free pending slots AND free pending task slots
-                    if totalPendingJobs >= totalPendingSlots or taskPendingJobs >= taskPendingSlots:
-                        logging.debug("Found a job for %s which has no free pending slots", siteName)
-                        continue
-                    # check if site overall thresholds have free slots
-                    if totalPendingJobs + totalRunningJobs >= totalPendingSlots + totalRunningSlots:
-                        logging.debug("Found a job for %s which has no free overall slots", siteName)
-                        continue
-                    # finally, check whether task has free overall slots
-                    if taskPendingJobs + taskRunningJobs >= taskPendingSlots + taskRunningSlots:
-                        logging.debug("Found a job for %s which has no free task slots", siteName)
-                        continue
-
-                    # otherwise, update the site/task thresholds and the component job counter
-                    self.currentRcThresholds[siteName]["total_pending_jobs"] += 1
-                    self.currentRcThresholds[siteName]['thresholds'][jobType]["task_pending_jobs"] += 1
-                    jobsCount += 1
-
-                    # load (and remove) the job dictionary object from jobDataCache
-                    cachedJob = self.jobDataCache.pop(jobid)
-                    jobsToUncache.append((jobPrio, jobid))
-
-                    # Sort jobs by jobPackage
-                    package = cachedJob['packageDir']
-                    if package not in jobsToSubmit.keys():
-                        jobsToSubmit[package] = []
-
-                    # Add the sandbox to a global list
-                    self.sandboxPackage[package] = cachedJob.pop('sandbox')
-
-                    # Now update the job dictionary object
-                    cachedJob['custom'] = {'location': siteName}
-                    cachedJob['taskPriority'] = taskPriority
-
-                    # Get this job in place to be submitted by the plugin
-                    jobsToSubmit[package].append(cachedJob)
-
-                    # found a site to submit this job, so go to the next job
-                    break
-
-                # set the flag and get out of the job iteration
-                if jobsCount >= self.maxJobsPerPoll:
-                    exitLoop = True
-                    break
+
+        self.jobAssigner.setThresholds(self.currentRcThresholds)
+        for jobPrio, jobid, siteName, taskPriority in self.jobAssigner.assign(self.maxJobsPerPoll):
+            # load (and remove) the job dictionary object from jobDataCache
+            cachedJob = self.jobDataCache.pop(jobid)
+            jobsToUncache.append((jobPrio, jobid))
+
+            # Sort jobs by jobPackage
+            package = cachedJob['packageDir']
+            if package not in jobsToSubmit:
+                jobsToSubmit[package] = []
+
+            # Add the sandbox to a global list
+            self.sandboxPackage[package] = cachedJob.pop('sandbox')
+
+            # Now update the job dictionary object
+            cachedJob['custom'] = {'location': siteName}
+            cachedJob['taskPriority'] = taskPriority
+
+            # Get this job in place to be submitted by the plugin
+            jobsToSubmit[package].append(cachedJob)
 
         # jobs that are going to be submitted must be removed from all caches
         for prio, jobid in jobsToUncache:
             self.cachedJobs[prio].pop(jobid)
+            self.cachedJobPrio.pop(jobid, None)
             self.cachedJobIDs.remove(jobid)
+            self.jobAssigner.removeJob(prio, jobid)
 
         logging.info("Have %s packages to submit.", len(jobsToSubmit))
         logging.info("Done assigning site locations.")
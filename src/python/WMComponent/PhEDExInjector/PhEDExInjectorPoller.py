@@ -45,8 +45,10 @@ import threading
 import logging
 import traceback
 import time
+from functools import partial
 from httplib import HTTPException
 
+from WMCore.ThreadPool.WorkQueue import ThreadPool
 from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
 from WMCore.WMException import WMException
 from WMCore.Services.PhEDEx.PhEDEx import PhEDEx
@@ -65,6 +67,34 @@ class PhEDExInjectorException(WMException):
     """
 
 
+def coalesceInjections(injections, maxFiles):
+    """
+    _coalesceInjections_
+
+    Group the uninjected files of all the datasets for a node in as few
+    injections as possible, with no more than maxFiles files each unless
+    a single block is bigger.  The injections parameter is a dictionary
+    of node: {dataset: {block: {"is-open": ..., "files": [...]}}}.
+
+    Return a list of (node, injectData, lfnList) tuples.
+    """
+    result = []
+    for location in sorted(injections):
+        injectData = {}
+        lfnList = []
+        for dataset in sorted(injections[location]):
+            for blockName, fileBlock in injections[location][dataset].iteritems():
+                if lfnList and len(lfnList) + len(fileBlock['files']) > maxFiles:
+                    result.append((location, injectData, lfnList))
+                    injectData = {}
+                    lfnList = []
+                injectData.setdefault(dataset, {})[blockName] = fileBlock
+                lfnList.extend([fileInfo['lfn'] for fileInfo in fileBlock['files']])
+        if lfnList:
+            result.append((location, injectData, lfnList))
+    return result
+
+
 class PhEDExInjectorPoller(BaseWorkerThread):
     """
     _PhEDExInjectorPoller_
@@ -91,8 +121,16 @@ class PhEDExInjectorPoller(BaseWorkerThread):
             # subscribe on first cycle
             self.pollCounter = self.subFrequency - 1
 
+        # inject all the datasets for a node together, with one PhEDEx
+        # call per injectionMaxFiles files and injectionThreads calls in parallel
+        self.coalesceInjections = getattr(config.PhEDExInjector, "coalesceInjections", False)
+        self.injectionMaxFiles = getattr(config.PhEDExInjector, "injectionMaxFiles", 5000)
+        self.injectionThreads = getattr(config.PhEDExInjector, "injectionThreads", 4)
+        self.injectionPhEDEx = []
+
         # retrieving the node mappings is fickle and can fail quite often
-        self.phedex = PhEDEx({"endpoint": config.PhEDExInjector.phedexurl}, "json")
+        self.phedexUrl = config.PhEDExInjector.phedexurl
+        self.phedex = PhEDEx({"endpoint": self.phedexUrl}, "json")
         try:
             nodeMappings = self.phedex.getNodeMap()
         except:
@@ -239,6 +277,23 @@ class PhEDExInjectorPoller(BaseWorkerThread):
 
         return blocks
 
+    def getLocation(self, siteName):
+        """
+        _getLocation_
+
+        SE names can be stored in DBSBuffer as that is what is returned in
+        the framework job report.  Map the SE name to a PhEDEx node name,
+        return None if it can't be mapped.
+        """
+        if siteName in self.nodeNames:
+            return siteName
+        for kind in ["Buffer", "MSS", "Disk"]:
+            if kind in self.seMap and siteName in self.seMap[kind]:
+                return self.seMap[kind][siteName]
+
+        logging.error("Could not map SE %s to PhEDEx node.", siteName)
+        return None
+
     def injectFiles(self):
         """
         _injectFiles_
@@ -249,25 +304,13 @@ class PhEDExInjectorPoller(BaseWorkerThread):
 
         uninjectedFiles = self.getUninjected.execute()
 
-        for siteName in uninjectedFiles.keys():
-            # SE names can be stored in DBSBuffer as that is what is returned in
-            # the framework job report.  We'll try to map the SE name to a
-            # PhEDEx node name here.
-            location = None
-
-            if siteName in self.nodeNames:
-                location = siteName
-            else:
-                if "Buffer" in self.seMap and siteName in self.seMap["Buffer"]:
-                    location = self.seMap["Buffer"][siteName]
-                elif "MSS" in self.seMap and siteName in self.seMap["MSS"]:
-                    location = self.seMap["MSS"][siteName]
-                elif "Disk" in self.seMap and siteName in self.seMap["Disk"]:
-                    location = self.seMap["Disk"][siteName]
+        if self.coalesceInjections:
+            self.injectFilesCoalesced(uninjectedFiles)
+            return
 
+        for siteName in uninjectedFiles.keys():
+            location = self.getLocation(siteName)
             if location == None:
-                msg = "Could not map SE %s to PhEDEx node." % siteName
-                logging.error(msg)
                 continue
 
             for dataset in uninjectedFiles[siteName]:
@@ -285,6 +328,128 @@ class PhEDExInjectorPoller(BaseWorkerThread):
 
         return
 
+    def injectFilesCoalesced(self, uninjectedFiles):
+        """
+        _injectFilesCoalesced_
+
+        Inject the uninjected files with one XML drop per node and up to
+        injectionMaxFiles files, the drops being injected in parallel.
+        The status of all the injected files is updated at once.  The
+        datasets of a failed drop are injected one by one, so that a bad
+        dataset does not hold back the others at the node.
+        """
+        injections = {}
+        for siteName in uninjectedFiles:
+            location = self.getLocation(siteName)
+            if location == None:
+                continue
+            for dataset, blocks in uninjectedFiles[siteName].iteritems():
+                datasetBlocks = injections.setdefault(location, {}).setdefault(dataset, {})
+                for blockName, fileBlock in blocks.iteritems():
+                    # several SEs can map to the same node
+                    if blockName in datasetBlocks:
+                        datasetBlocks[blockName] = {"is-open": fileBlock["is-open"],
+                                                    "files": datasetBlocks[blockName]["files"] + fileBlock["files"]}
+                    else:
+                        datasetBlocks[blockName] = fileBlock
+
+        drops = coalesceInjections(injections, self.injectionMaxFiles)
+        if not drops:
+            return
+
+        startTime = time.time()
+        nThreads = max(1, min(self.injectionThreads, len(drops)))
+        while len(self.injectionPhEDEx) < nThreads:
+            if not self.injectionPhEDEx:
+                self.injectionPhEDEx.append(self.phedex)
+            else:
+                self.injectionPhEDEx.append(PhEDEx({"endpoint": self.phedexUrl}, "json"))
+
+        pool = ThreadPool([partial(self.injectBlocksCall, phedex) for phedex in self.injectionPhEDEx[:nThreads]])
+        for index, (location, injectData, lfnList) in enumerate(drops):
+            logging.info("About to inject %d files in %d datasets at %s",
+                         len(lfnList), len(injectData), location)
+            pool.enqueue(index, location, self.createInjectionSpec(injectData))
+        results = dict(pool)
+
+        injectedLFNs = []
+        injectedData = []
+        failedDrops = []
+        for index, (location, injectData, lfnList) in enumerate(drops):
+            injectRes = results[index]
+            if isinstance(injectRes, HTTPException):
+                logging.error("PhEDEx file injection at %s failed with HTTPException: %s %s",
+                              location, injectRes.status, injectRes.result)
+                # HTTPException with status 400 assumed to be duplicate injection
+                # trigger later block recovery (investigation needed if not the case)
+                # and still inject the datasets one by one, in case it was not
+                if injectRes.status == 400:
+                    self.blocksToRecover.extend(self.createRecoveryFileFormat(injectData))
+                failedDrops.append((location, injectData))
+            elif isinstance(injectRes, Exception):
+                logging.error("PhEDEx file injection at %s failed with Exception: %s", location, str(injectRes))
+                failedDrops.append((location, injectData))
+            elif injectRes and "error" in injectRes:
+                logging.error("Error injecting data %s: %s", injectData, injectRes["error"])
+                failedDrops.append((location, injectData))
+            else:
+                logging.debug("Injection result: %s", injectRes)
+                injectedLFNs.extend(lfnList)
+                injectedData.append(injectData)
+
+        logging.info("Injected %d files out of %d drops in %.2f secs",
+                     len(injectedLFNs), len(drops), time.time() - startTime)
+
+        if injectedLFNs:
+            self.setInjectedStatus(injectedLFNs, injectedData)
+
+        for location, injectData in failedDrops:
+            if len(injectData) < 2:
+                # retried in the next cycle
+                continue
+            logging.info("Injecting the %d datasets of the failed injection at %s one by one",
+                         len(injectData), location)
+            for dataset in injectData:
+                lfnList = []
+                for fileBlock in injectData[dataset].values():
+                    lfnList.extend([fileInfo['lfn'] for fileInfo in fileBlock['files']])
+                self.injectFilesPhEDExCall(location, {dataset: injectData[dataset]}, lfnList)
+
+        return
+
+    def injectBlocksCall(self, phedex, location, xmlData):
+        """
+        _injectBlocksCall_
+
+        Inject a XML drop at location from a thread pool, return the
+        result of the call or the exception raised.
+        """
+        logging.debug("injectFiles XMLData: %s", xmlData)
+        try:
+            return phedex.injectBlocks(location, xmlData)
+        except Exception as ex:
+            return ex
+
+    def setInjectedStatus(self, lfnList, injectDataList):
+        """
+        _setInjectedStatus_
+
+        Mark the injected files as in PhEDEx, on a database deadlock
+        recover their blocks in the next cycle.
+        """
+        try:
+            self.setStatus.execute(lfnList, 1)
+        except Exception as ex:
+            if 'Deadlock found' in str(ex) or 'deadlock detected' in str(ex):
+                logging.error("Database deadlock during file status update. Retrying again in the next cycle.")
+                for injectData in injectDataList:
+                    self.blocksToRecover.extend(self.createRecoveryFileFormat(injectData))
+            else:
+                msg = "Failed to update file status in the database, reason: %s" % str(ex)
+                logging.error(msg)
+                raise PhEDExInjectorException(msg)
+        return
+
     def injectFilesPhEDExCall(self, location, injectData, lfnList):
         """
         _injectFilesPhEDExCall_
@@ -308,20 +473,11 @@ class PhEDExInjectorPoller(BaseWorkerThread):
         else:
             logging.debug("Injection result: %s", injectRes)
 
-            if "error" in injectRes:
+            if injectRes and "error" in injectRes:
                 msg = "Error injecting data %s: %s" % (injectData, injectRes["error"])
                 logging.error(msg)
             else:
-                try:
-                    self.setStatus.execute(lfnList, 1)
-                except Exception as ex:
-                    if 'Deadlock found' in str(ex) or 'deadlock detected' in str(ex):
-                        logging.error("Database deadlock during file status update. Retrying again in the next cycle.")
-                        self.blocksToRecover.extend(self.createRecoveryFileFormat(injectData))
-                    else:
-                        msg = "Failed to update file status in the database, reason: %s" % str(ex)
-                        logging.error(msg)
-                        raise PhEDExInjectorException(msg)
+                self.setInjectedStatus(lfnList, [injectData])
 
         return
 
@@ -393,8 +549,13 @@ class PhEDExInjectorPoller(BaseWorkerThread):
         Run this recovery one block at a time, with too many blocks
         the call to the PhEDEx data service on cmsweb can time out
         """
-        # recover one block at a time
+        # recover one block at a time, a block can be listed more than once
+        # when a coalesced injection and its per dataset retry both failed
+        recovered = set()
         for block in self.blocksToRecover:
+            if frozenset(block) <= recovered:
+                continue
+            recovered.update(block)
 
             injectedFiles = self.phedex.getInjectedFiles(block)
 
@@ -93,6 +93,10 @@ class BossAirAPI(WMConnectionBase):
         self.completeDAO = self.daoFactory(classname="CompleteJob")
         self.monitorDAO = self.daoFactory(classname="JobStatusForMonitoring")
 
+        # Keep the jobs loaded by track in memory, indexed by runjob id, and
+        # only load the jobs which were not running in the previous cycle
+        self.incrementalTracking = getattr(config.BossAir, 'incrementalTracking', False)
+        self.trackedJobs = {}
 
         self.loadPlugin(noSetup)
 
@@ -484,7 +488,8 @@ class BossAirAPI(WMConnectionBase):
 
         logging.info("About to start building running jobs")
 
-        loadedJobs = self._buildRunningJobsFromRunJobs(runJobs=runningJobs)
+        loadedJobs = self._buildRunningJobsFromRunJobs(runJobs=runningJobs,
+                                                       useCache=self.incrementalTracking)
 
         logging.info("About to look for %i loadedJobs.\n", len(loadedJobs))
 
@@ -798,22 +803,37 @@ class BossAirAPI(WMConnectionBase):
                 raise BossAirException(msg)
         return jobkill
 
-    def _buildRunningJobsFromRunJobs(self, runJobs):
+    def _buildRunningJobsFromRunJobs(self, runJobs, useCache=False):
         """
         _buildRunningJobsFromRunJobs_
 
         Same as _buildRunningJobs_, but taking runJobs as input
+
+        With useCache, the jobs loaded in previous calls are kept in memory
+        and only the new jobs are loaded from the database
         """
         finalJobs = []
 
-        loadedJobs = self._loadByID(jobs=runJobs)
+        if useCache:
+            activeIDs = set([rj['id'] for rj in runJobs])
+            for jobID in self.trackedJobs.keys():
+                if jobID not in activeIDs:
+                    del self.trackedJobs[jobID]
+            newJobs = [rj for rj in runJobs if rj['id'] not in self.trackedJobs]
+            loadedJobs = self.trackedJobs
+            logging.info("Loading %i new running jobs, %i already loaded", len(newJobs), len(loadedJobs))
+        else:
+            newJobs = runJobs
+            loadedJobs = {}
 
-        for loadJob in loadedJobs:
-            runJob = None
-            for rj in runJobs:
-                if rj['id'] == loadJob['id']:
-                    runJob = rj
-                    break
+        if newJobs:
+            for loadJob in self._loadByID(jobs=newJobs):
+                loadedJobs[loadJob['id']] = loadJob
+
+        for runJob in runJobs:
+            loadJob = loadedJobs.get(runJob['id'])
+            if loadJob is None:
+                continue
             # We should have two instances of the job
             for key in runJob.keys():
                 # Fill one from the other
@@ -8,6 +8,7 @@ Base class for BossAir plugins
 import os
 import logging
 from WMCore.BossAir.Plugins.BasePlugin import BasePlugin, BossAirPluginException
+from WMCore.WMSpec.Persistency import loadPersisted
 from datetime import datetime
 from datetime import timedelta
 from random import randint
@@ -163,15 +164,11 @@ class MockPlugin(BasePlugin):
             self.start( self.myinput )
 
         #for each job we will need to modify the default Report (the output of each job).
-        f = open(self.fakeReport)
-        report = pickle.load(f)
-        f.close()
+        report = loadPersisted(self.fakeReport)
 
         lcreport = getattr(self.config.BossAir.MockPlugin, 'lcFakeReport', None)
         if lcreport != None:
-            f = open(lcreport)
-            lcreport = pickle.load(f)
-            f.close()
+            lcreport = loadPersisted(lcreport)
 
         for jj in jobs:
             if jj['id'] not in self.jobsScheduledEnd:
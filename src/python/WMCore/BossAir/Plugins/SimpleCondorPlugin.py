@@ -17,9 +17,10 @@ import WMCore.Algorithms.BasicAlgos as BasicAlgos
 
 from WMCore.DAOFactory import DAOFactory
 from WMCore.WMInit import getWMBASE
-from WMCore.BossAir.Plugins.BasePlugin import BasePlugin
+from WMCore.BossAir.Plugins.BasePlugin import BasePlugin, BossAirPluginException
 from WMCore.FwkJobReport.Report import Report
 from WMCore.Credential.Proxy import Proxy
+from WMCore.ThreadPool.WorkQueue import ThreadPool
 from Utils.IterTools import grouper, convertFromUnicodeToStr
 
 ##  python-condor stuff
@@ -33,6 +34,9 @@ class SimpleCondorPlugin(BasePlugin):
     Condor plugin for glide-in submissions
     """
 
+    # job ad attributes retrieved by track
+    trackAttributes = ['ClusterId', 'ProcId', 'JobStatus', 'EnteredCurrentStatus', 'MATCH_EXP_JOBGLIDEIN_CMSSite']
+
     @staticmethod
     def stateMap():
         """
@@ -107,6 +111,21 @@ class SimpleCondorPlugin(BasePlugin):
         if hasattr(config.BossAir, 'condorRequirementsString'):
             self.reqStr = config.BossAir.condorRequirementsString
 
+        # Incremental tracking: only query the ads which changed status since
+        # the last poll and keep the known ads in memory, with a full query
+        # every fullTrackInterval seconds to resynchronize
+        self.incrementalTracking = getattr(config.BossAir, 'incrementalTracking', False)
+        self.fullTrackInterval = getattr(config.BossAir, 'fullTrackInterval', 3600)
+        # seconds subtracted from the last poll time to cover clock skew and
+        # status changes made while the previous query was running
+        self.trackTimeMargin = getattr(config.BossAir, 'trackTimeMargin', 60)
+        self.jobAdCache = {}
+        self.lastTrackTime = None
+        self.lastFullTrackTime = None
+
+        # number of threads checking the job reports of completed jobs
+        self.completeThreads = getattr(config.BossAir, 'completeThreads', 8)
+
         # x509 proxy handling
         proxy = Proxy({'logger': myThread.logger})
         self.x509userproxy = proxy.getProxyFilename()
@@ -170,7 +189,6 @@ class SimpleCondorPlugin(BasePlugin):
         Second, the jobs that need to be changed
         Third, the jobs that need to be completed
         """
-        jobInfo = {}
         changeList = []
         completeList = []
         runningList = []
@@ -180,15 +198,17 @@ class SimpleCondorPlugin(BasePlugin):
 
         schedd = htcondor.Schedd()
 
+        queryTime = int(time.time())
+        fullQuery = not self.incrementalTracking or self.lastTrackTime is None or \
+                    queryTime - self.lastFullTrackTime > self.fullTrackInterval
+        agentConstraint = "WMAgent_AgentName == %s" % classad.quote(self.agent)
+        constraint = agentConstraint
+        if not fullQuery:
+            constraint += " && EnteredCurrentStatus >= %d" % (self.lastTrackTime - self.trackTimeMargin)
+
         logging.debug("Start: Retrieving classAds using Condor Python XQuery")
         try:
-            itobj = schedd.xquery("WMAgent_AgentName == %s" % classad.quote(self.agent),
-                                  ['ClusterId', 'ProcId', 'JobStatus', 'MATCH_EXP_JOBGLIDEIN_CMSSite'])
-            for jobAd in itobj:
-                gridId = "%s.%s" % (jobAd['ClusterId'], jobAd['ProcId'])
-                jobStatus = SimpleCondorPlugin.exitCodeMap().get(jobAd.get('JobStatus'), 'Unknown')
-                location = jobAd.get('MATCH_EXP_JOBGLIDEIN_CMSSite', None)
-                jobInfo[gridId] = (jobStatus, location)
+            jobInfo = self.getJobAds(schedd.xquery(constraint, self.trackAttributes))
         except Exception as ex:
             logging.error("Query to condor schedd failed in SimpleCondorPlugin.")
             logging.error("Returning empty lists for all job types...")
@@ -197,11 +217,41 @@ class SimpleCondorPlugin(BasePlugin):
 
         logging.debug("Finished retrieving %d classAds from Condor", len(jobInfo))
 
+        if fullQuery:
+            queueIds = jobInfo
+        else:
+            # only the ids of the jobs in the queue, to find the ones which left it
+            try:
+                queueIds = set(self.getJobIds(schedd.xquery(agentConstraint, ['ClusterId', 'ProcId'])))
+            except Exception as ex:
+                logging.error("Query to condor schedd failed in SimpleCondorPlugin.")
+                logging.error("Returning empty lists for all job types...")
+                logging.exception(ex)
+                return runningList, changeList, completeList
+
+        # look in the history for the jobs which left the queue
+        goneJobs = [job['gridid'] for job in jobs if job['gridid'] not in queueIds]
+        since = self.lastTrackTime - self.trackTimeMargin if self.lastTrackTime is not None else None
+        historyInfo = self.getHistoryAds(schedd, agentConstraint, goneJobs, since)
+
+        if fullQuery:
+            jobInfo.update(historyInfo)
+            self.jobAdCache = jobInfo
+            self.lastFullTrackTime = queryTime
+        else:
+            self.jobAdCache.update(jobInfo)
+            # forget the queue ads of the jobs which left it, as in a full query
+            for gridId in goneJobs:
+                self.jobAdCache.pop(gridId, None)
+            self.jobAdCache.update(historyInfo)
+            jobInfo = self.jobAdCache
+        self.lastTrackTime = queryTime
+
         # now go over the jobs and see what we have
         for job in jobs:
 
-            # if the schedd doesn't know a job, consider it complete
-            # doing any further checks is not cost effective
+            # if neither the schedd nor its history know a job, consider it
+            # complete, doing any further checks is not cost effective
             if job['gridid'] not in jobInfo:
                 (newStatus, location) = ('Completed', None)
             else:
@@ -226,6 +276,7 @@ class SimpleCondorPlugin(BasePlugin):
             # stop tracking finished jobs
             if job['globalState'] in ['Complete', 'Error']:
                 completeList.append(job)
+                self.jobAdCache.pop(job['gridid'], None)
             else:
                 runningList.append(job)
 
@@ -234,62 +285,155 @@ class SimpleCondorPlugin(BasePlugin):
 
         return runningList, changeList, completeList
 
+    @staticmethod
+    def getJobAds(jobAds):
+        """
+        _getJobAds_
+
+        Map the tracked job ads to a dict of gridid: (status, location)
+        """
+        jobInfo = {}
+        for jobAd in jobAds:
+            gridId = "%s.%s" % (jobAd['ClusterId'], jobAd['ProcId'])
+            jobStatus = SimpleCondorPlugin.exitCodeMap().get(jobAd.get('JobStatus'), 'Unknown')
+            location = jobAd.get('MATCH_EXP_JOBGLIDEIN_CMSSite', None)
+            jobInfo[gridId] = (jobStatus, location)
+        return jobInfo
+
+    @staticmethod
+    def getJobIds(jobAds):
+        """
+        _getJobIds_
+
+        Return the gridids of the job ads
+        """
+        return ["%s.%s" % (jobAd['ClusterId'], jobAd['ProcId']) for jobAd in jobAds]
+
+    def getHistoryAds(self, schedd, constraint, goneJobs, since=None):
+        """
+        _getHistoryAds_
+
+        Query the schedd history in bulk for the final status of the jobs
+        which left the queue, since the given time if any. The history is
+        read sequentially, so the query stops as soon as all the jobs are
+        found. A failed history query is not fatal, these jobs are then
+        considered complete as before.
+        """
+        if not goneJobs:
+            return {}
+
+        clusterIds = sorted(set([gridId.split('.')[0] for gridId in goneJobs]))
+        constraint += " && member(ClusterId, {%s})" % ", ".join(clusterIds)
+        if since is not None:
+            constraint += " && EnteredCurrentStatus >= %d" % since
+
+        logging.debug("Start: Retrieving classAds of %d jobs from the Condor history", len(goneJobs))
+        try:
+            jobInfo = self.getJobAds(schedd.history(constraint, self.trackAttributes, len(goneJobs)))
+        except Exception as ex:
+            logging.warning("Query to condor history failed in SimpleCondorPlugin: %s", str(ex))
+            return {}
+        logging.debug("Finished retrieving %d classAds from the Condor history", len(jobInfo))
+        return jobInfo
+
     def complete(self, jobs):
         """
         Do any completion work required
 
-        In this case, look for a returned logfile
+        In this case, look for a returned logfile. The job cache directories
+        are checked in parallel by completeThreads threads, as they are
+        often on a network filesystem. The jobs which could not be completed
+        are reported once all the jobs were checked.
         """
+        startTime = time.time()
+        createdReports = 0
+        failures = []
+
+        nThreads = min(self.completeThreads, len(jobs))
+        if nThreads > 1:
+            pool = ThreadPool([self.completeJob] * nThreads)
+            for job in jobs:
+                pool.enqueue(job['id'], job)
+            results = [result for _, result in pool]
+        else:
+            results = [self.completeJob(job) for job in jobs]
 
-        for job in jobs:
+        for createdReport, failure in results:
+            if createdReport:
+                createdReports += 1
+            if failure:
+                failures.append(failure)
+
+        logging.info("Checked the job reports of %i completed jobs in %.2f seconds with %i threads, "
+                     "created %i failed job reports", len(jobs), time.time() - startTime,
+                     max(nThreads, 1), createdReports)
 
+        if failures:
+            msg = "Failed to complete %i jobs:\n%s" % (len(failures), "\n".join(failures))
+            raise BossAirPluginException(msg)
+        return
+
+    def completeJob(self, job):
+        """
+        _completeJob_
+
+        Check the job report of a completed job and create a failed job
+        report if it is missing. It runs in the complete threads, so it
+        returns whether a report was created and the error message if the
+        job could not be completed instead of raising.
+        """
+        try:
             if job.get('cache_dir', None) is None or job.get('retry_count', None) is None:
                 # Then we can't do anything
                 logging.error("Can't find this job's cache_dir or retry count: %s", job)
-                continue
+                return False, None
 
             reportName = os.path.join(job['cache_dir'], 'Report.%i.pkl' % job['retry_count'])
             if os.path.isfile(reportName) and os.path.getsize(reportName) > 0:
                 # everything in order, move on
-                continue
+                return False, None
             elif os.path.isdir(reportName):
                 # Then something weird has happened. Report error, do nothing
                 logging.error("The job report for job with id %s and gridid %s is a directory", job['id'], job['gridid'])
                 logging.error("Ignoring this, but this is very strange")
+                return False, None
+
+            logging.error("No job report for job with id %s and gridid %s", job['id'], job['gridid'])
+
+            if os.path.isfile(reportName):
+                os.remove(reportName)
+
+            # create a report from scratch
+            condorReport = Report()
+            logOutput = 'Could not find jobReport\n'
+
+            if os.path.isdir(job['cache_dir']):
+                condorOut = "condor.%s.out" % job['gridid']
+                condorErr = "condor.%s.err" % job['gridid']
+                condorLog = "condor.%s.log" % job['gridid']
+                for condorFile in [ condorOut, condorErr, condorLog ]:
+                    condorFilePath = os.path.join(job['cache_dir'], condorFile)
+                    if os.path.isfile(condorFilePath):
+                        logTail = BasicAlgos.tail(condorFilePath, 50)
+                        logOutput += 'Adding end of %s to error message:\n' % condorFile
+                        logOutput += '\n'.join(logTail)
+                condorReport.addError("NoJobReport", 99303, "NoJobReport", logOutput)
             else:
-                logging.error("No job report for job with id %s and gridid %s", job['id'], job['gridid'])
-
-                if os.path.isfile(reportName):
-                    os.remove(reportName)
-
-                # create a report from scratch
-                condorReport = Report()
-                logOutput = 'Could not find jobReport\n'
-
-                if os.path.isdir(job['cache_dir']):
-                    condorOut = "condor.%s.out" % job['gridid']
-                    condorErr = "condor.%s.err" % job['gridid']
-                    condorLog = "condor.%s.log" % job['gridid']
-                    for condorFile in [ condorOut, condorErr, condorLog ]:
-                        condorFilePath = os.path.join(job['cache_dir'], condorFile)
-                        if os.path.isfile(condorFilePath):
-                            logTail = BasicAlgos.tail(condorFilePath, 50)
-                            logOutput += 'Adding end of %s to error message:\n' % condorFile
-                            logOutput += '\n'.join(logTail)
-                    condorReport.addError("NoJobReport", 99303, "NoJobReport", logOutput)
-                else:
-                    msg = "Serious Error in Completing condor job with id %s!\n" % job['id']
-                    msg += "Could not find jobCache directory %s\n" % job['cache_dir']
-                    msg += "Creating a new cache_dir for failed job report\n"
-                    logging.error(msg)
-                    os.makedirs(job['cache_dir'])
-                    condorReport.addError("NoJobReport", 99304, "NoCacheDir", logOutput)
-
-                condorReport.save(filename=reportName)
+                msg = "Serious Error in Completing condor job with id %s!\n" % job['id']
+                msg += "Could not find jobCache directory %s\n" % job['cache_dir']
+                msg += "Creating a new cache_dir for failed job report\n"
+                logging.error(msg)
+                os.makedirs(job['cache_dir'])
+                condorReport.addError("NoJobReport", 99304, "NoCacheDir", logOutput)
 
-                logging.debug("Created failed job report for job with id %s and gridid %s", job['id'], job['gridid'])
+            condorReport.save(filename=reportName)
 
-        return
+            logging.debug("Created failed job report for job with id %s and gridid %s", job['id'], job['gridid'])
+            return True, None
+        except Exception as ex:
+            msg = "Failed to complete job with id %s and gridid %s: %s" % (job.get('id'), job.get('gridid'), str(ex))
+            logging.exception(msg)
+            return False, msg
 
     def updateSiteInformation(self, jobs, siteName, excludeSite):
         """
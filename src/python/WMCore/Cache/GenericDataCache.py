@@ -1,12 +1,19 @@
 from __future__ import print_function, division
+import logging
+import threading
 import time
 
 class MemoryCacheStruct(object):
     """
-    WARNING: This can be used in multi thread by registering on GenericDataCache
-    But this cache is not thread saft.
+    Cache the result of a function for expire seconds. It is thread safe and
+    can be shared between threads by registering it on GenericDataCache.
+
+    Only one thread calls the function at a time, the other threads either
+    wait for its result or, with staleWhileRevalidate, get the expired data
+    while the refresh runs in a background thread. maxStale limits how many
+    seconds past its expiration the data can still be served that way.
     """
-    def __init__(self, expire, func, kwargs=None):
+    def __init__(self, expire, func, kwargs=None, staleWhileRevalidate=False, maxStale=None):
         """
         expire is the seconds which cache will be refreshed when cache is order than the expire.
         func is the fuction which cache data is retrived
@@ -18,22 +25,112 @@ class MemoryCacheStruct(object):
         if kwargs == None:
             kwargs = {}
         self.kwargs = kwargs
+        self.staleWhileRevalidate = staleWhileRevalidate
+        self.maxStale = maxStale
         self.lastUpdated  = -1
-        
+        self.lastAccessed = -1
+
+        self.lock = threading.Lock()
+        self.refreshing = False
+        self.stats = {"hits": 0, "staleHits": 0, "misses": 0, "refreshes": 0,
+                      "refreshErrors": 0, "lastRefreshTime": 0.0, "totalRefreshTime": 0.0}
+
     def isDataExpired(self):
         if self.lastUpdated == -1:
             return True
         if (int(time.time()) - self.lastUpdated) > self.expire:
             return True
         return False
-    
-    def getData(self):
-        if self.isDataExpired():
+
+    def isDataTooStale(self):
+        """
+        Expired data can't be served any more, even with staleWhileRevalidate.
+        """
+        if self.lastUpdated == -1:
+            return True
+        if self.maxStale is None:
+            return False
+        return (int(time.time()) - self.lastUpdated) > self.expire + self.maxStale
+
+    def _refresh(self):
+        """
+        Call the function and update the data, the caller holds the lock.
+        """
+        startTime = time.time()
+        try:
             self.data = self.func(**self.kwargs)
-            self.lastUpdate = int(time.time())
-        return self.data
+            self.lastUpdated = int(time.time())
+            self.stats["refreshes"] += 1
+        except Exception:
+            self.stats["refreshErrors"] += 1
+            raise
+        finally:
+            self.stats["lastRefreshTime"] = time.time() - startTime
+            self.stats["totalRefreshTime"] += self.stats["lastRefreshTime"]
+
+    def _backgroundRefresh(self):
+        """
+        Refresh the data from a background thread, keeping the old data on
+        failure.
+        """
+        try:
+            with self.lock:
+                self._refresh()
+        except Exception as ex:
+            logging.error("Failed to refresh the cache data of %s: %s", self.func, str(ex))
+        finally:
+            self.refreshing = False
+
+    def getData(self):
+        self.lastAccessed = int(time.time())
+        if not self.isDataExpired():
+            self.stats["hits"] += 1
+            return self.data
+
+        if self.staleWhileRevalidate and not self.isDataTooStale():
+            with self.lock:
+                startRefresh = not self.refreshing
+                self.refreshing = True
+            if startRefresh:
+                refreshThread = threading.Thread(target=self._backgroundRefresh)
+                refreshThread.daemon = True
+                refreshThread.start()
+            self.stats["staleHits"] += 1
+            return self.data
+
+        with self.lock:
+            # another thread might have refreshed it while we waited
+            if self.isDataExpired():
+                self.stats["misses"] += 1
+                self._refresh()
+            else:
+                self.stats["hits"] += 1
+            return self.data
+
+    def clearData(self, blocking=True):
+        """
+        Drop the cached data, it is fetched again on the next getData call.
+        If not blocking, nothing is done while the data is being refreshed.
+        """
+        if not self.lock.acquire(blocking):
+            return
+        try:
+            self.data = None
+            self.lastUpdated = -1
+        finally:
+            self.lock.release()
+
+    def getStats(self):
+        """
+        Return the cache counters: hits, staleHits (expired data served while
+        refreshing), misses (calls waiting for the function), refreshes,
+        refreshErrors, lastRefreshTime and totalRefreshTime in seconds.
+        """
+        stats = dict(self.stats)
+        stats["lastUpdated"] = self.lastUpdated
+        return stats
+
 
-        
 class CacheExistException(Exception):
     def __init__(self, cacheName):
         Exception.__init__(self, cacheName)
@@ -51,14 +148,22 @@ class CacheWithWrongStructException(Exception):
 
     def __str__(self):
         return "%s: %s" % (self.msg, self.error)
-                    
+
 class GenericDataCache(object):
-    
+
     _dataCache = {}
-    
+    _lock = threading.Lock()
+    # maximum number of caches holding data and seconds without access
+    # before the data of a cache is dropped, None for no limit
+    _maxCachedData = None
+    _maxIdle = None
+
     @staticmethod
     def getCacheData(cacheName):
-        return GenericDataCache._dataCache[cacheName]
+        memoryCache = GenericDataCache._dataCache[cacheName]
+        if GenericDataCache._maxCachedData is not None or GenericDataCache._maxIdle is not None:
+            GenericDataCache.evictData(exclude=cacheName)
+        return memoryCache
 
     @staticmethod
     def registerCache(cacheName, memoryCache):
@@ -66,9 +171,52 @@ class GenericDataCache(object):
         cacheName, unique name for the cache
         memoryCache MemoryCacheStruct instance.
         """
-        if cacheName in GenericDataCache._dataCache:
-            raise CacheExistException(cacheName)
-        elif not isinstance(memoryCache, MemoryCacheStruct):
-            raise CacheWithWrongStructException(cacheName)
-        else:
-            GenericDataCache._dataCache[cacheName] = memoryCache
+        with GenericDataCache._lock:
+            if cacheName in GenericDataCache._dataCache:
+                raise CacheExistException(cacheName)
+            elif not isinstance(memoryCache, MemoryCacheStruct):
+                raise CacheWithWrongStructException(cacheName)
+            else:
+                GenericDataCache._dataCache[cacheName] = memoryCache
+
+    @staticmethod
+    def setEvictionPolicy(maxCachedData=None, maxIdle=None):
+        """
+        Keep the data of at most maxCachedData caches, dropping the least
+        recently used ones, and drop the data of caches not used for maxIdle
+        seconds. The caches stay registered and fetch their data again when
+        used.
+        """
+        GenericDataCache._maxCachedData = maxCachedData
+        GenericDataCache._maxIdle = maxIdle
+
+    @staticmethod
+    def evictData(exclude=None):
+        """
+        Apply the eviction policy, the data of the exclude cache is kept.
+        """
+        now = int(time.time())
+        with GenericDataCache._lock:
+            cached = [(memoryCache.lastAccessed, name) for name, memoryCache in GenericDataCache._dataCache.items()
+                      if name != exclude and memoryCache.lastUpdated != -1]
+        cached.sort()
+
+        toEvict = []
+        if GenericDataCache._maxIdle is not None:
+            toEvict.extend([x for x in cached if now - x[0] > GenericDataCache._maxIdle])
+        if GenericDataCache._maxCachedData is not None:
+            # the exclude cache is about to be used and counts as cached
+            keep = max(GenericDataCache._maxCachedData - (1 if exclude else 0), 0)
+            toEvict.extend(cached[:max(len(cached) - keep, 0)])
+
+        for _, name in set(toEvict):
+            GenericDataCache._dataCache[name].clearData(blocking=False)
+
+    @staticmethod
+    def getCacheStats():
+        """
+        Return the counters of all the registered caches, keyed by name.
+        """
+        with GenericDataCache._lock:
+            caches = list(GenericDataCache._dataCache.items())
+        return dict([(name, memoryCache.getStats()) for name, memoryCache in caches])
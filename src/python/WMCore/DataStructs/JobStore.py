@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+"""
+_JobStore_
+
+Save and load the pickled job objects created by the JobCreator.
+
+Jobs are either saved one per file, as job.pkl in the job cache directory,
+or all the jobs of a job collection directory are saved in a single indexed
+pack file next to the job cache directories, which saves the creation and
+lookup of one small file per job on shared filesystems. The job cache
+directories are still created for the job outputs.
+
+Pack file layout:
+  - the JobPack magic string
+  - one pickled job object after the other
+  - the pickled index, a dictionary of job id to (offset, length)
+  - a trailer with the offset and length of the index
+"""
+
+import os
+import struct
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+JOB_PICKLE_NAME = "job.pkl"
+JOB_PACK_NAME = "JobPack.pack"
+
+PACK_MAGIC = "WMJobPack1\n"
+PACK_TRAILER = ">QQ"
+
+
+def jobPackPath(cacheDir):
+    """
+    _jobPackPath_
+
+    Return the path to the pack file holding the job with the given cache
+    directory.
+    """
+    return os.path.join(os.path.dirname(os.path.normpath(cacheDir)), JOB_PACK_NAME)
+
+
+class JobPackException(Exception):
+    """
+    _JobPackException_
+
+    Raised for a missing or corrupted pack file.
+    """
+    pass
+
+
+class JobPack(object):
+    """
+    _JobPack_
+
+    Random access to the jobs saved in a pack file. The index is read once,
+    the file stays open until close() is called.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.index = None
+        self.fileHandle = None
+        return
+
+    def write(self, jobs):
+        """
+        _write_
+
+        Save a list of jobs in the pack, they are added to the jobs already in
+        it if the pack exists. The file is written under a temporary name and
+        moved in place once it is complete.
+        """
+        records = {}
+        if os.path.exists(self.path):
+            for jobID in self.ids():
+                records[jobID] = self.readRecord(jobID)
+            self.close()
+
+        for job in jobs:
+            records[job["id"]] = pickle.dumps(job, pickle.HIGHEST_PROTOCOL)
+
+        index = {}
+        tmpPath = "%s.tmp.%d" % (self.path, os.getpid())
+        with open(tmpPath, "wb") as packFile:
+            packFile.write(PACK_MAGIC)
+            offset = len(PACK_MAGIC)
+            for jobID in sorted(records.keys()):
+                packFile.write(records[jobID])
+                index[jobID] = (offset, len(records[jobID]))
+                offset += len(records[jobID])
+
+            indexRecord = pickle.dumps(index, pickle.HIGHEST_PROTOCOL)
+            packFile.write(indexRecord)
+            packFile.write(struct.pack(PACK_TRAILER, offset, len(indexRecord)))
+        os.rename(tmpPath, self.path)
+
+        self.index = index
+        return
+
+    def _open(self):
+        """
+        _open_
+
+        Open the pack file and read its index.
+        """
+        if self.fileHandle is not None:
+            return
+
+        try:
+            self.fileHandle = open(self.path, "rb")
+        except IOError as ex:
+            raise JobPackException("Could not open job pack %s: %s" % (self.path, str(ex)))
+
+        if self.fileHandle.read(len(PACK_MAGIC)) != PACK_MAGIC:
+            self.close()
+            raise JobPackException("%s is not a job pack" % self.path)
+
+        trailerSize = struct.calcsize(PACK_TRAILER)
+        self.fileHandle.seek(-trailerSize, os.SEEK_END)
+        offset, length = struct.unpack(PACK_TRAILER, self.fileHandle.read(trailerSize))
+        self.fileHandle.seek(offset)
+        self.index = pickle.loads(self.fileHandle.read(length))
+        return
+
+    def close(self):
+        """
+        _close_
+
+        Close the pack file, the index is read again on the next access.
+        """
+        if self.fileHandle is not None:
+            self.fileHandle.close()
+        self.fileHandle = None
+        self.index = None
+        return
+
+    def ids(self):
+        """
+        _ids_
+
+        List the ids of the jobs in the pack.
+        """
+        self._open()
+        return self.index.keys()
+
+    def readRecord(self, jobID):
+        """
+        _readRecord_
+
+        Return the pickled job, None if the job is not in the pack.
+        """
+        self._open()
+        if jobID not in self.index:
+            return None
+
+        offset, length = self.index[jobID]
+        self.fileHandle.seek(offset)
+        return self.fileHandle.read(length)
+
+    def load(self, jobID):
+        """
+        _load_
+
+        Load a job from the pack, None if the job is not in the pack.
+        """
+        record = self.readRecord(jobID)
+        if record is None:
+            return None
+        return pickle.loads(record)
+
+
+class JobStore(object):
+    """
+    _JobStore_
+
+    Save jobs either as job.pkl files or in pack files and load them back
+    from either of them. The pack indexes used to load jobs are cached until
+    clear() is called.
+    """
+    def __init__(self, usePack=False):
+        self.usePack = usePack
+        self.packs = {}
+        self.pending = {}
+        return
+
+    def addJob(self, job):
+        """
+        _addJob_
+
+        Save a job, the job cache directory must exist. With pack files the
+        job is only written out by flush().
+        """
+        if not self.usePack:
+            with open(os.path.join(job["cache_dir"], JOB_PICKLE_NAME), "w") as output:
+                pickle.dump(job, output, pickle.HIGHEST_PROTOCOL)
+            return
+
+        self.pending.setdefault(jobPackPath(job["cache_dir"]), []).append(job)
+        return
+
+    def flush(self):
+        """
+        _flush_
+
+        Write the jobs added since the last flush to their pack files.
+        """
+        for path, jobs in self.pending.items():
+            jobPack = self.packs.pop(path, None) or JobPack(path)
+            jobPack.write(jobs)
+            jobPack.close()
+        self.pending = {}
+        return
+
+    def loadJob(self, cacheDir, jobID):
+        """
+        _loadJob_
+
+        Load a job from the pack of its cache directory or from its job.pkl
+        file. Returns None if the job can't be found in either of them.
+        """
+        path = jobPackPath(cacheDir)
+        if path not in self.packs and os.path.isfile(path):
+            self.packs[path] = JobPack(path)
+
+        if path in self.packs:
+            job = self.packs[path].load(jobID)
+            if job is not None:
+                return job
+
+        pickledJobPath = os.path.join(cacheDir, JOB_PICKLE_NAME)
+        if not os.path.isfile(pickledJobPath):
+            return None
+
+        with open(pickledJobPath, "r") as jobHandle:
+            return pickle.load(jobHandle)
+
+    def clear(self):
+        """
+        _clear_
+
+        Close the pack files and forget their indexes.
+        """
+        for jobPack in self.packs.values():
+            jobPack.close()
+        self.packs = {}
+        return
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+"""
+_LumiIndex_
+
+Sorted interval index over run/lumi ranges, as found in the lumi masks:
+
+  {run: [[firstLumi, lastLumi], [firstLumi, lastLumi], ...], ...}
+
+The ranges of a run are merged into sorted, disjoint intervals kept as two
+lists of first and last lumis, so checking a lumi is a bisection instead of
+a scan over all the ranges of the run.  The module also provides linear
+merges of range lists for the intersection, union and subtraction of masks.
+"""
+
+import logging
+from bisect import bisect_right
+
+# the last lumi of the ranges covering a whole run
+MAX_LUMI = 0xFFFFFFF
+
+
+def compactRanges(ranges):
+    """
+    _compactRanges_
+
+    Sort a list of [first, last] lumi ranges and merge the ones that overlap
+    or are contiguous.  Ranges that do not have exactly two elements are
+    dropped.
+    """
+    result = []
+    for lumiRange in sorted(ranges):
+        if len(lumiRange) != 2:
+            logging.error("Invalid lumi range %s, ignoring it", lumiRange)
+            continue
+        if result and lumiRange[0] <= result[-1][1] + 1:
+            if lumiRange[1] > result[-1][1]:
+                result[-1][1] = lumiRange[1]
+        else:
+            result.append([lumiRange[0], lumiRange[1]])
+    return result
+
+
+def intersectRanges(aRanges, bRanges):
+    """
+    _intersectRanges_
+
+    Lumi ranges in both of the compacted range lists.
+    """
+    result = []
+    i = j = 0
+    while i < len(aRanges) and j < len(bRanges):
+        first = max(aRanges[i][0], bRanges[j][0])
+        last = min(aRanges[i][1], bRanges[j][1])
+        if first <= last:
+            if result and first == result[-1][1] + 1:
+                result[-1][1] = last
+            else:
+                result.append([first, last])
+        if aRanges[i][1] < bRanges[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def unionRanges(aRanges, bRanges):
+    """
+    _unionRanges_
+
+    Lumi ranges in any of the range lists.
+    """
+    return compactRanges(aRanges + bRanges)
+
+
+def subtractRanges(aRanges, bRanges):
+    """
+    _subtractRanges_
+
+    Lumi ranges of the first compacted range list that are not in the
+    second one.
+    """
+    result = []
+    j = 0
+    for first, last in aRanges:
+        while j < len(bRanges) and bRanges[j][1] < first:
+            j += 1
+        k = j
+        while k < len(bRanges) and bRanges[k][0] <= last:
+            if bRanges[k][0] > first:
+                result.append([first, bRanges[k][0] - 1])
+            first = max(first, bRanges[k][1] + 1)
+            if bRanges[k][1] > last:
+                break
+            k += 1
+        if first <= last:
+            result.append([first, last])
+    return result
+
+
+class LumiIndex(object):
+    """
+    _LumiIndex_
+
+    Lumi lookups on a {run: [[first, last], ...]} dictionary.  The runs are
+    looked up with the same key type as the dictionary.  A run is indexed on
+    its first lookup and again whenever its list of ranges was replaced or
+    changed size, so ranges appended to the dictionary are picked up.
+
+    With openEnded set, a range with 0 as last lumi goes to the end of the
+    run, as in the CMSSW lumi lists.
+    """
+    def __init__(self, runsAndLumis=None, openEnded=False):
+        self.runsAndLumis = runsAndLumis if runsAndLumis is not None else {}
+        self.openEnded = openEnded
+        self.index = {}
+        return
+
+    def __len__(self):
+        return len(self.runsAndLumis)
+
+    def __contains__(self, run):
+        return run in self.runsAndLumis
+
+    def _runIndex(self, run):
+        """
+        _runIndex_
+
+        Return the (first lumis, last lumis) lists of a run, None if the run
+        is not there.
+        """
+        ranges = self.runsAndLumis.get(run, None)
+        if ranges is None:
+            return None
+
+        cached = self.index.get(run, None)
+        if cached is None or cached[0] is not ranges or cached[1] != len(ranges):
+            if self.openEnded:
+                compacted = compactRanges([[x[0], MAX_LUMI] if len(x) == 2 and x[1] == 0 else x
+                                           for x in ranges])
+            else:
+                compacted = compactRanges(ranges)
+            cached = (ranges, len(ranges),
+                      [x[0] for x in compacted], [x[1] for x in compacted])
+            self.index[run] = cached
+        return cached[2], cached[3]
+
+    def hasRun(self, run):
+        """
+        _hasRun_
+
+        Check if the run is in the index.
+        """
+        return run in self.runsAndLumis
+
+    def contains(self, run, lumi):
+        """
+        _contains_
+
+        Check if the lumi of the run is in any of its ranges.
+        """
+        runIndex = self._runIndex(run)
+        if runIndex is None:
+            return False
+
+        firsts, lasts = runIndex
+        position = bisect_right(firsts, lumi) - 1
+        return position >= 0 and lumi <= lasts[position]
+
+    def getRanges(self, run):
+        """
+        _getRanges_
+
+        Return the compacted ranges of a run.
+        """
+        runIndex = self._runIndex(run)
+        if runIndex is None:
+            return []
+        return [list(x) for x in zip(*runIndex)]
+
+    def filterLumis(self, lumis):
+        """
+        _filterLumis_
+
+        Return the (run, lumi) pairs of the list that are in the index.
+        """
+        return [(run, lumi) for (run, lumi) in lumis if self.contains(run, lumi)]
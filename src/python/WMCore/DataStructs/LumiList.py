@@ -13,12 +13,14 @@ This code began life in COMP/CRAB/python/LumiList.py
 """
 
 
-import copy
 import itertools
 import json
 import re
 import urllib2
 
+from WMCore.DataStructs.LumiIndex import LumiIndex, MAX_LUMI, compactRanges, \
+                                         intersectRanges, unionRanges, subtractRanges
+
 class LumiList(object):
     """
     Deal with lists of lumis in several different forms:
@@ -54,6 +56,7 @@ class LumiList(object):
         """
         self.compactList = {}
         self.duplicates = {}
+        self.lumiIndex = None
         if filename:
             self.filename = filename
             jsonFile = open(self.filename,'r')
@@ -97,7 +100,7 @@ class LumiList(object):
         if runs:
             for run in runs:
                 runString = str(run)
-                self.compactList[runString] = [[1, 0xFFFFFFF]]
+                self.compactList[runString] = [[1, MAX_LUMI]]
 
         if compactList:
             for run in compactList.keys():
@@ -136,39 +139,24 @@ class LumiList(object):
         # Compact each run and make it unique
 
         for run in self.compactList.keys():
-            newLumis = []
-            for lumi in sorted(self.compactList[run]):
-                # If the next lumi starts inside or just after the last just change the endpoint of the first
-                if newLumis and newLumis[-1][0] <= lumi[0] <= newLumis[-1][1] + 1:
-                    newLumis[-1][1] = max(newLumis[-1][1], lumi[1])
-                else:
-                    newLumis.append(lumi)
-            self.compactList[run] = newLumis
+            self.compactList[run] = compactRanges(self.compactList[run])
+
+    def _getLumiIndex(self):
+        """
+        _getLumiIndex_
+
+        Return the sorted interval index of compactList, used for the lumi
+        lookups.
+        """
+        if self.lumiIndex is None or self.lumiIndex.runsAndLumis is not self.compactList:
+            self.lumiIndex = LumiIndex(self.compactList, openEnded=True)
+        return self.lumiIndex
 
     def __sub__(self, other): # Things from self not in other
         result = {}
-        for run in sorted(self.compactList.keys()):
-            alumis = sorted(self.compactList[run])
-            blumis = sorted(other.compactList.get(run, []))
-            alist = []                    # verified part
-            for alumi in alumis:
-                tmplist = [alumi[0], alumi[1]] # may be part
-                for blumi in blumis:
-                    if blumi[0] <= tmplist[0] and blumi[1] >= tmplist[1]: # blumi has all of alumi
-                        tmplist = []
-                        break # blumi is has all of alumi
-                    if blumi[0] > tmplist[0] and blumi[1] < tmplist[1]: # blumi is part of alumi
-                        alist.append([tmplist[0], blumi[0]-1])
-                        tmplist = [blumi[1]+1, tmplist[1]]
-                    elif blumi[0] <= tmplist[0] and blumi[1] < tmplist[1] and blumi[1]>=tmplist[0]: # overlaps start
-                        tmplist = [blumi[1]+1, tmplist[1]]
-                    elif blumi[0] > tmplist[0] and blumi[1] >= tmplist[1] and blumi[0]<=tmplist[1]: # overlaps end
-                        alist.append([tmplist[0], blumi[0]-1])
-                        tmplist = []
-                        break
-                if tmplist:
-                    alist.append(tmplist)
-            result[run] = alist
+        for run in self.compactList.keys():
+            result[run] = subtractRanges(compactRanges(self.compactList[run]),
+                                         compactRanges(other.compactList.get(run, [])))
 
         return LumiList(compactList = result)
 
@@ -178,29 +166,8 @@ class LumiList(object):
         aruns = set(self.compactList.keys())
         bruns = set(other.compactList.keys())
         for run in aruns & bruns:
-            lumiList = []                    # List for this run
-            unique = []                    # List for this run
-            for alumi in self.compactList[run]:
-                for blumi in other.compactList[run]:
-                    if blumi[0] <= alumi[0] and blumi[1] >= alumi[1]: # blumi has all of alumi
-                        lumiList.append(alumi)
-                    if blumi[0] > alumi[0] and blumi[1] < alumi[1]: # blumi is part of alumi
-                        lumiList.append(blumi)
-                    elif blumi[0] <= alumi[0] and blumi[1] < alumi[1] and blumi[1] >= alumi[0]: # overlaps start
-                        lumiList.append([alumi[0], blumi[1]])
-                    elif blumi[0] > alumi[0] and blumi[1] >= alumi[1] and blumi[0] <= alumi[1]: # overlaps end
-                        lumiList.append([blumi[0], alumi[1]])
-
-
-            if lumiList:
-                unique = [lumiList[0]]
-            for pair in lumiList[1:]:
-                if pair[0] == unique[-1][1]+1:
-                    unique[-1][1] = copy.deepcopy(pair[1])
-                else:
-                    unique.append(copy.deepcopy(pair))
-
-            result[run] = unique
+            result[run] = intersectRanges(compactRanges(self.compactList[run]),
+                                          compactRanges(other.compactList[run]))
         return LumiList(compactList = result)
 
 
@@ -210,14 +177,7 @@ class LumiList(object):
         bruns = other.compactList.keys()
         runs = set(aruns + bruns)
         for run in runs:
-            overlap = sorted(self.compactList.get(run, []) + other.compactList.get(run, []))
-            unique = [overlap[0]]
-            for pair in overlap[1:]:
-                if pair[0] >= unique[-1][0] and pair[0] <= unique[-1][1]+1 and pair[1] > unique[-1][1]:
-                    unique[-1][1] = copy.deepcopy(pair[1])
-                elif pair[0] > unique[-1][1]:
-                    unique.append(copy.deepcopy(pair))
-            result[run] = unique
+            result[run] = unionRanges(self.compactList.get(run, []), other.compactList.get(run, []))
         return LumiList(compactList = result)
 
 
@@ -235,14 +195,8 @@ class LumiList(object):
         lumilist is of the simple form
         [(run1,lumi1),(run1,lumi2),(run2,lumi1)]
         """
-        filteredList = []
-        for (run, lumi) in lumiList:
-            runsInLumi = self.compactList.get(str(run), [[0, -1]])
-            for (first, last) in runsInLumi:
-                if lumi >= first and lumi <= last:
-                    filteredList.append((run, lumi))
-                    break
-        return filteredList
+        lumiIndex = LumiIndex(self.compactList)
+        return [(run, lumi) for (run, lumi) in lumiList if lumiIndex.contains(str(run), lumi)]
 
 
     def __str__ (self):
@@ -385,21 +339,12 @@ class LumiList(object):
                 run         = run[0]
             except:
                 raise RuntimeError("Improper format for run '%s'" % run)
-        lumiRangeList = self.compactList.get( str(run) )
-        if not lumiRangeList:
-            # the run isn't there, so no need to look any further
-            return False
-        for lumiRange in lumiRangeList:
-            # we want to make this as found if either the lumiSection
-            # is inside the range OR if the lumi section is greater
-            # than or equal to the lower bound of the lumi range and
-            # the upper bound is 0 (which means extends to the end of
-            # the run)
-            if lumiRange[0] <= lumiSection and \
-               (0 == lumiRange[1] or lumiSection <= lumiRange[1]):
-                # got it
-                return True
-        return False
+        # we want to make this as found if either the lumiSection
+        # is inside the range OR if the lumi section is greater
+        # than or equal to the lower bound of the lumi range and
+        # the upper bound is 0 (which means extends to the end of
+        # the run)
+        return self._getLumiIndex().contains(str(run), lumiSection)
 
 
     def __contains__ (self, runTuple):
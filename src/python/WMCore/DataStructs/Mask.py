@@ -11,6 +11,7 @@ job in two ways:
 """
 
 from WMCore.DataStructs.Run import Run
+from WMCore.DataStructs.LumiIndex import LumiIndex
 
 class Mask(dict):
     """
@@ -30,7 +31,29 @@ class Mask(dict):
         self.setdefault("FirstRun", None)
         self.setdefault("LastRun", None)
         self.setdefault("runAndLumis", {})
+        self.lumiIndex = None
 
+    def __getstate__(self):
+        """
+        __getstate__
+
+        Do not persist the lumi index, it is rebuilt when needed.
+        """
+        state = self.__dict__.copy()
+        state.pop("lumiIndex", None)
+        return state
+
+    def _getLumiIndex(self):
+        """
+        _getLumiIndex_
+
+        Return the sorted interval index of runAndLumis.
+        """
+        lumiIndex = getattr(self, "lumiIndex", None)
+        if lumiIndex is None or lumiIndex.runsAndLumis is not self['runAndLumis']:
+            lumiIndex = LumiIndex(self['runAndLumis'])
+            self.lumiIndex = lumiIndex
+        return lumiIndex
 
     def setMaxAndSkipEvents(self, maxEvents, skipEvents):
         """
@@ -145,7 +168,7 @@ class Mask(dict):
         if not type(lumis) == list:
             lumis = list(lumis)
 
-        if not run in self['runAndLumis'].keys():
+        if run not in self['runAndLumis']:
             self['runAndLumis'][run] = []
 
         self['runAndLumis'][run].append([min(lumis), max(lumis)])
@@ -173,16 +196,7 @@ class Mask(dict):
             # ALWAYS TRUE
             return True
 
-        if not run in self['runAndLumis'].keys():
-            return False
-
-        for pair in self['runAndLumis'][run]:
-            # Go through each max and min pair
-            if pair[0] <= lumi and pair[1] >= lumi:
-                # Then the lumi is bracketed
-                return True
-
-        return False
+        return self._getLumiIndex().contains(run, lumi)
 
 
     def filterRunLumisByMask(self, runs):
@@ -208,16 +222,10 @@ class Mask(dict):
         passedRuns = set([r.run for r in runs])
         filteredRuns = maskRuns.intersection(passedRuns)
 
+        lumiIndex = self._getLumiIndex()
         newRuns = set()
         for runNumber in filteredRuns:
-            maskLumis = set()
-            for pair in self["runAndLumis"][runNumber]:
-                if pair[0] == pair[1]:
-                    maskLumis.add(pair[0])
-                else:
-                    maskLumis = maskLumis.union(range(pair[0], pair[1] + 1, 1))
-
-            filteredLumis = set(runDict[runNumber].lumis).intersection(maskLumis)
+            filteredLumis = set([x for x in runDict[runNumber].lumis if lumiIndex.contains(runNumber, x)])
             if len(filteredLumis) > 0:
                 newRuns.add(Run(runNumber, *list(filteredLumis)))
 
@@ -10,6 +10,8 @@ NOT A THREAD SAFE CLASS.
 """
 from __future__ import print_function
 
+import Queue
+import threading
 import time
 import urllib
 import re
@@ -178,6 +180,89 @@ class Database(CouchDBRequests):
         self._queue_size = size
         self.threads = []
         self.last_seq = 0
+        self._commitQueue = None
+        self._commitErrors = []
+
+    def startBackgroundCommit(self, maxPending=2):
+        """
+        _startBackgroundCommit_
+
+        Switch to background commits: when queue() fills up the queued
+        documents are handed over to a worker thread which posts them to
+        _bulk_docs while the caller keeps queuing. At most maxPending full
+        queues wait for the worker, queue() blocks when that limit is reached.
+
+        commit() waits for the worker to post everything handed over before
+        committing what is left in the queue, so documents are still written
+        in the order they were queued. Conflict callbacks are called from the
+        worker thread. Errors in the worker are raised by the next commit().
+        """
+        if self.threads:
+            return
+
+        self._commitQueue = Queue.Queue(maxPending)
+        worker = threading.Thread(target=self._backgroundCommit,
+                                  name="CouchCommit-%s" % self.name)
+        worker.setDaemon(True)
+        worker.start()
+        self.threads.append(worker)
+        return
+
+    def stopBackgroundCommit(self):
+        """
+        _stopBackgroundCommit_
+
+        Wait for the pending background commits and go back to synchronous
+        commits.
+        """
+        if not self.threads:
+            return
+
+        self._commitQueue.put(None)
+        for worker in self.threads:
+            worker.join()
+        self.threads = []
+        self._commitQueue = None
+        self._raiseBackgroundErrors()
+        return
+
+    def flushBackgroundCommit(self):
+        """
+        _flushBackgroundCommit_
+
+        Block until all the documents handed over to the worker thread have
+        been posted, raise the first error it hit if any.
+        """
+        if self._commitQueue is not None:
+            self._commitQueue.join()
+        self._raiseBackgroundErrors()
+        return
+
+    def _raiseBackgroundErrors(self):
+        """
+        Raise the first error from the background commits and forget the others
+        """
+        if self._commitErrors:
+            error = self._commitErrors[0]
+            self._commitErrors = []
+            raise error
+
+    def _backgroundCommit(self):
+        """
+        Worker thread loop, post the queues handed over by queue()
+        """
+        while True:
+            work = self._commitQueue.get()
+            try:
+                if work is None:
+                    return
+                docs, viewlist, callback = work
+                self._bulkCommit(docs, viewlist, callback, {})
+            except Exception as ex:
+                logging.error("Background commit to %s failed: %s" % (self.name, str(ex)))
+                self._commitErrors.append(ex)
+            finally:
+                self._commitQueue.task_done()
 
     def _reset_queue(self):
         """
@@ -211,10 +296,14 @@ class Database(CouchDBRequests):
         """
         if timestamp:
             self.timestamp(doc, timestamp)
-        # TODO: Thread this off so that it's non blocking...
         if len(self._queue) >= self._queue_size:
-            print('queue larger than %s records, committing' % self._queue_size)
-            self.commit(viewlist=viewlist, callback=callback)
+            if self._commitQueue is not None:
+                # blocks if the worker is already maxPending queues behind
+                self._commitQueue.put((list(self._queue), viewlist, callback))
+                self._reset_queue()
+            else:
+                print('queue larger than %s records, committing' % self._queue_size)
+                self.commit(viewlist=viewlist, callback=callback)
         self._queue.append(doc)
 
     def queueDelete(self, doc):
@@ -269,17 +358,28 @@ class Database(CouchDBRequests):
         if doc:
             self.queue(doc, timestamp, viewlist)
 
+        # whatever was handed over to the background worker goes first
+        self.flushBackgroundCommit()
+
         if len(self._queue) == 0:
             return
 
         if timestamp:
             self.timestamp(self._queue, timestamp)
-        # TODO: commit in thread to avoid blocking others
+
+        retval = self._bulkCommit(list(self._queue), viewlist, callback, data)
+        self._reset_queue()
+        return retval
+
+    def _bulkCommit(self, docs, viewlist, callback, data):
+        """
+        Post a list of documents to _bulk_docs, refresh the views in viewlist
+        and call the callback for the documents that triggered a conflict
+        """
         uri = '/%s/_bulk_docs/' % self.name
 
-        data['docs'] = list(self._queue)
+        data['docs'] = docs
         retval = self.post(uri, data)
-        self._reset_queue()
         for v in viewlist:
             design, view = v.split('/')
             self.loadView(design, view, {'limit': 0})
@@ -554,6 +654,64 @@ class Database(CouchDBRequests):
         else:
             return self.get('/%s/_all_docs' % self.name, encodedOptions)
 
+    def updateBulkDocuments(self, docIds, updateFunc, chunkSize=None, maxRetries=3):
+        """
+        _updateBulkDocuments_
+
+        Client side equivalent of calling an update handler on many documents.
+        For every chunk of chunkSize ids (the queue size by default) the
+        documents are fetched with a single _all_docs?include_docs request,
+        modified locally by updateFunc(docId, doc) and written back with a
+        single _bulk_docs request. doc is None if the document doesn't exist
+        (or was deleted), updateFunc returns the document to be saved or None
+        to leave it untouched.
+
+        Documents that hit a conflict are fetched again and updated up to
+        maxRetries times.
+
+        Returns the list of ids that could not be updated.
+        """
+        chunkSize = chunkSize or self._queue_size
+        uri = '/%s/_bulk_docs/' % self.name
+
+        uniqueIds = []
+        seen = set()
+        for docId in docIds:
+            if docId not in seen:
+                seen.add(docId)
+                uniqueIds.append(docId)
+
+        failed = []
+        for start in range(0, len(uniqueIds), chunkSize):
+            pending = uniqueIds[start:start + chunkSize]
+            retries = 0
+            while pending:
+                rows = self.allDocs({'include_docs': True}, keys=pending)['rows']
+                docs = []
+                for row in rows:
+                    doc = updateFunc(row['key'], row.get('doc', None))
+                    if doc is not None:
+                        doc['_id'] = row['key']
+                        docs.append(doc)
+
+                if len(docs) == 0:
+                    break
+
+                retval = self.post(uri, {'docs': docs})
+                pending = []
+                for result in retval:
+                    if result.get('error', None) == 'conflict':
+                        pending.append(result['id'])
+                    elif 'error' in result:
+                        failed.append(result['id'])
+
+                retries += 1
+                if pending and retries > maxRetries:
+                    failed.extend(pending)
+                    break
+
+        return failed
+
     def info(self):
         """
         Return information about the databaes (size, number of documents etc).
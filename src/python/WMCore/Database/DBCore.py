@@ -9,8 +9,10 @@ Core Database APIs
 
 
 
+import re
+
 from WMCore.DataStructs.WMObject import WMObject
-from WMCore.Database.ResultSet import ResultSet
+from WMCore.Database.ResultSet import ResultSet, iterateCursor
 from copy import copy
 import WMCore.WMLogging
 
@@ -37,6 +39,7 @@ class DBInterface(WMObject):
         self.logger.info ("Instantiating base WM DBInterface")
         self.engine = engine
         self.maxBindsPerQuery = 500
+        self.streamBatchSize = 1000
 
     def buildbinds(self, sequence, thename, therest=[{}]):
         """
@@ -72,8 +75,68 @@ class DBInterface(WMObject):
         resultProxy.close()
         return result
 
+    def bulkSelectBinds(self, s, b):
+        """
+        _bulkSelectBinds_
+
+        Try to turn a SELECT that would be executed once per bind dictionary
+        into a single SELECT using an IN list. This is only possible if:
+          - exactly one bind variable changes between the bind dictionaries
+          - that bind variable appears only once in the query, in a
+            "column = :bind" comparison
+
+        All the other bind variables are passed through unchanged. Duplicated
+        values are only bound once, so the rows come back once per distinct
+        value and not necessarily in the order of the binds.
+
+        Returns a tuple of the new SQL and bind dictionary, or (None, None)
+        if the query can't be rewritten.
+        """
+        if not s.strip().lower().startswith('select') or len(b) < 2:
+            return None, None
+
+        bindNames = list(b[0].keys())
+        varying = []
+        try:
+            for bindName in bindNames:
+                if len(set([bind[bindName] for bind in b])) > 1:
+                    varying.append(bindName)
+        except (KeyError, TypeError):
+            return None, None
+
+        if len(varying) != 1:
+            return None, None
+        bindName = varying[0]
+
+        bindRegexp = re.compile(r":%s\b" % re.escape(bindName), re.IGNORECASE)
+        compRegexp = re.compile(r"([\w\.]+)\s*=\s*:%s\b" % re.escape(bindName),
+                                re.IGNORECASE)
+        if len(bindRegexp.findall(s)) != 1 or len(compRegexp.findall(s)) != 1:
+            return None, None
+
+        values = []
+        seen = set()
+        for bind in b:
+            if bind[bindName] not in seen:
+                seen.add(bind[bindName])
+                values.append(bind[bindName])
+
+        newBinds = dict(b[0])
+        del newBinds[bindName]
+        inNames = []
+        for index, value in enumerate(values):
+            inName = "%s_in%d" % (bindName, index)
+            if inName in newBinds:
+                return None, None
+            newBinds[inName] = value
+            inNames.append(":%s" % inName)
+
+        inClause = "%s IN (%s)" % ("%s", ", ".join(inNames))
+        newSQL = compRegexp.sub(lambda match: inClause % match.group(1), s)
+        return newSQL, newBinds
+
     def executemanybinds(self, s=None, b=None, connection=None,
-                         returnCursor=False):
+                         returnCursor=False, bulkSelect=False):
         """
         _executemanybinds_
         b is a list of dictionaries for the binds, e.g.:
@@ -87,6 +150,9 @@ class DBInterface(WMObject):
         This will return a list of sqlalchemy.engine.base.ResultProxy object's
         one for each set of binds.
 
+        If bulkSelect is True and the query can be rewritten by bulkSelectBinds
+        all the binds are instead resolved by a single SELECT with an IN list.
+
         returns a list of sqlalchemy.engine.base.ResultProxy objects
         """
 
@@ -95,6 +161,13 @@ class DBInterface(WMObject):
             """
             Trying to select many
             """
+            if bulkSelect:
+                bulkSQL, bulkBinds = self.bulkSelectBinds(s, b)
+                if bulkSQL != None:
+                    return self.makelist(self.executebinds(bulkSQL, bulkBinds,
+                                                           connection=connection,
+                                                           returnCursor=returnCursor))
+
             if returnCursor:
                 result = []
                 for bind in b:
@@ -122,10 +195,12 @@ class DBInterface(WMObject):
 
 
     def processData(self, sqlstmt, binds={}, conn=None,
-                    transaction=False, returnCursor=False):
+                    transaction=False, returnCursor=False, bulkSelect=False):
         """
         set conn if you already have an active connection to reuse
         set transaction = True if you already have an active transaction
+        set bulkSelect = True to run a SELECT with a list of binds as one IN
+        list query per maxBindsPerQuery binds (see bulkSelectBinds)
 
         """
         connection = None
@@ -159,12 +234,14 @@ class DBInterface(WMObject):
                 while(len(binds) > self.maxBindsPerQuery):
                     result.extend(self.processData(sqlstmt, binds[:self.maxBindsPerQuery],
                                                    conn=connection, transaction=True,
-                                                   returnCursor=returnCursor))
+                                                   returnCursor=returnCursor,
+                                                   bulkSelect=bulkSelect))
                     binds = binds[self.maxBindsPerQuery:]
 
                 for i in sqlstmt:
                     result.extend(self.executemanybinds(i, binds, connection=connection,
-                                                        returnCursor=returnCursor))
+                                                        returnCursor=returnCursor,
+                                                        bulkSelect=bulkSelect))
                 if not transaction:
                     trans.commit()
             elif len(binds) == len(sqlstmt):
@@ -202,3 +279,48 @@ class DBInterface(WMObject):
             if not conn and connection != None:
                 connection.close() # Return connection to the pool
         return result
+
+    def processDataStream(self, sqlstmt, binds={}, conn=None, batchSize=None):
+        """
+        _processDataStream_
+
+        Streaming version of processData meant for large SELECTs. Instead of
+        copying every row into a ResultSet before returning, each cursor is
+        drained with fetchmany() and a ResultSet is yielded for every batch of
+        batchSize rows (streamBatchSize by default). Only one cursor is open at
+        a time, so a list of binds is executed lazily as the consumer iterates.
+
+        The connection (either conn or one taken from the pool) is held until
+        the generator is exhausted or closed. No transaction is started, pass
+        the connection of an active transaction in conn if needed.
+        """
+        batchSize = batchSize or self.streamBatchSize
+
+        sqlstmt = self.makelist(sqlstmt)
+        binds = self.makelist(binds)
+        if len(sqlstmt) > 0 and (len(binds) == 0 or (binds[0] == {} or binds[0] == None)):
+            statements = [(s, None) for s in sqlstmt]
+        elif len(binds) > len(sqlstmt) and len(sqlstmt) == 1:
+            statements = [(sqlstmt[0], b) for b in binds]
+        elif len(binds) == len(sqlstmt):
+            statements = list(zip(sqlstmt, binds))
+        else:
+            raise Exception("""DBInterface.processDataStream Nothing executed, problem with your arguments
+            Probably mismatched sizes for sql (%i) and binds (%i)""" % (len(sqlstmt), len(binds)))
+
+        connection = None
+        try:
+            if not conn:
+                connection = self.connection()
+            else:
+                connection = conn
+
+            for s, b in statements:
+                resultProxy = self.executebinds(s, b, connection=connection,
+                                                returnCursor=True)
+                for result in iterateCursor(resultProxy, batchSize):
+                    yield result
+        finally:
+            if not conn and connection != None:
+                connection.close() # Return connection to the pool
+        return
@@ -68,17 +68,17 @@ class DBFormatter(WMObject):
         """
         dictOut = []
         for r in result:
-            descriptions = r.keys
+            # WARNING: Oracle returns table names in CAP!
+            descriptions = [str(x.lower()) for x in r.keys]
             for i in r.fetchall():
                 #WARNING: this can generate errors for some stupid reason
                 # in both oracle and mysql.
                 entry = {}
                 for index in xrange(0,len(descriptions)):
-                    # WARNING: Oracle returns table names in CAP!
                     if type(i[index]) == unicode:
-                        entry[str(descriptions[index].lower())] = str(i[index])
+                        entry[descriptions[index]] = str(i[index])
                     else:
-                        entry[str(descriptions[index].lower())] = i[index]
+                        entry[descriptions[index]] = i[index]
 
                 dictOut.append(entry)
 
@@ -86,6 +86,44 @@ class DBFormatter(WMObject):
 
         return dictOut
 
+    def formatStream(self, result):
+        """
+        _formatStream_
+
+        Generator counterpart of format() for the output of
+        DBInterface.processDataStream. Rows are yielded as tuples, one at a
+        time, without building the full list of results.
+        """
+        for r in result:
+            for i in r.fetchall():
+                yield tuple(i)
+            r.close()
+
+    def formatDictStream(self, result):
+        """
+        _formatDictStream_
+
+        Generator counterpart of formatDict() for the output of
+        DBInterface.processDataStream. The column names are lowercased once
+        per cursor and a dictionary is yielded for every row.
+        """
+        descriptions = None
+        lastKeys = None
+        for r in result:
+            if r.keys is not lastKeys:
+                # WARNING: Oracle returns table names in CAP!
+                lastKeys = r.keys
+                descriptions = [str(x.lower()) for x in lastKeys]
+            for i in r.fetchall():
+                entry = {}
+                for index, value in enumerate(i):
+                    if type(value) == unicode:
+                        entry[descriptions[index]] = str(value)
+                    else:
+                        entry[descriptions[index]] = value
+                yield entry
+            r.close()
+
     def formatOneDict(self, result):
         """
         Return a dictionary representing the first record
@@ -127,13 +127,22 @@ class MySQLInterface(DBInterface):
         return DBInterface.executebinds(self, s, b, connection, returnCursor)
 
     def executemanybinds(self, s = None, b = None, connection = None,
-                         returnCursor = False):
+                         returnCursor = False, bulkSelect = False):
         """
         _executemanybinds_
 
         Execute a SQL statement that has multiple sets of bind variables.
         Transform the bind variables into the format that MySQL expects.
+        The IN list rewrite for bulk selects has to happen before the binds
+        are substituted.
         """
+        if bulkSelect:
+            bulkSQL, bulkBinds = self.bulkSelectBinds(s, b)
+            if bulkSQL != None:
+                return self.makelist(self.executebinds(bulkSQL, bulkBinds,
+                                                       connection = connection,
+                                                       returnCursor = returnCursor))
+
         newsql, binds = self.substitute(s, b)
 
         return DBInterface.executemanybinds(self, newsql, binds, connection,
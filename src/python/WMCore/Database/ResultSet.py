@@ -41,3 +41,47 @@ class ResultSet:
                 self.data.append(r)
 
         return
+
+    def addBatch(self, keys, rows):
+        """
+        _addBatch_
+
+        Fill the result set with a batch of rows already fetched from a cursor.
+        The key list is shared between all the batches of the same cursor, so
+        it is only read (and lowercased by the formatter) once per batch
+        instead of once per row.
+        """
+        self.keys = keys
+        self.data = rows
+        return
+
+
+def iterateCursor(resultproxy, batchSize):
+    """
+    _iterateCursor_
+
+    Drain a SQLAlchemy result proxy with fetchmany() and yield a ResultSet
+    for every batch of at most batchSize rows. The cursor is closed once it
+    has been exhausted or when the consumer stops iterating.
+    """
+    try:
+        if resultproxy.closed or not resultproxy.returns_rows:
+            return
+
+        if callable(resultproxy.keys):
+            keys = list(resultproxy.keys())
+        else:
+            keys = list(resultproxy.keys)
+
+        while True:
+            rows = resultproxy.fetchmany(batchSize)
+            if not rows:
+                break
+            result = ResultSet()
+            result.addBatch(keys, rows)
+            yield result
+    finally:
+        if not resultproxy.closed:
+            resultproxy.close()
+
+    return
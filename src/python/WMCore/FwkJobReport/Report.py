@@ -14,10 +14,6 @@ import sys
 import traceback
 import time
 import math
-try:
-    import cPickle as pickle
-except ImportError:
-    import pickle
 
 from WMCore.Configuration import ConfigSection
 
@@ -26,6 +22,7 @@ from WMCore.DataStructs.Run import Run
 
 from WMCore.FwkJobReport.FileInfo import FileInfo
 from WMCore.WMException           import WMException
+from WMCore.WMSpec.Persistency     import dumpPersisted, loadPersisted
 from WMCore.WMExceptions import WM_JOB_ERROR_CODES
 
 
@@ -142,9 +139,9 @@ class Report:
         Read in the FrameworkJobReport XML file produced
         by cmsRun and pull the information from it into this object
         """
-        from WMCore.FwkJobReport.XMLParser import xmlToJobReport
+        from WMCore.FwkJobReport.XMLParser import xmlToJobReportStreaming
         try:
-            xmlToJobReport(self, xmlfile)
+            xmlToJobReportStreaming(self, xmlfile)
         except Exception as ex:
             msg = "Error reading XML job report file, possibly corrupt XML File:\n"
             msg += "Details: %s" % str(ex)
@@ -341,15 +338,14 @@ class Report:
 
         return returnCode
 
-    def persist(self, filename):
+    def persist(self, filename, persistMode=None):
         """
         _persist_
 
-        Pickle this object and save it to disk.
+        Pickle this object and save it to disk, in the persistMode or
+        DEFAULT_PERSIST_MODE.
         """
-        handle = open(filename, 'w')
-        pickle.dump(self.data, handle)
-        handle.close()
+        dumpPersisted(self.data, filename, persistMode)
         return
 
     def unpersist(self, filename, reportname=None):
@@ -358,9 +354,7 @@ class Report:
 
         Load a pickled FWJR from disk.
         """
-        handle = open(filename, 'r')
-        self.data = pickle.load(handle)
-        handle.close()
+        self.data = loadPersisted(filename)
 
         # old self.report (if it existed) became unattached
         if reportname:
@@ -685,13 +679,13 @@ class Report:
         self.unpersist(filename)
         return
 
-    def save(self, filename):
+    def save(self, filename, persistMode=None):
         """
         _save_
 
         This just maps to persist
         """
-        self.persist(filename)
+        self.persist(filename, persistMode)
         return
 
     def getOutputModule(self, step, outputModule):
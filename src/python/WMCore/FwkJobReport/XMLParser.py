@@ -14,6 +14,11 @@ import re
 import logging
 import xml.parsers.expat
 
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+
 from WMCore.FwkJobReport import Report
 from WMCore.DataStructs.Run import Run
 from WMCore.Algorithms.ParseXMLFile import Node, xmlFileToNode, coroutine
@@ -44,24 +49,18 @@ def reportDispatcher(targets):
             continue
 
         for subnode in node.children:
-            if subnode.name == "File":
-                targets['File'].send( (report, subnode) )
-            elif subnode.name == "InputFile":
-                targets['InputFile'].send( (report, subnode) )
-            elif subnode.name == "AnalysisFile":
-                targets['AnalysisFile'].send( (report, subnode) )
-            elif subnode.name == "PerformanceReport":
-                targets['PerformanceReport'].send( (report, subnode))
-            elif subnode.name == "FrameworkError":
-                targets['FrameworkError'].send( (report, subnode) )
-            elif subnode.name == "SkippedFile":
-                targets['SkippedFile'].send( (report, subnode) )
-            elif subnode.name == "FallbackAttempt":
-                targets['FallbackAttempt'].send( (report, subnode) )
-            elif subnode.name == "SkippedEvent":
-                targets['SkippedEvent'].send( (report, subnode) )
-            else:
-                setattr(report.report.parameters, subnode.name, subnode.text)
+            dispatchReportNode(report, subnode, targets)
+
+def dispatchReportNode(report, subnode, targets):
+    """
+    _dispatchReportNode_
+
+    Send a child node of the FrameworkJobReport to its handler.
+    """
+    if subnode.name in targets:
+        targets[subnode.name].send( (report, subnode) )
+    else:
+        setattr(report.report.parameters, subnode.name, subnode.text)
 
 @coroutine
 def fileHandler(targets):
@@ -229,9 +228,12 @@ def runHandler():
                 runId = subnode.attrs.get("ID", None)
                 if runId == None: continue
 
-                lumis = [ int(lumi.attrs['ID'])
-                          for lumi in subnode.children
-                          if "ID" in lumi.attrs]
+                # the streaming parser reads the lumis directly
+                lumis = getattr(subnode, "lumis", None)
+                if lumis is None:
+                    lumis = [ int(lumi.attrs['ID'])
+                              for lumi in subnode.children
+                              if "ID" in lumi.attrs]
 
                 runInfo = Run(runNumber = runId)
                 runInfo.lumis.extend(lumis)
@@ -483,20 +485,13 @@ def perfStoreHandler():
 
 
 
-def xmlToJobReport(reportInstance, xmlFile):
+def reportDispatchers():
     """
-    _xmlToJobReport_
-
-    parse the XML file and insert the information into the
-    Report instance provided
+    _reportDispatchers_
 
+    Set up the coroutine pipeline, return the handlers of the children
+    of the FrameworkJobReport keyed by their name.
     """
-    # read XML, build node structure
-    node = xmlFileToNode(xmlFile)
-
-    #  //
-    # // Set up coroutine pipeline
-    #//
     fileDispatchers = {
         "Runs" : runHandler(),
         "Branches" : branchHandler(),
@@ -520,14 +515,95 @@ def xmlToJobReport(reportInstance, xmlFile):
         "FallbackAttempt" : fallbackAttemptHandler(),
         "SkippedEvent" : skippedEventHandler(),
         }
+    return dispatchers
+
+def xmlToJobReport(reportInstance, xmlFile):
+    """
+    _xmlToJobReport_
+
+    parse the XML file and insert the information into the
+    Report instance provided
+
+    """
+    # read XML, build node structure
+    node = xmlFileToNode(xmlFile)
 
     #  //
     # // Feed pipeline with node structure and report result instance
     #//
     reportBuilder(
         node, reportInstance,
-        reportDispatcher(dispatchers)
+        reportDispatcher(reportDispatchers())
         )
 
     return
+
+def _toStr(value):
+    """
+    _toStr_
+
+    ElementTree returns unicode for non ascii content, expat in the tree
+    parser returns utf-8 encoded strings.
+    """
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+    return str(value)
+
+def elementToNode(element):
+    """
+    _elementToNode_
+
+    Convert an ElementTree element to a Node, with the same text as the
+    tree parser would give it: the text of a leaf, or the text after the
+    last child. The branch names are never used and are dropped, the lumi
+    sections of a run are converted to a list of lumis.
+    """
+    node = Node(element.tag, {})
+    for key, value in element.attrib.items():
+        node.attrs[_toStr(key)] = _toStr(value)
+
+    children = list(element)
+    if not children:
+        node.text = _toStr(element.text or '').strip()
+    else:
+        node.text = _toStr(children[-1].tail or '').strip()
+        if element.tag == "Run":
+            node.lumis = [int(x.get("ID")) for x in children if "ID" in x.attrib]
+        elif element.tag != "Branches":
+            node.children = [elementToNode(child) for child in children]
+    return node
+
+def xmlToJobReportStreaming(reportInstance, xmlFile):
+    """
+    _xmlToJobReportStreaming_
+
+    Same as xmlToJobReport, but reading the XML file incrementally: each
+    child of the FrameworkJobReport (File, InputFile, PerformanceReport...)
+    is converted to a compact node as soon as it is parsed and then cleared,
+    so the element tree of the whole report is never in memory. The nodes
+    are handed to the handlers once the whole file is parsed, a corrupt
+    report leaves the job report untouched as with xmlToJobReport.
+    """
+    dispatchers = reportDispatchers()
+    nodes = []
+    depth = 0
+    root = None
+    for event, element in ElementTree.iterparse(xmlFile, events=("start", "end")):
+        if event == "start":
+            if depth == 0:
+                root = element
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth == 1 and root.tag == "FrameworkJobReport":
+            nodes.append(elementToNode(element))
+            root.clear()
+        elif depth == 0 and root.tag != "FrameworkJobReport":
+            print("Not Handling: ", root.tag)
+
+    for node in nodes:
+        dispatchReportNode(reportInstance, node, dispatchers)
+    return
+
 childrenMatching = lambda node, nname: [x for x in node.children if x.name == nname]
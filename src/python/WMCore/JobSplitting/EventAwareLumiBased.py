@@ -18,6 +18,7 @@ import traceback
 import math
 
 from WMCore.DataStructs.Run         import Run
+from WMCore.DataStructs.LumiIndex   import LumiIndex
 from WMCore.JobSplitting.JobFactory import JobFactory
 from WMCore.JobSplitting.LumiBased  import isGoodLumi, isGoodRun, LumiChecker
 from WMCore.WMBS.File               import File
@@ -96,7 +97,13 @@ class EventAwareLumiBased(JobFactory):
                     logging.error(msg)
                     return
 
+        # the lumis are checked one by one, index the mask first
+        goodRunList = LumiIndex(goodRunList)
+
         lDict = self.sortByLocation()
+        if getParents:
+            # find the parents of all the files at once
+            self.findParents([f['lfn'] for files in lDict.values() for f in files])
         locationDict = {}
 
         # First we need to load the data
@@ -66,6 +66,9 @@ class EventBased(JobFactory):
         totalJobs = 0
 
         locationDict = self.sortByLocation()
+        if getParents:
+            # find the parents of all the files at once
+            self.findParents([f['lfn'] for files in locationDict.values() for f in files])
         for location in locationDict:
             self.newGroup()
             fileList = locationDict[location]
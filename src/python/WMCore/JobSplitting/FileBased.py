@@ -40,6 +40,9 @@ class FileBased(JobFactory):
 
         #Get a dictionary of sites, files
         lDict = self.sortByLocation()
+        if getParents:
+            # find the parents of all the files at once
+            self.findParents([f['lfn'] for files in lDict.values() for f in files])
         locationDict = {}
 
         for key in lDict:
@@ -10,6 +10,7 @@ import threading
 from WMCore.DataStructs.WMObject import WMObject
 from WMCore.Services.UUID        import makeUUID
 from WMCore.WMBS.File            import File as WMBSFile
+from WMCore.WMBS.ParentageResolver import ParentageResolver
 from WMCore.DAOFactory           import DAOFactory
 
 
@@ -51,6 +52,7 @@ class JobFactory(WMObject):
                                          logger = myThread.logger,
                                          dbinterface = myThread.dbi)
             self.getParentInfoAction  = self.daoFactory(classname = "Files.GetParentInfo")
+            self.parentageResolver    = ParentageResolver(self.getParentInfoAction)
 
             self.pnn_to_psn = self.daoFactory(classname = "Locations.GetPNNtoPSNMapping").execute()
 
@@ -397,35 +399,17 @@ class JobFactory(WMObject):
 
         Find the parents for a file based on its lfn
         """
+        return self.findParents([lfn])[lfn]
 
-        parentsInfo = self.getParentInfoAction.execute([lfn])
-        newParents  = set()
-        for parentInfo in parentsInfo:
-
-            # This will catch straight to merge files that do not have redneck
-            # parents.  We will mark the straight to merge file from the job
-            # as a child of the merged parent.
-            if int(parentInfo["merged"]) == 1:
-                newParents.add(parentInfo["lfn"])
-
-            elif parentInfo['gpmerged'] == None:
-                continue
-
-            # Handle the files that result from merge jobs that aren't redneck
-            # children.  We have to setup parentage and then check on whether or
-            # not this file has any redneck children and update their parentage
-            # information.
-            elif int(parentInfo["gpmerged"]) == 1:
-                newParents.add(parentInfo["gplfn"])
-
-            # If that didn't work, we've reached the great-grandparents
-            # And we have to work via recursion
-            else:
-                parentSet = self.findParent(lfn = parentInfo['gplfn'])
-                for parent in parentSet:
-                    newParents.add(parent)
+    def findParents(self, lfns):
+        """
+        _findParents_
 
-        return newParents
+        Find the parents for a list of files based on their lfns, in bulk.
+        The parents are kept, so calling it with all the files before
+        calling findParent for each of them saves the database queries.
+        """
+        return self.parentageResolver.findParents(lfns)
 
     def getPerformanceParameters(self, defaultParams):
         """
@@ -16,6 +16,7 @@ import threading
 import traceback
 
 from WMCore.DataStructs.Run import Run
+from WMCore.DataStructs.LumiIndex import LumiIndex
 
 from WMCore.JobSplitting.JobFactory import JobFactory
 from WMCore.WMBS.File               import File
@@ -27,10 +28,16 @@ def isGoodLumi(goodRunList, run, lumi):
 
     Checks to see if runs match a run-lumi combination in the goodRunList
     This is a pain in the ass.
+
+    goodRunList is either the lumi mask dictionary or a LumiIndex over it,
+    which is much faster for long masks.
     """
-    if goodRunList == None or goodRunList == {}:
+    if goodRunList == None or len(goodRunList) == 0:
         return True
 
+    if isinstance(goodRunList, LumiIndex):
+        return goodRunList.contains(str(run), lumi)
+
     if not isGoodRun(goodRunList = goodRunList, run = run):
         return False
 
@@ -50,10 +57,10 @@ def isGoodRun(goodRunList, run):
 
     Tell if this is a good run
     """
-    if goodRunList == None or goodRunList == {}:
+    if goodRunList == None or len(goodRunList) == 0:
         return True
 
-    if str(run) in goodRunList.keys():
+    if str(run) in goodRunList:
         # @e can find a run
         return True
 
@@ -203,7 +210,13 @@ class LumiBased(JobFactory):
                     logging.error(msg)
                     return
 
+        # the lumis are checked one by one, index the mask first
+        goodRunList = LumiIndex(goodRunList)
+
         lDict = self.sortByLocation()
+        if getParents:
+            # find the parents of all the files at once
+            self.findParents([f['lfn'] for files in lDict.values() for f in files])
         locationDict = {}
 
         # First we need to load the data
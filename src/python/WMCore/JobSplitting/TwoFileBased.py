@@ -13,10 +13,8 @@ parentage information loaded so that the parents can be included in the job.
 
 
 import logging
-import threading
 
 from WMCore.JobSplitting.JobFactory import JobFactory
-from WMCore.DAOFactory              import DAOFactory
 
 from WMCore.WMBS.File  import File
 
@@ -37,22 +35,11 @@ class TwoFileBased(JobFactory):
         Create the DAOs
         """
 
-        myThread = threading.currentThread()
-
         JobFactory.__init__(self, package = 'WMCore.WMBS',
                             subscription = subscription,
                             generators = generators,
                             limit = limit)
 
-
-        self.daoFactory = DAOFactory(package = "WMCore.WMBS",
-                                     logger = myThread.logger,
-                                     dbinterface = myThread.dbi)
-
-        self.getParentInfoAction     = self.daoFactory(classname = "Files.GetParentInfo")
-
-
-
         return
 
 
@@ -73,6 +60,8 @@ class TwoFileBased(JobFactory):
 
         #Get a dictionary of sites, files
         locationDict = self.sortByLocation()
+        # find the parents of all the files at once
+        self.findParents([f['lfn'] for files in locationDict.values() for f in files])
 
         for location in locationDict.keys():
             #Now we have all the files in a certain location
@@ -111,43 +100,3 @@ class TwoFileBased(JobFactory):
 
 
         return
-
-
-
-
-    def findParent(self, lfn):
-        """
-        _findParent_
-
-        Find the parents for a file based on its lfn
-        """
-
-
-        parentsInfo = self.getParentInfoAction.execute([lfn])
-        newParents = set()
-        for parentInfo in parentsInfo:
-
-            # This will catch straight to merge files that do not have redneck
-            # parents.  We will mark the straight to merge file from the job
-            # as a child of the merged parent.
-            if int(parentInfo["merged"]) == 1:
-                newParents.add(parentInfo["lfn"])
-
-            elif parentInfo['gpmerged'] == None:
-                continue
-
-            # Handle the files that result from merge jobs that aren't redneck
-            # children.  We have to setup parentage and then check on whether or
-            # not this file has any redneck children and update their parentage
-            # information.
-            elif int(parentInfo["gpmerged"]) == 1:
-                newParents.add(parentInfo["gplfn"])
-
-            # If that didn't work, we've reached the great-grandparents
-            # And we have to work via recursion
-            else:
-                parentSet = self.findParent(lfn = parentInfo['gplfn'])
-                for parent in parentSet:
-                    newParents.add(parent)
-
-        return newParents
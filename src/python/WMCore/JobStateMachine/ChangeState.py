@@ -58,6 +58,43 @@ def discardConflictingDocument(couchDbInstance, data, result):
         return result
 
 
+def addJobStateTransition(docId, doc, transition):
+    """
+    _addJobStateTransition_
+
+    Client side version of the JobDump stateTransition update handler, add
+    a transition to the states of a job document. Missing documents are
+    created.
+    """
+    if doc is None:
+        doc = {"_id": docId, "states": {}}
+
+    maxKey = 0
+    for key in doc.get("states", {}).keys():
+        maxKey = max(maxKey, int(key))
+
+    doc.setdefault("states", {})[str(maxKey + 1)] = transition
+    return doc
+
+def addJobSummaryTransition(docId, doc, transition):
+    """
+    _addJobSummaryTransition_
+
+    Client side version of the WMStatsAgent jobSummaryState and
+    jobStateTransition update handlers, set the current state of a job
+    summary document and add the transition to its history. Missing
+    documents are not created.
+    """
+    if doc is None:
+        logging.error("Job summary document %s not found, state not updated" % docId)
+        return None
+
+    doc["state"] = transition["newstate"]
+    doc["timestamp"] = transition["timestamp"]
+    doc.setdefault("state_history", []).append(transition)
+    return doc
+
+
 class ChangeState(WMObject, WMConnectionBase):
     """
     Propagate the state of a job through the JSM.
@@ -96,13 +133,22 @@ class ChangeState(WMObject, WMConnectionBase):
         self.maxUploadedInputFiles = getattr(self.config.JobStateMachine, 'maxFWJRInputFiles', 1000)
         return
 
+    def _startBackgroundCommit(self, database):
+        """
+        Let the database post full queues from a worker thread if it was
+        requested in the configuration
+        """
+        if getattr(self.config.JobStateMachine, 'couchBackgroundCommit', False):
+            database.startBackgroundCommit()
+        return database
+
     def _connectDatabases(self):
         """
         Try connecting to the couchdbs
         """
         if not hasattr(self, 'jobsdatabase') or self.jobsdatabase is None:
             try:
-                self.jobsdatabase = self.couchdb.connectDatabase("%s/jobs" % self.dbname, size = 250)
+                self.jobsdatabase = self._startBackgroundCommit(self.couchdb.connectDatabase("%s/jobs" % self.dbname, size = 250))
             except Exception as ex:
                 logging.error("Error connecting to couch db '%s/jobs': %s" % (self.dbname, str(ex)))
                 self.jobsdatabase = None
@@ -110,7 +156,7 @@ class ChangeState(WMObject, WMConnectionBase):
 
         if not hasattr(self, 'fwjrdatabase') or self.fwjrdatabase is None:
             try:
-                self.fwjrdatabase = self.couchdb.connectDatabase("%s/fwjrs" % self.dbname, size = 250)
+                self.fwjrdatabase = self._startBackgroundCommit(self.couchdb.connectDatabase("%s/fwjrs" % self.dbname, size = 250))
             except Exception as ex:
                 logging.error("Error connecting to couch db '%s/fwjrs': %s" % (self.dbname, str(ex)))
                 self.fwjrdatabase = None
@@ -206,6 +252,9 @@ class ChangeState(WMObject, WMConnectionBase):
 
         timestamp = int(time.time())
         couchRecordsToUpdate = []
+        jobTransitions = {}
+        summaryTransitions = {}
+        recordedJobs = []
 
         for job in jobs:
             couchDocID = job.get("couch_record", None)
@@ -270,41 +319,35 @@ class ChangeState(WMObject, WMConnectionBase):
                                              "couchid": jobDocument["_id"]})
                 self.jobsdatabase.queue(jobDocument, callback = discardConflictingDocument)
             else:
-                # We send a PUT request to the stateTransition update handler.
-                # Couch expects the parameters to be passed as arguments to in
-                # the URI while the Requests class will only encode arguments
-                # this way for GET requests.  Changing the Requests class to
-                # encode PUT arguments as couch expects broke a bunch of code so
-                # we'll just do our own encoding here.
-                updateUri = "/" + self.jobsdatabase.name + "/_design/JobDump/_update/stateTransition/" + couchDocID
-                updateUri += "?oldstate=%s&newstate=%s&location=%s&timestamp=%s" % (oldstate,
-                                                                                    newstate,
-                                                                                    jobLocation,
-                                                                                    timestamp)
-                self.jobsdatabase.makeRequest(uri = updateUri, type = "PUT", decode = False)
+                # The transition is appended to the existing document in
+                # bulk once all the jobs have been looked at.
+                jobTransitions[couchDocID] = {"oldstate": oldstate,
+                                              "newstate": newstate,
+                                              "location": jobLocation,
+                                              "timestamp": timestamp}
 
             # updating the status of the summary doc only when it is explicitely requested
             # doc is already in couch
             if updatesummary:
-                jobSummaryId = job["name"]
-                updateUri = "/" + self.jsumdatabase.name + "/_design/WMStatsAgent/_update/jobSummaryState/" + jobSummaryId
                 # map retrydone state to jobfailed state for monitoring
                 if newstate == "retrydone":
                     monitorState = "jobfailed"
                 else:
                     monitorState = newstate
-                updateUri += "?newstate=%s&timestamp=%s" % (monitorState, timestamp)
-                self.jsumdatabase.makeRequest(uri = updateUri, type = "PUT", decode = False)
-                logging.debug("Updated job summary status for job %s" % jobSummaryId)
-                
-                updateUri = "/" + self.jsumdatabase.name + "/_design/WMStatsAgent/_update/jobStateTransition/" + jobSummaryId
-                updateUri += "?oldstate=%s&newstate=%s&location=%s&timestamp=%s" % (oldstate,
-                                                                                    monitorState,
-                                                                                    job["location"],
-                                                                                    timestamp)
-                self.jsumdatabase.makeRequest(uri = updateUri, type = "PUT", decode = False)
-                logging.debug("Updated job summary state history for job %s" % jobSummaryId)
+                summaryTransitions[job["name"]] = {"oldstate": oldstate,
+                                                   "newstate": monitorState,
+                                                   "location": job["location"],
+                                                   "timestamp": timestamp}
+
+            recordedJobs.append((job, couchDocID))
 
+        # Apply the state transitions with one _all_docs and one _bulk_docs
+        # request per chunk of documents. The job summaries have to be up to
+        # date before the FWJR summaries below read their state history.
+        self.bulkStateTransition(self.jobsdatabase, jobTransitions, addJobStateTransition)
+        self.bulkStateTransition(self.jsumdatabase, summaryTransitions, addJobSummaryTransition)
+
+        for job, couchDocID in recordedJobs:
             if job.get("fwjr", None):
 
                 # If there are too many input files, strip them out
@@ -439,6 +482,27 @@ class ChangeState(WMObject, WMConnectionBase):
         self.jsumdatabase.commit()
         return
 
+    def bulkStateTransition(self, database, transitions, addTransition):
+        """
+        _bulkStateTransition_
+
+        Add the transitions, a dictionary of document id to transition, to
+        the documents in database using addTransition to modify each of them.
+        """
+        if len(transitions) == 0:
+            return
+
+        failed = database.updateBulkDocuments(transitions.keys(),
+                                              lambda docId, doc: addTransition(docId, doc, transitions[docId]))
+        if len(failed) > 0:
+            logging.error("Failed to record the state transition of %d documents in %s" % (len(failed),
+                                                                                         database.name))
+            logging.debug("Documents not updated: %s" % failed)
+        else:
+            logging.debug("Recorded the state transition of %d documents in %s" % (len(transitions),
+                                                                                  database.name))
+        return
+
     def persist(self, jobs, newstate, oldstate):
         """
         _persist_
@@ -294,6 +294,49 @@ def hnName(candidate):
     return check(validName, candidate)
 
 
+LFN_REGEXPS = [
+    '/([a-z]+)/([a-z0-9]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([A-Z\-_]+)/([a-zA-Z0-9\-_]+)((/[0-9]+){3}){0,1}/([0-9]+)/([a-zA-Z0-9\-_]+).root',
+    '/([a-z]+)/([a-z0-9]+)/([a-z0-9]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([A-Z\-_]+)/([a-zA-Z0-9\-_]+)((/[0-9]+){3}){0,1}/([0-9]+)/([a-zA-Z0-9\-_]+).root',
+    '/store/(temp/)*(user|group)/(%(hnName)s|%(physics_group)s)/%(primDS)s/%(secondary)s/%(version)s/%(counter)s/%(root)s' % lfnParts,
+    '/store/(temp/)*(user|group)/(%(hnName)s|%(physics_group)s)/%(primDS)s/(%(subdir)s/)+%(root)s' % lfnParts,
+    # tier0 LFN
+    '/store/(backfill/[0-9]/){0,1}(t0temp/|unmerged/){0,1}(data|express|hidata)/%(era)s/%(primDS)s/%(tier)s/%(version)s/%(counter)s/%(counter)s/%(counter)s(/%(counter)s)?/%(root)s' % lfnParts,
+    # old style tier0 LFN
+    '/store/data/%(era)s/%(primDS)s/%(tier)s/%(version)s/%(counter)s/%(counter)s/%(counter)s/%(root)s' % lfnParts,
+    # store mc LFN
+    '/store/mc/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)(/([a-zA-Z0-9\-_]+))*/([a-zA-Z0-9\-_]+).root',
+    '/store/lhe/([0-9]+)/([a-zA-Z0-9\-_]+).lhe(.xz){0,1}',
+    # This is for future lhe LFN structure. Need to be tested.
+    '/store/lhe/%(primDS)s/%(secondary)s/([0-9]+)/([a-zA-Z0-9\-_]+).lhe(.xz){0,1}' % lfnParts,
+    '/store/results/%(physics_group)s/%(primDS)s/%(secondary)s/%(primDS)s/%(tier)s/%(secondary)s/%(counter)s/%(root)s' % lfnParts,
+    "%s/%s" % (STORE_RESULTS_LFN, '%(counter)s/%(root)s' % lfnParts)
+]
+
+LFN_BASE_REGEXPS = [
+    '/([a-z]+)/([a-z0-9]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([A-Z\-_]+)/([a-zA-Z0-9\-_]+)',
+    '/([a-z]+)/([a-z0-9]+)/([a-z0-9]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([A-Z\-_]+)/([a-zA-Z0-9\-_]+)((/[0-9]+){3}){0,1}',
+    '/(store)/(temp/)*(user|group)/(%(hnName)s|%(physics_group)s)/%(primDS)s/%(secondary)s/%(version)s' % lfnParts,
+    # tier0 LFN
+    '/store/(backfill/[0-9]/){0,1}(t0temp/|unmerged/){0,1}(data|express|hidata)/%(era)s/%(primDS)s/%(tier)s/%(version)s/%(counter)s/%(counter)s/%(counter)s' % lfnParts,
+    STORE_RESULTS_LFN
+]
+
+
+def combineRegexps(regexps):
+    """
+    _combineRegexps_
+
+    Build a single regular expression matching a string when any of the
+    regexps matches it, so it is checked in one pass. The groups are made
+    non capturing to stay below the limit on the number of groups.
+    """
+    return '|'.join(['(?:%s)' % re.sub(r'(?<!\\)\((?!\?)', '(?:', regexp) for regexp in regexps])
+
+
+LFN_RE = combineRegexps(LFN_REGEXPS)
+LFN_BASE_RE = combineRegexps(LFN_BASE_REGEXPS)
+
+
 def lfn(candidate):
     """
     Should be of the following form:
@@ -306,74 +349,7 @@ def lfn(candidate):
 
     Add for LHE files: /data/lhe/...
     """
-    regexp1 = '/([a-z]+)/([a-z0-9]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([A-Z\-_]+)/([a-zA-Z0-9\-_]+)((/[0-9]+){3}){0,1}/([0-9]+)/([a-zA-Z0-9\-_]+).root'
-    regexp2 = '/([a-z]+)/([a-z0-9]+)/([a-z0-9]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([A-Z\-_]+)/([a-zA-Z0-9\-_]+)((/[0-9]+){3}){0,1}/([0-9]+)/([a-zA-Z0-9\-_]+).root'
-    regexp3 = '/store/(temp/)*(user|group)/(%(hnName)s|%(physics_group)s)/%(primDS)s/%(secondary)s/%(version)s/%(counter)s/%(root)s' % lfnParts
-    regexp4 = '/store/(temp/)*(user|group)/(%(hnName)s|%(physics_group)s)/%(primDS)s/(%(subdir)s/)+%(root)s' % lfnParts
-
-    oldStyleTier0LFN = '/store/data/%(era)s/%(primDS)s/%(tier)s/%(version)s/%(counter)s/%(counter)s/%(counter)s/%(root)s' % lfnParts
-    tier0LFN = '/store/(backfill/[0-9]/){0,1}(t0temp/|unmerged/){0,1}(data|express|hidata)/%(era)s/%(primDS)s/%(tier)s/%(version)s/%(counter)s/%(counter)s/%(counter)s(/%(counter)s)?/%(root)s' % lfnParts
-
-    storeMcLFN = '/store/mc/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)(/([a-zA-Z0-9\-_]+))*/([a-zA-Z0-9\-_]+).root'
-
-    storeResults2LFN = '/store/results/%(physics_group)s/%(primDS)s/%(secondary)s/%(primDS)s/%(tier)s/%(secondary)s/%(counter)s/%(root)s' % lfnParts
-
-    storeResultRootPart = '%(counter)s/%(root)s' % lfnParts
-    storeResultsLFN = "%s/%s" % (STORE_RESULTS_LFN, storeResultRootPart)
-
-    lheLFN1 = '/store/lhe/([0-9]+)/([a-zA-Z0-9\-_]+).lhe(.xz){0,1}'
-    # This is for future lhe LFN structure. Need to be tested.
-    lheLFN2 = '/store/lhe/%(primDS)s/%(secondary)s/([0-9]+)/([a-zA-Z0-9\-_]+).lhe(.xz){0,1}' % lfnParts
-
-    try:
-        return check(regexp1, candidate)
-    except AssertionError:
-        pass
-
-    try:
-        return check(regexp2, candidate)
-    except AssertionError:
-        pass
-
-    try:
-        return check(regexp3, candidate)
-    except AssertionError:
-        pass
-
-    try:
-        return check(regexp4, candidate)
-    except AssertionError:
-        pass
-
-    try:
-        return check(tier0LFN, candidate)
-    except AssertionError:
-        pass
-
-    try:
-        return check(oldStyleTier0LFN, candidate)
-    except AssertionError:
-        pass
-
-    try:
-        return check(storeMcLFN, candidate)
-    except AssertionError:
-        pass
-
-    try:
-        return check(lheLFN1, candidate)
-    except AssertionError:
-        pass
-
-    try:
-        return check(lheLFN2, candidate)
-    except AssertionError:
-        pass
-
-    try:
-        return check(storeResults2LFN, candidate)
-    except AssertionError:
-        return check(storeResultsLFN, candidate)
+    return check(LFN_RE, candidate)
 
 
 def lfnBase(candidate):
@@ -381,31 +357,7 @@ def lfnBase(candidate):
     As lfn above, but for doing the lfnBase
     i.e., for use in spec generation and parsing
     """
-    regexp1 = '/([a-z]+)/([a-z0-9]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([A-Z\-_]+)/([a-zA-Z0-9\-_]+)'
-    regexp2 = '/([a-z]+)/([a-z0-9]+)/([a-z0-9]+)/([a-zA-Z0-9\-_]+)/([a-zA-Z0-9\-_]+)/([A-Z\-_]+)/([a-zA-Z0-9\-_]+)((/[0-9]+){3}){0,1}'
-    regexp3 = '/(store)/(temp/)*(user|group)/(%(hnName)s|%(physics_group)s)/%(primDS)s/%(secondary)s/%(version)s' % lfnParts
-
-    tier0LFN = '/store/(backfill/[0-9]/){0,1}(t0temp/|unmerged/){0,1}(data|express|hidata)/%(era)s/%(primDS)s/%(tier)s/%(version)s/%(counter)s/%(counter)s/%(counter)s' % lfnParts
-
-    try:
-        return check(regexp1, candidate)
-    except AssertionError:
-        pass
-
-    try:
-        return check(regexp2, candidate)
-    except AssertionError:
-        pass
-
-    try:
-        return check(regexp3, candidate)
-    except AssertionError:
-        pass
-
-    try:
-        return check(tier0LFN, candidate)
-    except AssertionError:
-        return check(STORE_RESULTS_LFN, candidate)
+    return check(LFN_BASE_RE, candidate)
 
 
 def userLfn(candidate):
@@ -453,15 +405,54 @@ def validateUrl(candidate):
     return check(regex_url, candidate)
 
 
+# compiled regular expressions, keyed by their string
+_compiledRegexps = {}
+
+
+def compileRegexp(regexp):
+    """
+    _compileRegexp_
+
+    Return the compiled regular expression, each expression is only compiled
+    once. Unlike the re module cache this one is never flushed.
+    """
+    try:
+        return _compiledRegexps[regexp]
+    except KeyError:
+        return _compiledRegexps.setdefault(regexp, re.compile(regexp))
+
+
 def check(regexp, candidate, maxLength=None):
     if maxLength != None:
         assert len(candidate) <= maxLength, \
             "%s is longer then max length (%s) allowed" % (candidate, maxLength)
-    assert re.compile(regexp).match(candidate) != None, \
+    assert compileRegexp(regexp).match(candidate) != None, \
         "'%s' does not match regular expression %s" % (candidate, regexp)
     return True
 
 
+def validateMany(kind, candidates):
+    """
+    _validateMany_
+
+    Validate a list of candidates with the check named kind, i.e. 'lfn',
+    or with a check function. Returns the list of the results, True or
+    False for each candidate, instead of raising AssertionError.
+    """
+    if kind in _SINGLE_REGEXP_CHECKS:
+        matcher = compileRegexp(_SINGLE_REGEXP_CHECKS[kind]).match
+        return [isinstance(x, basestring) and matcher(x) is not None for x in candidates]
+
+    checkFunction = kind if callable(kind) else globals()[kind]
+    results = []
+    for candidate in candidates:
+        try:
+            results.append(bool(checkFunction(candidate)))
+        except (AssertionError, TypeError, ValueError, AttributeError):
+            results.append(False)
+    return results
+
+
 def parseLFN(candidate):
     """
     _parseLFN_
@@ -643,3 +634,10 @@ def activity(candidate):
     if candidate in dashboardActivities:
         return True
     raise AssertionError("Invalid dashboard activity: %s should 'test'" % candidate)
+
+
+# checks which are a single regular expression, validateMany matches them directly
+_SINGLE_REGEXP_CHECKS = {'lfn': LFN_RE,
+                         'lfnBase': LFN_BASE_RE,
+                         'dataset': DATASET_RE,
+                         'searchdataset': SEARCHDATASET_RE}
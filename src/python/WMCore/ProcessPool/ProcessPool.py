@@ -12,7 +12,11 @@ import sys
 import logging
 import os
 import threading
+import time
 import traceback
+import resource
+import json
+from collections import deque
 try:
     import cPickle as pickle
 except ImportError:
@@ -38,6 +42,77 @@ class ProcessPoolException(WMException):
     """
 
 
+class ProcessPoolTransport(object):
+    """
+    _ProcessPoolTransport_
+
+    Serialise the work items and the results going through the ZMQ sockets.
+
+    The json transport sends every item as a separate JSON message, objects
+    are thunked through their __to_json__ methods.  The binary transport
+    pickles the items with the highest protocol, so they only have to be
+    picklable, and sends up to batchSize of them as the frames of a single
+    multipart message.
+    """
+    def __init__(self, transport="json", batchSize=100):
+        if transport not in ("json", "binary"):
+            raise ProcessPoolException("Unknown ProcessPool transport: %s" % transport)
+
+        self.transport = transport
+        self.batchSize = max(int(batchSize), 1)
+        # Use the Services.Requests JSONizer, which handles __to_json__ calls
+        self.jsonHandler = JSONRequests()
+        return
+
+    def encode(self, item):
+        """
+        _encode_
+
+        Serialise a single item.
+        """
+        if self.transport == "binary":
+            return pickle.dumps(item, pickle.HIGHEST_PROTOCOL)
+        return self.jsonHandler.encode(item)
+
+    def decode(self, data):
+        """
+        _decode_
+
+        Deserialise a single item.
+        """
+        if self.transport == "binary":
+            return pickle.loads(data)
+        return self.jsonHandler.decode(data)
+
+    def send(self, socket, items):
+        """
+        _send_
+
+        Send a list of items, returns the number of messages sent.
+        """
+        if self.transport == "json":
+            for item in items:
+                socket.send(self.encode(item))
+            return len(items)
+
+        messages = 0
+        for start in range(0, len(items), self.batchSize):
+            socket.send_multipart([self.encode(x) for x in items[start:start + self.batchSize]])
+            messages += 1
+        return messages
+
+    def recv(self, socket):
+        """
+        _recv_
+
+        Block until the next message arrives and return the list of items
+        in it.
+        """
+        if self.transport == "json":
+            return [self.decode(socket.recv())]
+        return [self.decode(x) for x in socket.recv_multipart()]
+
+
 class ProcessPoolWorker:
     """
     _ProcessPoolWorker_
@@ -64,7 +139,7 @@ class ProcessPoolWorker:
 class ProcessPool:
     def __init__(self, slaveClassName, totalSlaves, componentDir,
                  config, namespace='WMComponent', inPort='5555',
-                 outPort='5558'):
+                 outPort='5558', transport='json', batchSize=100):
         """
         __init__
 
@@ -78,13 +153,18 @@ class ProcessPool:
         parameters.  It is not passed to the slave class.  The slaveInit
         parameter will be serialized and passed to the slave class's
         constructor.
+
+        The transport is either 'json' or 'binary', see ProcessPoolTransport.
+        With the binary transport up to batchSize work items are sent to a
+        slave in a single message, and its results come back the same way.
         """
         self.enqueueIndex = 0
         self.dequeueIndex = 0
         self.runningWork = 0
+        # results received but not dequeued yet
+        self.receivedWork = []
 
-        # Use the Services.Requests JSONizer, which handles __to_json__ calls
-        self.jsonHandler = JSONRequests()
+        self.transport = ProcessPoolTransport(transport, batchSize)
 
         # heartbeat should be registered at this point
         if getattr(config.Agent, "useHeartbeat", True):
@@ -114,28 +194,18 @@ class ProcessPool:
 
         # Set up ZMQ
         try:
-            context = zmq.Context()
-            self.sender = context.socket(zmq.PUSH)
-            self.sender.bind("tcp://*:%s" % inPort)
-            self.sink = context.socket(zmq.PULL)
-            self.sink.bind("tcp://*:%s" % outPort)
+            self.bindSockets()
         except zmq.ZMQError:
             # Try this again in a moment to see
             # if it's just being held by something pre-existing
-            import time
             time.sleep(1)
             logging.error("Blocked socket on startup: Attempting sleep to give it time to clear.")
             try:
-                context = zmq.Context()
-                self.sender = context.socket(zmq.PUSH)
-                self.sender.bind("tcp://*:%s" % inPort)
-                self.sink = context.socket(zmq.PULL)
-                self.sink.bind("tcp://*:%s" % outPort)
+                self.bindSockets()
             except Exception as ex:
                 msg = "Error attempting to open TCP sockets\n"
                 msg += str(ex)
                 logging.error(msg)
-                import traceback
                 print(traceback.format_exc())
                 raise ProcessPoolException(msg)
 
@@ -144,6 +214,19 @@ class ProcessPool:
 
         return
 
+    def bindSockets(self):
+        """
+        _bindSockets_
+
+        Open the ZMQ sockets the slaves connect to.
+        """
+        context = zmq.Context()
+        self.sender = context.socket(zmq.PUSH)
+        self.sender.bind("tcp://*:%s" % self.inPort)
+        self.sink = context.socket(zmq.PULL)
+        self.sink.bind("tcp://*:%s" % self.outPort)
+        return
+
     def createSlaves(self):
         """
         _createSlaves_
@@ -161,7 +244,8 @@ class ProcessPool:
         outPort = self.outPort
 
         slaveArgs = [self.versionString, __file__, self.slaveClassName, inPort,
-                     outPort, self.configPath, self.componentDir, self.namespace]
+                     outPort, self.configPath, self.componentDir, self.namespace,
+                     self.transport.transport, str(self.transport.batchSize)]
 
         count = 0
         while totalSlaves > 0:
@@ -186,7 +270,7 @@ class ProcessPool:
         """
         __del__
 
-        Kill all the workers processes by sending them an invalid JSON object.
+        Kill all the workers processes by sending them a STOP message.
         This will cause them to shut down.
         """
         self.close()
@@ -204,8 +288,7 @@ class ProcessPool:
         """
         for i in range(self.nSlaves):
             try:
-                encodedWork = self.jsonHandler.encode('STOP')
-                self.sender.send(encodedWork)
+                self.transport.send(self.sender, ['STOP'])
             except Exception as ex:
                 # Might be already failed.  Nothing you can
                 # really do about that.
@@ -243,7 +326,7 @@ class ProcessPool:
         __enqeue__
 
         Assign work to the workers processes.  The work parameters must be a
-        list where each item in the list can be serialized into JSON.
+        list where each item in the list can be serialized by the transport.
 
         If list is True, the entire list is sent as one piece of work
         """
@@ -254,13 +337,10 @@ class ProcessPool:
             raise ProcessPoolException(msg)
 
         if not list:
-            for w in work:
-                encodedWork = self.jsonHandler.encode(w)
-                self.sender.send(encodedWork)
-                self.runningWork += 1
+            self.transport.send(self.sender, work)
+            self.runningWork += len(work)
         else:
-            encodedWork = self.jsonHandler.encode(work)
-            self.sender.send(encodedWork)
+            self.transport.send(self.sender, [work])
             self.runningWork += 1
 
         return
@@ -272,8 +352,15 @@ class ProcessPool:
         Retrieve completed work from the slave workers.  This method will block
         until enough work has been completed.
         """
-        completedWork = []
+        return [x for x in self.iterDequeue(totalItems)]
 
+    def iterDequeue(self, totalItems=1):
+        """
+        _iterDequeue_
+
+        Retrieve completed work from the slave workers, yielding every result
+        as soon as it arrives.  Stops after totalItems results.
+        """
         if totalItems > self.runningWork:
             msg = "Asked to dequeue more work then is running!\n"
             msg += "Failing"
@@ -282,8 +369,9 @@ class ProcessPool:
 
         while totalItems > 0:
             try:
-                output = self.sink.recv()
-                decode = self.jsonHandler.decode(output)
+                if not self.receivedWork:
+                    self.receivedWork = self.transport.recv(self.sink)
+                decode = self.receivedWork.pop(0)
                 if isinstance(decode, dict) and decode.get('type', None) == 'ERROR':
                     # Then we had some kind of error
                     msg = decode.get('msg', 'Unknown Error in ProcessPool')
@@ -291,16 +379,17 @@ class ProcessPool:
                     logging.error(msg)
                     self.close()
                     raise ProcessPoolException(msg)
-                completedWork.append(decode)
-                self.runningWork -= 1
-                totalItems -= 1
             except Exception as ex:
                 msg = "Exception while getting slave outputin ProcessPool.\n"
                 msg += str(ex)
                 logging.error(msg)
                 break
 
-        return completedWork
+            self.runningWork -= 1
+            totalItems -= 1
+            yield decode
+
+        return
 
     def restart(self):
         """
@@ -314,6 +403,331 @@ class ProcessPool:
         return
 
 
+class AdaptiveProcessPool(ProcessPool):
+    """
+    _AdaptiveProcessPool_
+
+    A process pool whose slaves ask for work instead of having it pushed to
+    them round robin, so a slow work item only holds up the slave processing
+    it.  The master keeps the queue of messages and hands the next one to
+    the first slave that is done with the previous one.
+
+    The pool starts with totalSlaves slaves and grows up to maxSlaves while
+    messages are waiting for a free slave; slaves idle for more than
+    idleTimeout seconds are stopped again, down to totalSlaves.  Slaves whose
+    peak RSS goes over maxSlaveRSS MB exit after replying and get replaced,
+    and the messages of slaves that died are sent again to another one.
+
+    Each slave reports its throughput, latency and RSS with every reply,
+    they are available from getMetrics() and saved in the worker heartbeat.
+    The work is dispatched while dequeuing, so enqueue() then dequeue() or
+    iterDequeue() as with the ProcessPool.
+    """
+    def __init__(self, slaveClassName, totalSlaves, componentDir,
+                 config, namespace='WMComponent', inPort='5555',
+                 outPort='5558', transport='json', batchSize=100,
+                 maxSlaves=None, maxSlaveRSS=None, idleTimeout=60,
+                 heartbeatInterval=60):
+        self.minSlaves = max(int(totalSlaves), 1)
+        self.maxSlaves = max(int(maxSlaves or totalSlaves), self.minSlaves)
+        self.maxSlaveRSS = maxSlaveRSS
+        self.idleTimeout = idleTimeout
+        self.heartbeatInterval = heartbeatInterval
+
+        self.slaves = {}
+        self.slaveCount = 0
+        self.pendingWork = deque()
+        self.lastHeartbeat = {}
+
+        ProcessPool.__init__(self, slaveClassName, totalSlaves, componentDir,
+                             config, namespace=namespace, inPort=inPort,
+                             outPort=outPort, transport=transport,
+                             batchSize=batchSize)
+        return
+
+    def bindSockets(self):
+        """
+        _bindSockets_
+
+        Open the single ROUTER socket the slaves talk through.
+        """
+        context = zmq.Context()
+        self.router = context.socket(zmq.ROUTER)
+        self.router.bind("tcp://*:%s" % self.inPort)
+        return
+
+    def createSlaves(self):
+        """
+        _createSlaves_
+
+        Start the minimum number of slaves.
+        """
+        while len(self.slaves) < self.minSlaves:
+            self.startSlave()
+        return
+
+    def startSlave(self):
+        """
+        _startSlave_
+
+        Start a new slave process, it asks for work once it is set up.
+        """
+        name = self._subProcessName(self.slaveClassName, self.slaveCount)
+        self.slaveCount += 1
+
+        slaveArgs = [self.versionString, __file__, self.slaveClassName, self.inPort,
+                     self.outPort, self.configPath, self.componentDir, self.namespace,
+                     self.transport.transport, str(self.transport.batchSize),
+                     name, str(self.maxSlaveRSS or 0)]
+        slaveProcess = subprocess.Popen(slaveArgs, stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE)
+        self.workers.append(slaveProcess)
+        self.slaves[name] = {'process': slaveProcess, 'ready': False, 'work': None,
+                             'sent': None, 'idleSince': time.time(),
+                             'metrics': {'pid': slaveProcess.pid, 'processed': 0,
+                                         'throughput': 0.0, 'latency': 0.0, 'rss': 0}}
+        logging.info("Started ProcessPool slave %s", name)
+        return
+
+    def stopSlave(self, name):
+        """
+        _stopSlave_
+
+        Tell an idle slave to exit.
+        """
+        slave = self.slaves.pop(name)
+        try:
+            self.router.send_multipart([name, "STOP"])
+        except Exception as ex:
+            logging.error("Failure stopping slave %s: %s", name, str(ex))
+        self.workers.remove(slave['process'])
+        slave['process'].wait()
+        logging.info("Stopped idle ProcessPool slave %s", name)
+        return
+
+    def close(self):
+        """
+        _close_
+
+        Stop all the slaves and close the socket.
+        """
+        for name in self.slaves.keys():
+            try:
+                self.router.send_multipart([name, "STOP"])
+            except Exception as ex:
+                logging.error("Failure killing running process: %s" % str(ex))
+        self.slaves = {}
+
+        try:
+            self.router.close()
+        except Exception:
+            pass
+
+        for worker in self.workers:
+            try:
+                worker.wait()
+            except Exception as ex:
+                logging.error("Failure to wait for process: %s", str(ex))
+        self.workers = []
+        return
+
+    def enqueue(self, work, list=False):
+        """
+        __enqueue__
+
+        Queue work for the slaves, it is handed to them while dequeuing.
+        """
+        if len(self.workers) < 1:
+            # Someone's shut down the system
+            msg = "Attempting to send work after system failure and shutdown!\n"
+            logging.error(msg)
+            raise ProcessPoolException(msg)
+
+        if list:
+            work = [work]
+        batchSize = self.transport.batchSize if self.transport.transport == "binary" else 1
+        for start in range(0, len(work), batchSize):
+            self.pendingWork.append([self.transport.encode(x) for x in work[start:start + batchSize]])
+        self.runningWork += len(work)
+        return
+
+    def dispatch(self):
+        """
+        _dispatch_
+
+        Hand the queued messages to the idle slaves, then resize the pool.
+        """
+        for name, slave in self.slaves.items():
+            if not self.pendingWork:
+                break
+            if slave['ready'] and slave['work'] is None:
+                slave['work'] = self.pendingWork.popleft()
+                slave['sent'] = time.time()
+                self.router.send_multipart([name, "WORK"] + slave['work'])
+
+        idle = [x for x in self.slaves if self.slaves[x]['work'] is None]
+        if self.pendingWork:
+            starting = len([x for x in idle if not self.slaves[x]['ready']])
+            toStart = min(len(self.pendingWork) - starting, self.maxSlaves - len(self.slaves))
+            for _ in range(toStart):
+                self.startSlave()
+        else:
+            now = time.time()
+            for name in idle:
+                if len(self.slaves) <= self.minSlaves:
+                    break
+                if self.slaves[name]['ready'] and now - self.slaves[name]['idleSince'] > self.idleTimeout:
+                    self.stopSlave(name)
+        return
+
+    def checkSlaves(self):
+        """
+        _checkSlaves_
+
+        Replace the slaves that died, their work is queued again.
+        """
+        for name, slave in self.slaves.items():
+            if slave['process'].poll() is None:
+                continue
+
+            logging.error("ProcessPool slave %s exited with code %s", name, slave['process'].returncode)
+            if not slave['ready']:
+                # it will not do any better the next time
+                msg = "ProcessPool slave %s failed on startup" % name
+                logging.error(msg)
+                raise ProcessPoolException(msg)
+            if slave['work'] is not None:
+                self.pendingWork.appendleft(slave['work'])
+            del self.slaves[name]
+            self.workers.remove(slave['process'])
+
+        if len(self.slaves) < self.minSlaves:
+            self.createSlaves()
+        return
+
+    def handleReply(self, frames):
+        """
+        _handleReply_
+
+        Process a message from a slave, returns the results in it.
+        """
+        name, kind, metrics = frames[0], frames[1], json.loads(frames[2])
+        slave = self.slaves.get(name, None)
+        if slave is None:
+            # a slave that was already stopped
+            return []
+
+        now = time.time()
+        results = []
+        if kind == "DONE":
+            latency = now - slave['sent']
+            slave['metrics']['latency'] = 0.8 * slave['metrics']['latency'] + 0.2 * latency \
+                                          if slave['metrics']['processed'] else latency
+            results = [self.transport.decode(x) for x in frames[3:]]
+
+        slave['metrics'].update(metrics)
+        slave['ready'] = True
+        slave['work'] = None
+        slave['idleSince'] = now
+        self.updateHeartbeat(name, slave)
+
+        if metrics.get('exiting', False):
+            logging.info("ProcessPool slave %s exceeded %s MB and exits", name, self.maxSlaveRSS)
+            del self.slaves[name]
+            self.workers.remove(slave['process'])
+            slave['process'].wait()
+            self.createSlaves()
+        return results
+
+    def updateHeartbeat(self, name, slave):
+        """
+        _updateHeartbeat_
+
+        Save the metrics of a slave in its heartbeat, at most once every
+        heartbeatInterval seconds.
+        """
+        if not hasattr(self, "heartbeatAPI"):
+            return
+        if time.time() - self.lastHeartbeat.get(name, 0) < self.heartbeatInterval:
+            return
+
+        metrics = slave['metrics']
+        state = "Running: %d items, %.2f items/s, %.3f s latency, %d MB RSS" % \
+                (metrics['processed'], metrics['throughput'], metrics['latency'], metrics['rss'])
+        try:
+            self.heartbeatAPI.updateWorkerHeartbeat(name, state, metrics['pid'])
+            self.lastHeartbeat[name] = time.time()
+        except Exception as ex:
+            logging.error("Failed to update the heartbeat of %s: %s", name, str(ex))
+        return
+
+    def getMetrics(self):
+        """
+        _getMetrics_
+
+        Return the metrics of every slave keyed by slave name: pid, number of
+        items processed, throughput in items per busy second, latency of a
+        message in seconds and peak RSS in MB.
+        """
+        return dict([(x, dict(self.slaves[x]['metrics'])) for x in self.slaves])
+
+    def iterDequeue(self, totalItems=1):
+        """
+        _iterDequeue_
+
+        Dispatch the queued work and yield the results as they arrive.
+        Stops after totalItems results.
+        """
+        if totalItems > self.runningWork:
+            msg = "Asked to dequeue more work then is running!\n"
+            msg += "Failing"
+            logging.error(msg)
+            raise ProcessPoolException(msg)
+
+        while totalItems > 0:
+            try:
+                while not self.receivedWork:
+                    self.dispatch()
+                    if self.router.poll(1000):
+                        self.receivedWork = self.handleReply(self.router.recv_multipart())
+                    else:
+                        self.checkSlaves()
+                decode = self.receivedWork.pop(0)
+                if isinstance(decode, dict) and decode.get('type', None) == 'ERROR':
+                    # Then we had some kind of error
+                    msg = decode.get('msg', 'Unknown Error in ProcessPool')
+                    logging.error("Received Error Message from ProcessPool Slave")
+                    logging.error(msg)
+                    self.close()
+                    raise ProcessPoolException(msg)
+            except Exception as ex:
+                msg = "Exception while getting slave outputin ProcessPool.\n"
+                msg += str(ex)
+                logging.error(msg)
+                break
+
+            self.runningWork -= 1
+            totalItems -= 1
+            yield decode
+
+        return
+
+    def restart(self):
+        """
+        _restart_
+
+        Stop all the slaves and start the minimum number again, queued work
+        is kept.
+        """
+        for name, slave in self.slaves.items():
+            if slave['work'] is not None:
+                self.pendingWork.appendleft(slave['work'])
+        self.close()
+        self.bindSockets()
+        self.createSlaves()
+        return
+
+
 def setupLogging(componentDir):
     """
     _setupLogging_
@@ -353,6 +767,79 @@ def setupDB(config, wmInit):
     return
 
 
+def formatCrashMessage(ex):
+    """
+    _formatCrashMessage_
+
+    Build the error message sent back when the slave class raised.
+    """
+    crashMessage = "Slave process crashed with exception: " + str(ex)
+    crashMessage += "\nStacktrace:\n"
+
+    stackTrace = traceback.format_tb(sys.exc_info()[2], None)
+    for stackFrame in stackTrace:
+        crashMessage += stackFrame
+    return crashMessage
+
+
+def peakRSS():
+    """
+    _peakRSS_
+
+    Peak resident memory of this process in MB.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+
+
+def runAdaptiveSlave(socket, slaveClass, transport, maxSlaveRSS):
+    """
+    _runAdaptiveSlave_
+
+    Main loop of an AdaptiveProcessPool slave: ask for work, process it and
+    send back the results with the slave metrics.  The slave exits when
+    told to, after a crash or once its peak RSS is over maxSlaveRSS MB.
+    """
+    processed = 0
+    busyTime = 0.0
+    metrics = {'pid': os.getpid(), 'processed': processed, 'throughput': 0.0,
+               'rss': peakRSS(), 'exiting': False}
+    socket.send_multipart(["READY", json.dumps(metrics)])
+
+    while not metrics['exiting']:
+        frames = socket.recv_multipart()
+        if frames[0] == "STOP":
+            break
+
+        startTime = time.time()
+        outputs = []
+        crashed = False
+        for frame in frames[1:]:
+            try:
+                output = slaveClass(transport.decode(frame))
+            except Exception as ex:
+                crashMessage = formatCrashMessage(ex)
+                logging.error(crashMessage)
+                outputs.append({'type': 'ERROR', 'msg': crashMessage})
+                crashed = True
+                break
+
+            if output != None:
+                if isinstance(output, list):
+                    outputs.extend(output)
+                else:
+                    outputs.append(output)
+
+        processed += len(frames) - 1
+        busyTime += time.time() - startTime
+        metrics = {'pid': os.getpid(), 'processed': processed,
+                   'throughput': processed / busyTime if busyTime > 0 else 0.0,
+                   'rss': peakRSS()}
+        metrics['exiting'] = crashed or bool(maxSlaveRSS and metrics['rss'] > maxSlaveRSS)
+        socket.send_multipart(["DONE", json.dumps(metrics)] + [transport.encode(x) for x in outputs])
+
+    return
+
+
 if __name__ == "__main__":
     """
     __main__
@@ -363,7 +850,9 @@ if __name__ == "__main__":
     in through stdin as a JSON object.
 
     Input variables:
-    className, input port, output port, path to pickled config, component dir, namespace
+    className, input port, output port, path to pickled config, component dir, namespace,
+    transport, batch size and for AdaptiveProcessPool slaves the slave name and
+    RSS limit
     """
 
     # Get variables passed in
@@ -373,17 +862,24 @@ if __name__ == "__main__":
     configPath = sys.argv[4]
     componentDir = sys.argv[5]
     namespace = sys.argv[6]
+    transport = ProcessPoolTransport(*sys.argv[7:9])
+    adaptiveSlave = len(sys.argv) > 9
 
     # Set up logging
     setupLogging(componentDir)
 
     # Build ZMQ link
     context = zmq.Context()
-    receiver = context.socket(zmq.PULL)
-    receiver.connect("tcp://localhost:%s" % inPort)
+    if adaptiveSlave:
+        receiver = context.socket(zmq.DEALER)
+        receiver.setsockopt(zmq.IDENTITY, sys.argv[9])
+        receiver.connect("tcp://localhost:%s" % inPort)
+    else:
+        receiver = context.socket(zmq.PULL)
+        receiver.connect("tcp://localhost:%s" % inPort)
 
-    sender = context.socket(zmq.PUSH)
-    sender.connect("tcp://localhost:%s" % outPort)
+        sender = context.socket(zmq.PUSH)
+        sender.connect("tcp://localhost:%s" % outPort)
 
     # Build config
     if not os.path.exists(configPath):
@@ -400,59 +896,57 @@ if __name__ == "__main__":
     wmInit = WMInit()
     setupDB(config, wmInit)
 
-    # Create JSON handler
-    jsonHandler = JSONRequests()
-
     wmFactory = WMFactory(name="slaveFactory", namespace=namespace)
     slaveClass = wmFactory.loadObject(classname=slaveClassName, args=config)
 
     logging.info("Have slave class")
 
-    while (True):
-        encodedInput = receiver.recv()
+    if adaptiveSlave:
+        runAdaptiveSlave(receiver, slaveClass, transport, int(sys.argv[10]))
+        logging.info("Process with PID %s finished" % (os.getpid()))
+        sys.exit(0)
 
+    stop = False
+    while not stop:
         try:
-            input = jsonHandler.decode(encodedInput)
+            inputs = transport.recv(receiver)
         except Exception as ex:
             logging.error("Error decoding: %s" % str(ex))
             break
 
-        if input == "STOP":
-            break
-
-        try:
-            logging.error(input)
-            output = slaveClass(input)
-        except Exception as ex:
-            crashMessage = "Slave process crashed with exception: " + str(ex)
-            crashMessage += "\nStacktrace:\n"
-
-            stackTrace = traceback.format_tb(sys.exc_info()[2], None)
-            for stackFrame in stackTrace:
-                crashMessage += stackFrame
+        # the results of a message go back in a single message
+        outputs = []
+        for input in inputs:
+            if input == "STOP":
+                stop = True
+                break
 
-            logging.error(crashMessage)
             try:
-                output = {'type': 'ERROR', 'msg': crashMessage}
-                encodedOutput = jsonHandler.encode(output)
-                sender.send(encodedOutput)
-                logging.error("Sent error message and now breaking")
-                break
+                logging.debug(input)
+                output = slaveClass(input)
             except Exception as ex:
-                logging.error("Failed to send error message")
-                logging.error(str(ex))
-                del jsonHandler
-                sys.exit(1)
-
-        if output != None:
-            if isinstance(output, list):
-                for item in output:
-                    encodedOutput = jsonHandler.encode(item)
-                    sender.send(encodedOutput)
-            else:
-                encodedOutput = jsonHandler.encode(output)
-                sender.send(encodedOutput)
+                crashMessage = formatCrashMessage(ex)
+                logging.error(crashMessage)
+                try:
+                    outputs.append({'type': 'ERROR', 'msg': crashMessage})
+                    transport.send(sender, outputs)
+                    logging.error("Sent error message and now breaking")
+                    outputs = []
+                    stop = True
+                    break
+                except Exception as ex:
+                    logging.error("Failed to send error message")
+                    logging.error(str(ex))
+                    sys.exit(1)
+
+            if output != None:
+                if isinstance(output, list):
+                    outputs.extend(output)
+                else:
+                    outputs.append(output)
+
+        if outputs:
+            transport.send(sender, outputs)
 
     logging.info("Process with PID %s finished" % (os.getpid()))
-    del jsonHandler
     sys.exit(0)
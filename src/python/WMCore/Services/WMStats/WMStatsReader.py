@@ -308,7 +308,54 @@ class WMStatsReader(object):
         
         return self.getRequestByStatus(WMStatsReader.T0_ACTIVE_STATUS, jobInfoFlag)
     
-    def getRequestByStatus(self, statusList, jobInfoFlag = False, limit = None, skip = None, 
+    def getChangeSequences(self):
+        """
+        Return the current update sequence numbers of the wmstats and the
+        request databases, to follow their _changes feeds from.
+        """
+        return {"wmstats": self.couchDB.info()["update_seq"],
+                "reqmgr": self.reqDB.couchDB.info()["update_seq"]}
+
+    def getActiveDataChanges(self, changeSequences, statusList = None):
+        """
+        Return the changes to the active data since the changeSequences, as
+        returned by getChangeSequences, as a tuple of
+          - {requestName: requestDoc} of the changed active requests
+          - list of changed requests which are not active any more
+          - list of the changed agent_request job info documents
+          - the sequence numbers to get the next changes from
+        """
+        if statusList is None:
+            statusList = WMStatsReader.ACTIVE_STATUS
+
+        requestChanges = self.reqDB.couchDB.changes(since = changeSequences["reqmgr"])
+        jobChanges = self.couchDB.changes(since = changeSequences["wmstats"])
+
+        requestNames = list(set([row["id"] for row in requestChanges["results"]
+                                 if not row["id"].startswith("_design/")]))
+        requests = {}
+        removed = []
+        if requestNames:
+            requestDocs = self.reqDB._formatCouchData(self.reqDB._getRequestByNames(requestNames, True))
+            for requestName in requestNames:
+                requestDoc = requestDocs.get(requestName)
+                if requestDoc and requestDoc.get("RequestStatus") in statusList:
+                    requests[requestName] = requestDoc
+                else:
+                    removed.append(requestName)
+
+        jobDocIds = list(set([row["id"] for row in jobChanges["results"]
+                              if not row.get("deleted") and not row["id"].startswith("_design/")]))
+        agentJobInfo = []
+        jobDocs = self._getAllDocsByIDs(jobDocIds)
+        if jobDocs:
+            agentJobInfo = [row["doc"] for row in jobDocs["rows"]
+                            if row.get("doc") and row["doc"].get("type") == "agent_request"]
+
+        return (requests, removed, agentJobInfo,
+                {"reqmgr": requestChanges["last_seq"], "wmstats": jobChanges["last_seq"]})
+
+    def getRequestByStatus(self, statusList, jobInfoFlag = False, limit = None, skip = None,
                            legacyFormat = False):
         
         """
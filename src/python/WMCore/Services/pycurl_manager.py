@@ -15,7 +15,9 @@ import cStringIO as StringIO
 import httplib
 import json
 import logging
+import threading
 import urllib
+import urlparse
 
 import pycurl
 
@@ -34,7 +36,7 @@ class ResponseHeader(object):
             row = row.replace('\n', '')
             if  not row:
                 continue
-            if  row.find('HTTP') != -1 and \
+            if  row.startswith('HTTP') and \
                 row.find('100') == -1: #HTTP/1.1 100 found: real header is later
                 res = row.replace('HTTP/1.1', '')
                 res = res.replace('HTTP/1.0', '')
@@ -53,6 +55,10 @@ class RequestHandler(object):
     """
     RequestHandler provides APIs to fetch single/multiple
     URL requests based on pycurl library
+
+    The curl handles are kept in a pool per thread and per host and
+    credentials, so the connections (and TLS sessions) are reused from
+    one request to the next unless keepalive is disabled in the config.
     """
     def __init__(self, config=None, logger=None):
         super(RequestHandler, self).__init__()
@@ -63,7 +69,61 @@ class RequestHandler(object):
         self.connecttimeout = config.get('connecttimeout', 30)
         self.followlocation = config.get('followlocation', 1)
         self.maxredirs = config.get('maxredirs', 5)
+        self.keepalive = config.get('keepalive', True)
+        self.maxidle = config.get('maxidle', 10)
+        self.concurrency = config.get('concurrency', 10)
         self.logger = logger if logger else logging.getLogger()
+        self.local = threading.local()
+
+    def handle_key(self, url, ckey=None, cert=None, capath=None, cainfo=None):
+        """Key of the curl handles which can be used for given url and credentials"""
+        parts = urlparse.urlsplit(url)
+        return (parts.scheme, parts.netloc, ckey, cert, capath, cainfo)
+
+    def get_handle(self, key):
+        """Get an idle curl handle for given key, or a new one"""
+        if  not self.keepalive:
+            return pycurl.Curl()
+        handles = getattr(self.local, 'handles', None)
+        if  handles is None:
+            handles = self.local.handles = {}
+            # DNS, TLS sessions and connections are shared by all the handles
+            # of the thread, also when they are run by a multirequest
+            share = self.local.share = pycurl.CurlShare()
+            share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+            for data in ['LOCK_DATA_SSL_SESSION', 'LOCK_DATA_CONNECT']:
+                if  hasattr(pycurl, data):
+                    share.setopt(pycurl.SH_SHARE, getattr(pycurl, data))
+        idle = handles.get(key)
+        if  idle:
+            return idle.pop()
+        curl = pycurl.Curl()
+        curl.setopt(pycurl.SHARE, self.local.share)
+        return curl
+
+    def release_handle(self, key, curl):
+        """Put back a curl handle in the pool once its request is done"""
+        if  not self.keepalive:
+            curl.close()
+            return
+        idle = self.local.handles.setdefault(key, [])
+        if  len(idle) >= self.maxidle:
+            curl.close()
+            return
+        # reset the options, the connection cache and share are kept
+        curl.reset()
+        idle.append(curl)
+
+    def close_handles(self):
+        """Close the curl handles kept by the calling thread"""
+        handles = getattr(self.local, 'handles', None) or {}
+        for idle in handles.values():
+            for curl in idle:
+                curl.close()
+        self.local.handles = None
+        multi = self.local.__dict__.pop('multi', None)
+        if  multi is not None:
+            multi.close()
 
     def encode_params(self, params, verb, doseq):
         """ Encode request parameters for usage with the 4 verbs.
@@ -178,10 +238,17 @@ class RequestHandler(object):
     def request(self, url, params, headers=None, verb='GET',
                 verbose=0, ckey=None, cert=None, capath=None, doseq=True, decode=False, cainfo=None):
         """Fetch data for given set of parameters"""
-        curl = pycurl.Curl()
-        bbuf, hbuf = self.set_opts(curl, url, params, headers,
-                ckey, cert, capath, verbose, verb, doseq, cainfo)
-        curl.perform()
+        key = self.handle_key(url, ckey, cert, capath, cainfo)
+        curl = self.get_handle(key)
+        try:
+            bbuf, hbuf = self.set_opts(curl, url, params, headers,
+                    ckey, cert, capath, verbose, verb, doseq, cainfo)
+            curl.perform()
+        except:
+            # do not reuse a handle in an unknown state
+            curl.close()
+            raise
+        self.release_handle(key, curl)
         if  verbose:
             print(verb, url, params, headers)
         header = self.parse_header(hbuf.getvalue())
@@ -225,40 +292,80 @@ class RequestHandler(object):
         return header
 
     def multirequest(self, url, parray, headers=None,
-                ckey=None, cert=None, verbose=None):
-        """Fetch data for given set of parameters"""
-        multi = pycurl.CurlMulti()
-        for params in parray:
-            curl = pycurl.Curl()
-            bbuf, hbuf = \
-                self.set_opts(curl, url, params, headers, ckey, cert, verbose)
-            multi.add_handle(curl)
-            while True:
-                ret, num_handles = multi.perform()
-                if  ret != pycurl.E_CALL_MULTI_PERFORM:
-                    break
-            while num_handles:
-                ret = multi.select(1.0)
-                if  ret == -1:
-                    continue
+                ckey=None, cert=None, verbose=None, capath=None, cainfo=None,
+                concurrency=None):
+        """
+        Fetch data for given set of parameters, with up to concurrency
+        requests running at the same time. The data is yielded in the
+        order the requests complete.
+        """
+        concurrency = concurrency or self.concurrency
+        key = self.handle_key(url, ckey, cert, capath, cainfo)
+        parray = list(parray)
+        # the multi handle keeps the connections, take the one of the thread
+        # while in use in case of interleaved multirequests
+        multi = self.local.__dict__.pop('multi', None) if self.keepalive else None
+        if  multi is None:
+            multi = pycurl.CurlMulti()
+        multi.setopt(pycurl.M_MAXCONNECTS, max(concurrency, self.maxidle))
+        running = {}
+        try:
+            while parray or running:
+                while parray and len(running) < concurrency:
+                    params = parray.pop(0)
+                    curl = self.get_handle(key)
+                    bbuf, hbuf = self.set_opts(curl, url, params, headers,
+                            ckey=ckey, cert=cert, capath=capath,
+                            verbose=verbose, cainfo=cainfo)
+                    multi.add_handle(curl)
+                    running[curl] = (params, bbuf, hbuf)
                 while True:
-                    ret, num_handles = multi.perform()
+                    ret, _ = multi.perform()
                     if  ret != pycurl.E_CALL_MULTI_PERFORM:
                         break
-            dummyNumq, response, dummyErr = multi.info_read()
-            for dummyCobj in response:
-                data = json.loads(bbuf.getvalue())
-                if  isinstance(data, dict):
-                    data.update(params)
-                    yield data
-                if  isinstance(data, list):
-                    for item in data:
-                        if  isinstance(item, dict):
-                            item.update(params)
+                while True:
+                    _, done, failed = multi.info_read()
+                    for curl in done:
+                        multi.remove_handle(curl)
+                        params, bbuf, hbuf = running.pop(curl)
+                        self.release_handle(key, curl)
+                        for item in self.multi_data(bbuf.getvalue(), params):
                             yield item
-                        else:
-                            err = 'Unsupported data format: data=%s, type=%s'\
-                                % (item, type(item))
-                            raise Exception(err)
-                bbuf.flush()
-                hbuf.flush()
+                        bbuf.flush()
+                        hbuf.flush()
+                    for curl, errno, errmsg in failed:
+                        multi.remove_handle(curl)
+                        params, _, _ = running.pop(curl)
+                        curl.close()
+                        msg = 'url=%s, params=%s, error=%s' % (url, params, errmsg)
+                        raise pycurl.error(errno, msg)
+                    if  not done and not failed:
+                        break
+                if  running:
+                    multi.select(1.0)
+        finally:
+            for curl in running:
+                multi.remove_handle(curl)
+                curl.close()
+            if  self.keepalive and getattr(self.local, 'multi', None) is None:
+                self.local.multi = multi
+            else:
+                multi.close()
+
+    def multi_data(self, body, params):
+        """Decode the data of a multirequest and add its parameters"""
+        data = json.loads(body)
+        if  isinstance(data, dict):
+            data.update(params)
+            return [data]
+        result = []
+        if  isinstance(data, list):
+            for item in data:
+                if  isinstance(item, dict):
+                    item.update(params)
+                    result.append(item)
+                else:
+                    err = 'Unsupported data format: data=%s, type=%s'\
+                        % (item, type(item))
+                    raise Exception(err)
+        return result
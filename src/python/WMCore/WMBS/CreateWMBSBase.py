@@ -420,6 +420,11 @@ class CreateWMBSBase(DBCreator):
         self.constraints["03_idx_wmbs_job"] = \
           """CREATE INDEX idx_wmbs_job_state ON wmbs_job(state) %s""" % tablespaceIndex
 
+        # for the incremental JobSubmitter refresh (Jobs.ListLeftState),
+        # existing agents need to run this statement by hand
+        self.constraints["04_idx_wmbs_job"] = \
+          """CREATE INDEX idx_wmbs_job_state_time ON wmbs_job(state_time) %s""" % tablespaceIndex
+
         self.constraints["01_idx_wmbs_job_assoc"] = \
           """CREATE INDEX idx_wmbs_job_assoc_job ON wmbs_job_assoc(job) %s""" % tablespaceIndex
 
@@ -47,6 +47,7 @@ class GetLocationBulk(DBFormatter):
             binds.append({'id': fid})
 
         result = self.dbi.processData(self.sql, binds,
-                         conn = conn, transaction = transaction)
+                         conn = conn, transaction = transaction,
+                         bulkSelect = True)
 
         return self.format(self.formatDict(result))
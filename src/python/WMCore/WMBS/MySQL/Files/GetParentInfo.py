@@ -15,7 +15,8 @@ from WMCore.Database.DBFormatter import DBFormatter
 
 class GetParentInfo(DBFormatter):
     sql = """SELECT wfp.id, wfp.lfn, wfp.merged,
-                    wfgp.lfn AS gplfn, wfgp.merged AS gpmerged
+                    wfgp.lfn AS gplfn, wfgp.merged AS gpmerged,
+                    wfd.lfn AS child_lfn
              FROM wmbs_file_details wfp
              INNER JOIN wmbs_file_parent wfpa ON wfpa.parent = wfp.id
              INNER JOIN wmbs_file_details wfd ON wfd.id = wfpa.child
@@ -32,5 +33,6 @@ class GetParentInfo(DBFormatter):
             bindVars.append({"child_lfn": childLFN})
 
         result = self.dbi.processData(self.sql, bindVars,
-                         conn = conn, transaction = transaction)
+                         conn = conn, transaction = transaction,
+                         bulkSelect = True)
         return self.formatDict(result)
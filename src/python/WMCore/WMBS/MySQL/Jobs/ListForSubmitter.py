@@ -33,7 +33,19 @@ class ListForSubmitter(DBFormatter):
                  wmbs_subscription.workflow = wmbs_workflow.id
              WHERE wmbs_job_state.name = 'created'"""
 
-    def execute(self, conn = None, transaction = False):
-        result = self.dbi.processData(self.sql, conn = conn,
-                                      transaction = transaction)
+    sinceSQL = " AND wmbs_job.state_time >= :since"
+
+    def execute(self, since = None, conn = None, transaction = False):
+        """
+        _execute_
+
+        List all the jobs in the created state, or only the ones that entered
+        it at or after the since timestamp if one is given.
+        """
+        if since is None:
+            result = self.dbi.processData(self.sql, conn = conn,
+                                          transaction = transaction)
+        else:
+            result = self.dbi.processData(self.sql + self.sinceSQL, {"since": since},
+                                          conn = conn, transaction = transaction)
         return self.formatDict(result)
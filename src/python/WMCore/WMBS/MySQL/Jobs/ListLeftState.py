@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+"""
+_ListLeftState_
+
+MySQL implementation of Jobs.ListLeftState
+"""
+
+from WMCore.Database.DBFormatter import DBFormatter
+
+class ListLeftState(DBFormatter):
+    """
+    _ListLeftState_
+
+    List the ids of the jobs that are not in the given state and changed
+    state at or after the given timestamp, e.g. the jobs that may have left
+    the created state since the last JobSubmitter cache refresh.  The jobs
+    are found through the wmbs_job state_time index.
+    """
+    sql = """SELECT wmbs_job.id AS id FROM wmbs_job
+               INNER JOIN wmbs_job_state ON
+                 wmbs_job.state = wmbs_job_state.id
+             WHERE wmbs_job.state_time >= :since AND
+                   wmbs_job_state.name != :state"""
+
+    def execute(self, state, since, conn = None, transaction = False):
+        result = self.dbi.processData(self.sql, {"state": state, "since": since},
+                                      conn = conn, transaction = transaction)
+        return [x[0] for x in self.format(result)]
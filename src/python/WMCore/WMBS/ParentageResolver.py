@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+_ParentageResolver_
+
+Find the merged parents of WMBS files, going up through the unmerged
+(redneck) parents when the parent of a file is not merged.
+"""
+
+
+class ParentageResolver(object):
+    """
+    _ParentageResolver_
+
+    Resolve the merged parents of a set of files generation by generation,
+    with one bulk Files.GetParentInfo call per generation.  The parents
+    found are kept until clear() is called.
+    """
+    def __init__(self, getParentInfoAction):
+        """
+        __init__
+
+        Takes the Files.GetParentInfo DAO to use.
+        """
+        self.getParentInfoAction = getParentInfoAction
+        self.parents = {}
+        return
+
+    def clear(self):
+        """
+        _clear_
+
+        Forget the parents already found.
+        """
+        self.parents = {}
+        return
+
+    def findParents(self, lfns, conn = None, transaction = False):
+        """
+        _findParents_
+
+        Return a dictionary of lfn: set of merged parent lfns for the files.
+        """
+        mergedParents = {}
+        unmergedParents = {}
+        generation = set(lfns) - set(self.parents.keys())
+        while generation:
+            for lfn in generation:
+                mergedParents[lfn] = set()
+                unmergedParents[lfn] = set()
+
+            parentsInfo = self.getParentInfoAction.execute(list(generation), conn = conn,
+                                                           transaction = transaction)
+            for parentInfo in parentsInfo:
+                childLFN = parentInfo["child_lfn"]
+
+                # This will catch straight to merge files that do not have redneck
+                # parents.  We will mark the straight to merge file from the job
+                # as a child of the merged parent.
+                if int(parentInfo["merged"]) == 1:
+                    mergedParents[childLFN].add(parentInfo["lfn"])
+
+                elif parentInfo["gpmerged"] == None:
+                    continue
+
+                # Handle the files that result from merge jobs that aren't redneck
+                # children, their grand parent is merged.
+                elif int(parentInfo["gpmerged"]) == 1:
+                    mergedParents[childLFN].add(parentInfo["gplfn"])
+
+                # If that didn't work, we've reached the great-grandparents,
+                # resolve them in the next generation
+                else:
+                    unmergedParents[childLFN].add(parentInfo["gplfn"])
+
+            nextGeneration = set()
+            for lfn in generation:
+                for parentLFN in unmergedParents[lfn]:
+                    if parentLFN not in self.parents and parentLFN not in mergedParents:
+                        nextGeneration.add(parentLFN)
+            generation = nextGeneration
+
+        for lfn in mergedParents:
+            if lfn not in self.parents:
+                self._resolve(lfn, mergedParents, unmergedParents)
+
+        return dict([(lfn, set(self.parents[lfn])) for lfn in lfns])
+
+    def _resolve(self, lfn, mergedParents, unmergedParents):
+        """
+        _resolve_
+
+        Combine the merged parents of a file with the ones of its unmerged
+        grand parents, deepest first.  The grand parents are walked depth
+        first and a file is only resolved once all the grand parents not on
+        the current path are.
+        """
+        stack = [(lfn, iter(unmergedParents[lfn]))]
+        onPath = set([lfn])
+        while stack:
+            current, parentLFNs = stack[-1]
+            for parentLFN in parentLFNs:
+                if parentLFN not in self.parents and parentLFN not in onPath:
+                    stack.append((parentLFN, iter(unmergedParents[parentLFN])))
+                    onPath.add(parentLFN)
+                    break
+            else:
+                parents = set(mergedParents[current])
+                for parentLFN in unmergedParents[current]:
+                    parents.update(self.parents.get(parentLFN, ()))
+                self.parents[current] = frozenset(parents)
+                onPath.discard(current)
+                stack.pop()
+        return
@@ -10,7 +10,6 @@ Frontend module for setting up TaskSpace & StepSpace areas within a job.
 
 
 import inspect
-import pickle
 import os
 import os.path
 import logging
@@ -26,6 +25,7 @@ from WMCore                    import WMLogging
 from WMCore.WMRuntime.Watchdog import Watchdog
 
 from WMCore.DataStructs.JobPackage import JobPackage
+from WMCore.WMSpec.Persistency     import loadPersisted
 from WMCore.WMSpec.WMWorkload      import WMWorkloadHelper
 
 from WMCore.Storage.SiteLocalConfig import loadSiteLocalConfig, SiteConfigError, SiteLocalConfig
@@ -168,9 +168,7 @@ def loadWorkload():
     """
     sandboxLoc = locateWMSandbox()
     workloadPcl = "%s/WMWorkload.pkl" % sandboxLoc
-    handle = open(workloadPcl, 'r')
-    wmWorkload = pickle.load(handle)
-    handle.close()
+    wmWorkload = loadPersisted(workloadPcl)
 
     return WMWorkloadHelper(wmWorkload)
 
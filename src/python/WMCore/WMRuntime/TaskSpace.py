@@ -11,8 +11,8 @@ Runtime utils for a Task
 import os
 import sys
 import inspect
-import pickle
 
+from WMCore.WMSpec.Persistency import loadPersisted
 from WMCore.WMSpec.WMWorkload import WMWorkloadHelper
 
 
@@ -72,9 +72,7 @@ class TaskSpace:
         wmsandboxLoc = inspect.getsourcefile(WMSandbox)
         workloadPcl = wmsandboxLoc.replace("__init__.py","WMWorkload.pkl")
 
-        handle = open(workloadPcl, 'r')
-        wmWorkload = pickle.load(handle)
-        handle.close()
+        wmWorkload = loadPersisted(workloadPcl)
         self.workload = WMWorkloadHelper(wmWorkload)
         return
 
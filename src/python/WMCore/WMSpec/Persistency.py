@@ -5,18 +5,83 @@ _PersistencyHelper_
 Util class to provide a common persistency layer for ConfigSection derived
 objects, with options to save in different formats
 
-Placeholder for ideas at present....
+The objects are pickled in one of the persistency modes:
+  - pickle: text pickle protocol, as written by older releases
+  - binary: highest pickle protocol
+  - gzip: highest pickle protocol, gzip compressed
+Files in any of the modes are loaded, the mode is detected from the content.
 
 """
 from __future__ import print_function
 
+import zlib
 from urllib2 import urlopen, Request
 from urlparse import urlparse
 try:
     import cPickle as pickle
 except ImportError:
     import pickle
-    
+
+PERSIST_PICKLE = "pickle"
+PERSIST_BINARY = "binary"
+PERSIST_GZIP = "gzip"
+DEFAULT_PERSIST_MODE = PERSIST_BINARY
+
+GZIP_MAGIC = "\x1f\x8b"
+
+
+def dumpsPersisted(data, persistMode=None, compressLevel=6):
+    """
+    _dumpsPersisted_
+
+    Pickle data in the persistency mode, DEFAULT_PERSIST_MODE if not set.
+    """
+    persistMode = persistMode or DEFAULT_PERSIST_MODE
+    if persistMode == PERSIST_PICKLE:
+        return pickle.dumps(data, 0)
+    content = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+    if persistMode == PERSIST_BINARY:
+        return content
+    if persistMode == PERSIST_GZIP:
+        # wbits 31 writes the gzip header, so the files work with gunzip too
+        compressor = zlib.compressobj(compressLevel, zlib.DEFLATED, 31)
+        return compressor.compress(content) + compressor.flush()
+    raise ValueError("Unknown persistency mode %s" % persistMode)
+
+
+def loadsPersisted(content):
+    """
+    _loadsPersisted_
+
+    Unpickle data pickled in any of the persistency modes.
+    """
+    if content[:2] == GZIP_MAGIC:
+        content = zlib.decompress(content, 31)
+    return pickle.loads(content)
+
+
+def dumpPersisted(data, filename, persistMode=None, compressLevel=6):
+    """
+    _dumpPersisted_
+
+    Save data to a file in the persistency mode.
+    """
+    content = dumpsPersisted(data, persistMode, compressLevel)
+    with open(filename, 'wb') as handle:
+        handle.write(content)
+    return
+
+
+def loadPersisted(filename):
+    """
+    _loadPersisted_
+
+    Load data from a file saved in any of the persistency modes.
+    """
+    with open(filename, 'rb') as handle:
+        return loadsPersisted(handle.read())
+
+
 class PersistencyHelper:
     """
     _PersistencyHelper_
@@ -32,18 +97,13 @@ class PersistencyHelper:
 
     """
 
-    def save(self, filename):
+    def save(self, filename, persistMode=None):
         """
         _save_
 
-        Save data to a file
-        Saved format is defined depending on the extension
+        Save data to a file, in the persistMode or DEFAULT_PERSIST_MODE
         """
-        handle = open(filename, 'w')
-        #TODO: use different encoding scheme for different extension
-        #extension = filename.split(".")[-1].lower()
-        pickle.dump(self.data, handle)
-        handle.close()
+        dumpPersisted(self.data, filename, persistMode)
         return
 
     def load(self, filename):
@@ -57,22 +117,22 @@ class PersistencyHelper:
         #TODO: currently support both loading from file path or url
         #if there are more things to filter may be separate the load function
 
-        # urllib2 needs a scheme - assume local file if none given
-        if not urlparse(filename)[0]:
-            filename = 'file:' + filename
-            handle = urlopen(Request(filename, headers = {"Accept" : "*/*"}))
-            self.data = pickle.load(handle)
-            handle.close()
+        # local files are read directly, without going through urllib2
+        parsedURL = urlparse(filename)
+        if not parsedURL[0]:
+            self.data = loadPersisted(filename)
+        elif parsedURL[0] == 'file' and parsedURL[1] in ('', 'localhost'):
+            self.data = loadPersisted(parsedURL[2])
         elif filename.startswith('file:'):
             handle = urlopen(Request(filename, headers = {"Accept" : "*/*"}))
-            self.data = pickle.load(handle)
+            self.data = loadsPersisted(handle.read())
             handle.close()
         else:
             # use own request class so we get authentication if needed
             from WMCore.Services.Requests import Requests
             request = Requests(filename)
             data = request.makeRequest('', incoming_headers = {"Accept" : "*/*"})
-            self.data = pickle.loads(data[0])
+            self.data = loadsPersisted(data[0])
 
         #TODO: use different encoding scheme for different extension
         #extension = filename.split(".")[-1].lower()
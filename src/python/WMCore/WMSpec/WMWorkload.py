@@ -17,6 +17,17 @@ from WMCore.WMException import WMException
 parseTaskPath = lambda p: [x for x in p.split('/') if x.strip() != '']
 
 
+def outputFilesetName(task, outputModuleName):
+    """
+    _outputFilesetName_
+
+    Name of the WMBS fileset for the output module of the task.
+    """
+    if task.taskType() == "Merge":
+        return "%s/merged-%s" % (task.getPathName(), outputModuleName)
+    return "%s/unmerged-%s" % (task.getPathName(), outputModuleName)
+
+
 def getWorkloadFromTask(taskRef):
     """
     _getWorkloadFromTask_
@@ -62,6 +73,46 @@ class WMWorkloadHelper(PersistencyHelper):
 
     def __init__(self, wmWorkload=None):
         self.data = wmWorkload
+        self.clearTaskIndex()
+
+    def clearTaskIndex(self):
+        """
+        _clearTaskIndex_
+
+        Drop the task path and output fileset indexes, they are built again
+        on the next lookup. The workload methods changing the task tree call
+        it, it needs to be called after removing tasks through a task helper.
+        """
+        self._taskIndexData = None
+        self._taskPathIndex = {}
+        self._outputFilesetIndex = None
+
+    def _buildTaskIndex(self):
+        """
+        _buildTaskIndex_
+
+        Index the task sections of the workload by their path name.
+        """
+        self.clearTaskIndex()
+        for topTask in self.taskIterator():
+            for task in topTask.taskIterator():
+                self._taskPathIndex[task.getPathName()] = task.data
+        self._taskIndexData = self.data
+        return
+
+    def _lookupTaskIndex(self, taskPath):
+        """
+        _lookupTaskIndex_
+
+        Return the task section with the path name from the index, None if
+        it is not indexed or its path changed since it was indexed.
+        """
+        if self._taskIndexData is not self.data:
+            return None
+        task = self._taskPathIndex.get(taskPath)
+        if task is None or getattr(task, "pathName", None) != taskPath:
+            return None
+        return task
 
     def setSpecUrl(self, url):
         self.data.persistency.specUrl = sanitizeURL(url)["url"]
@@ -89,6 +140,7 @@ class WMWorkloadHelper(PersistencyHelper):
         Set the workload name.
         """
         self.data._internal_name = workloadName
+        self.clearTaskIndex()
         return
 
     def requestType(self):
@@ -285,10 +337,13 @@ class WMWorkloadHelper(PersistencyHelper):
         Get a task instance based on the path name
 
         """
-        mapping = {}
-        for t in self.taskIterator():
-            [mapping.__setitem__(x.getPathName, x.name())
-             for x in t.taskIterator()]
+        task = self._lookupTaskIndex(taskPath)
+        if task is None:
+            # tasks added or renamed since the index was built
+            self._buildTaskIndex()
+            task = self._lookupTaskIndex(taskPath)
+        if task is not None:
+            return WMTaskHelper(task)
 
         taskList = parseTaskPath(taskPath)
 
@@ -308,11 +363,36 @@ class WMWorkloadHelper(PersistencyHelper):
             msg = "Task /%s/%s Not Found in Workload" % (taskList[0],
                                                          taskList[1])
             raise RuntimeError(msg)
-        for x in topTask.taskIterator():
-            if x.getPathName() == taskPath:
-                return x
         return None
 
+    def getOutputFilesetName(self, taskPath, outputModuleName):
+        """
+        _getOutputFilesetName_
+
+        Name of the fileset where the output of the output module of a task
+        ends up, the merged fileset of the merge task for it if there is one
+        and the unmerged fileset of the task otherwise. None if the task
+        doesn't have the output module or ignores it.
+        """
+        if self._outputFilesetIndex is None or self._taskIndexData is not self.data:
+            self._buildTaskIndex()
+            self._outputFilesetIndex = {}
+            for path in self._taskPathIndex:
+                task = WMTaskHelper(self._taskPathIndex[path])
+                ignoredOutputModules = task.getIgnoredOutputModulesForTask()
+                for outputModule in task.getOutputModulesForTask():
+                    for moduleName in outputModule.listSections_():
+                        if moduleName in ignoredOutputModules:
+                            continue
+                        filesetName = outputFilesetName(task, moduleName)
+                        for childTask in task.childTaskIterator():
+                            if childTask.taskType() == "Merge" and \
+                                    getattr(childTask.data.input, "outputModule", None) == moduleName:
+                                filesetName = outputFilesetName(childTask, "Merged")
+                        self._outputFilesetIndex[(path, moduleName)] = filesetName
+
+        return self._outputFilesetIndex.get((taskPath, outputModuleName))
+
     def taskIterator(self):
         """
         generator to traverse top level tasks
@@ -400,6 +480,7 @@ class WMWorkloadHelper(PersistencyHelper):
             raise RuntimeError(msg)
         self.data.tasks.tasklist.append(taskName)
         setattr(self.data.tasks, taskName, task)
+        self.clearTaskIndex()
         return
 
     def newTask(self, taskName):
@@ -429,6 +510,7 @@ class WMWorkloadHelper(PersistencyHelper):
         """
         self.data.tasks.__delattr__(taskName)
         self.data.tasks.tasklist.remove(taskName)
+        self.clearTaskIndex()
         return
 
     def setSiteWildcardsLists(self, siteWhitelist, siteBlacklist, wildcardDict):
@@ -1490,6 +1572,7 @@ class WMWorkloadHelper(PersistencyHelper):
 
         adjustPathsForTask(newTopLevelTask, "/%s/%s" % (newWorkloadName,
                                                         newTopLevelTask.name()))
+        self.clearTaskIndex()
         return
 
     def ignoreOutputModules(self, badModules, initialTask=None):
@@ -1524,6 +1607,8 @@ class WMWorkloadHelper(PersistencyHelper):
             # Now delete
             for childTaskName in childTasksToDelete:
                 task.deleteChild(childTaskName)
+            if childTasksToDelete:
+                self.clearTaskIndex()
 
             if childTasksToDelete:
                 # Tell any CMSSW step to ignore the output modules
@@ -9,25 +9,38 @@ class DataCacheUpdate(CherryPyPeriodicTask):
 
     def __init__(self, rest, config):
 
+        # optional file to share the cache between the server processes
+        if getattr(config, "data_cache_snapshot", None):
+            DataCache.setSnapshotFile(config.data_cache_snapshot)
         CherryPyPeriodicTask.__init__(self, config)
 
     def setConcurrentTasks(self, config):
         """
         sets the list of functions which
         """
-        self.concurrentTasks = [{'func': self.gatherActiveDataStats, 'duration': 300}]
+        # full rebuild every DataCache duration, changes applied in between
+        self.concurrentTasks = [{'func': self.gatherActiveDataStats,
+                                 'duration': getattr(config, "data_cache_update_interval", 60)}]
 
     def gatherActiveDataStats(self, config):
         """
         gather active data statistics
         """
         try:
+            wmstatsDB = WMStatsReader(config.wmstats_url, reqdbURL=config.reqmgrdb_url, 
+                                      reqdbCouchApp="ReqMgr")
             if DataCache.islatestJobDataExpired():
-                wmstatsDB = WMStatsReader(config.wmstats_url, reqdbURL=config.reqmgrdb_url, 
-                                          reqdbCouchApp="ReqMgr")
+                # changes made during the rebuild are applied again by the next update
+                changeSequences = wmstatsDB.getChangeSequences()
                 jobData = wmstatsDB.getActiveData(jobInfoFlag = True)
-                DataCache.setlatestJobData(jobData)
+                DataCache.setlatestJobData(jobData, changeSequences)
                 self.logger.info("DataCache is updated: %s" % len(jobData))
+            else:
+                requests, removed, agentJobInfo, changeSequences = \
+                    wmstatsDB.getActiveDataChanges(DataCache.getChangeSequences())
+                DataCache.updateJobData(requests, removed, agentJobInfo, changeSequences)
+                self.logger.info("DataCache changes applied: %s requests, %s removed, %s job info" %
+                                 (len(requests), len(removed), len(agentJobInfo)))
         except Exception as ex:
             self.logger.error(str(ex))
-        return
\ No newline at end of file
+        return
@@ -1,12 +1,36 @@
+"""
+Server side cache of the active request data, keyed by request name.
+
+The cache is rebuilt from the request and wmstats databases every duration
+seconds, in between it is kept up to date with the documents changed since
+the last update, as listed by the CouchDB _changes feeds of both databases.
+
+When a snapshot file is set, every update is saved to it and the cache is
+loaded again from the file whenever it was updated by another process, so
+all the server processes on a host return the same data.
+"""
+from __future__ import (division, print_function)
+
+import logging
+import os
+import threading
 import time
 
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
 class DataCache(object):
-    # TODO: need to change to  store in  db instead of storing in the memory 
-    # When mulitple server run for load balancing it could have different result
-    # from each server. 
     _duration = 300 # 5 minitues
     _lastedActiveDataFromAgent = {};
-    
+    # last sequence numbers of the _changes feeds applied to the cache
+    _changeSequences = {}
+    _snapshotFile = None
+    _snapshotMTime = None
+    _lock = threading.RLock()
+
     @staticmethod
     def getDuration():
         return DataCache._duration;
@@ -15,26 +39,147 @@ class DataCache(object):
     def setDuration(sec):
         DataCache._duration = sec;
 
+    @staticmethod
+    def setSnapshotFile(path):
+        """
+        Share the cache with the other server processes through path.
+        """
+        with DataCache._lock:
+            DataCache._snapshotFile = path
+            DataCache._snapshotMTime = None
+
+    @staticmethod
+    def _saveSnapshot():
+        """
+        Write the cache to the snapshot file, under a temporary name which
+        is moved in place so readers never see a partial file.
+        """
+        if DataCache._snapshotFile is None:
+            return
+        tmpFile = "%s.tmp.%d" % (DataCache._snapshotFile, os.getpid())
+        try:
+            with open(tmpFile, "wb") as snapshot:
+                pickle.dump({"cache": DataCache._lastedActiveDataFromAgent,
+                             "sequences": DataCache._changeSequences},
+                            snapshot, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmpFile, DataCache._snapshotFile)
+            DataCache._snapshotMTime = os.stat(DataCache._snapshotFile).st_mtime
+        except (IOError, OSError) as ex:
+            logging.error("Failed to save the DataCache snapshot %s: %s", DataCache._snapshotFile, str(ex))
+
+    @staticmethod
+    def _loadSnapshot():
+        """
+        Load the snapshot file if it was written since it was last loaded or
+        saved by this process and it is newer than the cache.
+        """
+        if DataCache._snapshotFile is None:
+            return
+        try:
+            mtime = os.stat(DataCache._snapshotFile).st_mtime
+            if mtime == DataCache._snapshotMTime:
+                return
+            with open(DataCache._snapshotFile, "rb") as snapshot:
+                content = pickle.load(snapshot)
+        except Exception as ex:
+            logging.warning("Failed to load the DataCache snapshot %s: %s", DataCache._snapshotFile, str(ex))
+            return
+
+        DataCache._snapshotMTime = mtime
+        current = DataCache._lastedActiveDataFromAgent
+        if not current or content["cache"].get("updated", 0) >= current.get("updated", 0):
+            DataCache._lastedActiveDataFromAgent = content["cache"]
+            DataCache._changeSequences = content["sequences"]
+
     @staticmethod
     def getlatestJobData():
-        if (DataCache._lastedActiveDataFromAgent):
-            return DataCache._lastedActiveDataFromAgent["data"]
-        else:
-            return None
+        with DataCache._lock:
+            DataCache._loadSnapshot()
+            if (DataCache._lastedActiveDataFromAgent):
+                return DataCache._lastedActiveDataFromAgent["data"]
+            else:
+                return None
 
+    @staticmethod
+    def setlatestJobData(jobData, changeSequences=None):
+        """
+        Replace the cache with the data of a full rebuild. changeSequences
+        are the sequence numbers of the _changes feeds from before the
+        rebuild started, the next incremental updates start from there.
+        """
+        with DataCache._lock:
+            now = int(time.time())
+            DataCache._lastedActiveDataFromAgent = {"time": now, "updated": time.time(), "data": jobData}
+            DataCache._changeSequences = dict(changeSequences or {})
+            DataCache._saveSnapshot()
+
+    @staticmethod
+    def getChangeSequences():
+        """
+        Return the sequence numbers of the _changes feeds already applied.
+        """
+        with DataCache._lock:
+            DataCache._loadSnapshot()
+            return dict(DataCache._changeSequences)
 
     @staticmethod
-    def setlatestJobData(jobData):
-        DataCache._lastedActiveDataFromAgent["time"] = int(time.time())
-        DataCache._lastedActiveDataFromAgent["data"] = jobData
+    def updateJobData(requests=None, removed=None, agentJobInfo=None, changeSequences=None):
+        """
+        Apply an incremental update to the cache:
+          requests: {requestName: requestDoc} of new or changed active requests,
+                    the job info already in the cache is kept
+          removed: names of the requests which are not active any more
+          agentJobInfo: agent_request documents, replacing the job info of
+                        the same request and agent if they are not older
+          changeSequences: sequence numbers of the _changes feeds applied
 
+        The data handed out by getlatestJobData is never modified, the
+        changed requests are copied and the new data replaces the old one.
+        """
+        with DataCache._lock:
+            DataCache._loadSnapshot()
+            if not DataCache._lastedActiveDataFromAgent:
+                return
+            jobData = dict(DataCache._lastedActiveDataFromAgent["data"])
+
+            for requestName, requestDoc in (requests or {}).items():
+                requestDoc = dict(requestDoc)
+                if requestName in jobData and "AgentJobInfo" in jobData[requestName]:
+                    requestDoc["AgentJobInfo"] = jobData[requestName]["AgentJobInfo"]
+                jobData[requestName] = requestDoc
+
+            for requestName in (removed or []):
+                jobData.pop(requestName, None)
+
+            copied = set()
+            for agentDoc in (agentJobInfo or []):
+                requestName = agentDoc["workflow"]
+                if requestName not in jobData:
+                    continue
+                current = jobData[requestName].get("AgentJobInfo", {}).get(agentDoc["agent_url"])
+                if current is not None and agentDoc.get("timestamp", 0) < current.get("timestamp", 0):
+                    continue
+                if requestName not in copied:
+                    requestDoc = dict(jobData[requestName])
+                    requestDoc["AgentJobInfo"] = dict(requestDoc.get("AgentJobInfo", {}))
+                    jobData[requestName] = requestDoc
+                    copied.add(requestName)
+                jobData[requestName]["AgentJobInfo"][agentDoc["agent_url"]] = agentDoc
+
+            cache = dict(DataCache._lastedActiveDataFromAgent)
+            cache["data"] = jobData
+            cache["updated"] = time.time()
+            DataCache._lastedActiveDataFromAgent = cache
+            DataCache._changeSequences.update(changeSequences or {})
+            DataCache._saveSnapshot()
 
     @staticmethod
     def islatestJobDataExpired():
-        if not DataCache._lastedActiveDataFromAgent:
-            return True
-
-        if (int(time.time()) - DataCache._lastedActiveDataFromAgent["time"]) > DataCache._duration:
-            return True
-        return False
+        with DataCache._lock:
+            DataCache._loadSnapshot()
+            if not DataCache._lastedActiveDataFromAgent:
+                return True
 
+            if (int(time.time()) - DataCache._lastedActiveDataFromAgent["time"]) > DataCache._duration:
+                return True
+            return False
@@ -16,6 +16,9 @@ class ActiveRequestJobInfo(RESTEntity):
     def __init__(self, app, api, config, mount):
         # main CouchDB database where requests/workloads are stored
         RESTEntity.__init__(self, app, api, config, mount)  
+        # read the cache updated by the other server processes
+        if getattr(config, "data_cache_snapshot", None):
+            DataCache.setSnapshotFile(config.data_cache_snapshot)
         
     def validate(self, apiobj, method, api, param, safe):
         return            
@@ -11,25 +11,36 @@ class T0DataCacheUpdate(CherryPyPeriodicTask):
 
     def __init__(self, rest, config):
 
+        if getattr(config, "data_cache_snapshot", None):
+            DataCache.setSnapshotFile(config.data_cache_snapshot)
         CherryPyPeriodicTask.__init__(self, config)
 
     def setConcurrentTasks(self, config):
         """
         sets the list of functions which
         """
-        self.concurrentTasks = [{'func': self.gatherT0ActiveDataStats, 'duration': 300}]
+        self.concurrentTasks = [{'func': self.gatherT0ActiveDataStats,
+                                 'duration': getattr(config, "data_cache_update_interval", 60)}]
 
     def gatherT0ActiveDataStats(self, config):
         """
         gather active data statistics
         """
         try:
+            wmstatsDB = WMStatsReader(config.wmstats_url, reqdbURL=config.reqmgrdb_url, 
+                                      reqdbCouchApp = "T0Request")
             if DataCache.islatestJobDataExpired():
-                wmstatsDB = WMStatsReader(config.wmstats_url, reqdbURL=config.reqmgrdb_url, 
-                                          reqdbCouchApp = "T0Request")
+                changeSequences = wmstatsDB.getChangeSequences()
                 jobData = wmstatsDB.getT0ActiveData(jobInfoFlag = True)
-                DataCache.setlatestJobData(jobData)
+                DataCache.setlatestJobData(jobData, changeSequences)
                 self.logger.info("DataCache is updated: %s" % len(jobData))
+            else:
+                requests, removed, agentJobInfo, changeSequences = \
+                    wmstatsDB.getActiveDataChanges(DataCache.getChangeSequences(),
+                                                   WMStatsReader.T0_ACTIVE_STATUS)
+                DataCache.updateJobData(requests, removed, agentJobInfo, changeSequences)
+                self.logger.info("DataCache changes applied: %s requests, %s removed, %s job info" %
+                                 (len(requests), len(removed), len(agentJobInfo)))
         except Exception as ex:
             self.logger.error(str(ex))
         return
\ No newline at end of file
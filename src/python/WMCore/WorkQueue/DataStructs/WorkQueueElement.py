@@ -249,6 +249,30 @@ class WorkQueueElement(dict):
 
         return True
 
+    def filterSites(self, sites):
+        """Return the set of sites which pass the site restrictions,
+        same as calling passesSiteRestriction for each site"""
+        sites = set(sites)
+        # Site list restrictions
+        if self['SiteWhitelist']:
+            sites.intersection_update(self['SiteWhitelist'])
+        sites.difference_update(self['SiteBlacklist'])
+        if self.get('NoLocationUpdate'):
+            return sites
+
+        # input, parent and pileup data restrictions
+        if self['NoInputUpdate'] is False:
+            for locations in self['Inputs'].values():
+                sites.intersection_update(locations)
+        if self['ParentFlag'] and self['NoInputUpdate'] is False:
+            for locations in self['ParentData'].values():
+                sites.intersection_update(locations)
+        if self['NoPileupUpdate'] is False:
+            for locations in self['PileupData'].values():
+                sites.intersection_update(locations)
+
+        return sites
+
     def intersectionWithEmptySet(self, a, b):
         """
         interaction of 2 sets but if one of the set is empty returns union
@@ -19,6 +19,7 @@ from WMCore.WMBS.Fileset import Fileset
 from WMCore.WMBS.Subscription import Subscription
 from WMCore.WMBS.Job import Job
 from WMCore.WMException import WMException
+from WMCore.WMSpec.WMWorkload import outputFilesetName
 from WMCore.DataStructs.Run import Run
 from WMCore.DAOFactory import DAOFactory
 from WMCore.WMConnectionBase import WMConnectionBase
@@ -240,14 +241,7 @@ class WMBSHelper(WMConnectionBase):
 
         Generate an output fileset name for the given task and output module.
         """
-        if task.taskType() == "Merge":
-            outputFilesetName = "%s/merged-%s" % (task.getPathName(),
-                                                  outputModuleName)
-        else:
-            outputFilesetName = "%s/unmerged-%s" % (task.getPathName(),
-                                                    outputModuleName)
-
-        return outputFilesetName
+        return outputFilesetName(task, outputModuleName)
 
     def createSubscription(self, task, fileset, alternativeFilesetClose=False):
         """
@@ -93,11 +93,12 @@ class WorkQueue(WorkQueueBase):
         self.params.setdefault('DbName', 'workqueue')
         self.params.setdefault('InboxDbName', self.params['DbName'] + '_inbox')
         self.params.setdefault('ParentQueueCouchUrl', None)  # We get work from here
+        self.params.setdefault('QueryThreads', 4)  # parallel requests to the couch list functions
 
         self.backend = WorkQueueBackend(self.params['CouchUrl'], self.params['DbName'],
                                         self.params['InboxDbName'],
                                         self.params['ParentQueueCouchUrl'], self.params.get('QueueURL'),
-                                        logger=self.logger)
+                                        logger=self.logger, queryThreads=self.params['QueryThreads'])
         if self.params.get('ParentQueueCouchUrl'):
             try:
                 if self.params.get('ParentQueueInboxCouchDBName'):
@@ -6,15 +6,17 @@ Interface to WorkQueue persistent storage
 """
 
 import json
-import random
 import time
 import urllib
+from functools import partial
 
 from WMCore.Database.CMSCouch import CouchServer, CouchNotFoundError, Document
 from WMCore.Lexicon import sanitizeURL
+from WMCore.ThreadPool.WorkQueue import ThreadPool
 from WMCore.WMSpec.WMWorkload import WMWorkloadHelper
 from WMCore.WorkQueue.DataStructs.CouchWorkQueueElement import CouchWorkQueueElement, fixElementConflicts
 from WMCore.WorkQueue.WorkQueueExceptions import WorkQueueNoMatchingElements
+from WMCore.WorkQueue.WorkQueueMatcher import WorkQueueMatcher
 
 
 def formatReply(answer, *items):
@@ -40,7 +42,7 @@ class WorkQueueBackend(object):
 
     def __init__(self, db_url, db_name='workqueue',
                  inbox_name=None, parentQueue=None,
-                 queueUrl=None, logger=None):
+                 queueUrl=None, logger=None, queryThreads=4):
         if logger:
             self.logger = logger
         else:
@@ -60,6 +62,10 @@ class WorkQueueBackend(object):
         self.hostWithAuth = db_url
         self.inbox = self.server.connectDatabase(inbox_name, create=False, size=10000)
         self.queueUrl = sanitizeURL(queueUrl or (db_url + '/' + db_name))['url']
+        # connections used to query the workflow chunks in parallel, each
+        # thread has its own since the http connections are not thread safe
+        self.queryThreads = queryThreads
+        self.queryDbs = []
 
     def forceQueueSync(self):
         """Force a blocking replication - used only in tests"""
@@ -348,11 +354,7 @@ class WorkQueueBackend(object):
             options['teams'] = teams
             self.logger.info("setting teams %s" % teams)
         if wfs:
-            result = []
-            for i in xrange(0, len(wfs), 20):
-                options['wfs'] = wfs[i:i + 20]
-                data = self.db.loadList('WorkQueue', 'workRestrictions', 'availableByPriority', options)
-                result.extend(json.loads(data))
+            result = self.availableByPriorityForWorkflows(options, wfs)
         else:
             result = self.db.loadList('WorkQueue', 'workRestrictions', 'availableByPriority', options)
             result = json.loads(result)
@@ -366,39 +368,58 @@ class WorkQueueBackend(object):
         for i in result:
             element = CouchWorkQueueElement.fromDocument(self.db, i)
             sortedElements.append(element)
-            
-        # sort elements to get them in priority first and timestamp order
-        sortedElements.sort(key=lambda element: element['CreationTime'])
-        sortedElements.sort(key = lambda x: x['Priority'], reverse = True)
-         
-        for element in sortedElements:
-            prio = element['Priority']
-
-            possibleSite = None
-            sites = thresholds.keys()
-            random.shuffle(sites)
-            for site in sites:
-                if element.passesSiteRestriction(site):
-                    # Count the number of jobs currently running of greater priority
-                    prio = element['Priority']
-                    curJobCount = sum(map(lambda x: x[1] if x[0] >= prio else 0, siteJobCounts.get(site, {}).items()))
-                    self.logger.debug("Job Count: %s, site: %s threshods: %s" % (curJobCount, site, thresholds[site]))
-                    if curJobCount < thresholds[site]:
-                        possibleSite = site
-                        break
 
+        matcher = WorkQueueMatcher(thresholds, siteJobCounts)
+        for element, possibleSite in matcher.matchElements(sortedElements):
             if possibleSite:
                 self.logger.debug("Possible site exists %s" % str(possibleSite))
                 elements.append(element)
-                if possibleSite not in siteJobCounts:
-                    siteJobCounts[possibleSite] = {}
-                siteJobCounts[possibleSite][prio] = siteJobCounts[possibleSite].setdefault(prio, 0) + \
-                                                    element['Jobs'] * element.get('blowupFactor', 1.0)
             else:
                 self.logger.info("No possible site for %s with doc id %s", element['RequestName'], element.id)
 
         return elements, thresholds, siteJobCounts
 
+    @staticmethod
+    def _availableByPriority(db, options):
+        """
+        Call the availableByPriority list, return the decoded result or the
+        exception raised, it runs in the query threads.
+        """
+        try:
+            return json.loads(db.loadList('WorkQueue', 'workRestrictions', 'availableByPriority', options))
+        except Exception as ex:
+            return ex
+
+    def availableByPriorityForWorkflows(self, options, wfs, chunkSize=20):
+        """
+        Call the availableByPriority list for chunks of chunkSize workflows,
+        with up to queryThreads requests in parallel. The results are
+        returned in the order of the chunks.
+        """
+        chunks = []
+        for i in xrange(0, len(wfs), chunkSize):
+            chunkOptions = dict(options)
+            chunkOptions['wfs'] = wfs[i:i + chunkSize]
+            chunks.append(chunkOptions)
+
+        nThreads = min(self.queryThreads, len(chunks))
+        if nThreads <= 1:
+            results = dict(enumerate([self._availableByPriority(self.db, x) for x in chunks]))
+        else:
+            while len(self.queryDbs) < nThreads:
+                self.queryDbs.append(self.server.connectDatabase(self.db.name, create=False, size=10000))
+            pool = ThreadPool([partial(self._availableByPriority, db) for db in self.queryDbs[:nThreads]])
+            for index, chunkOptions in enumerate(chunks):
+                pool.enqueue(index, chunkOptions)
+            results = dict(pool)
+
+        result = []
+        for index in xrange(len(chunks)):
+            if isinstance(results[index], Exception):
+                raise results[index]
+            result.extend(results[index])
+        return result
+
     def getActiveData(self):
         """Get data items we have work in the queue for"""
         data = self.db.loadView('WorkQueue', 'activeData', {'reduce': True, 'group': True})
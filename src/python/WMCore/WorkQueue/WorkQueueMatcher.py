@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+WorkQueueMatcher
+
+Match available work queue elements to the sites with free job slots
+"""
+from __future__ import division
+
+import random
+from bisect import bisect_left
+
+
+class WorkQueueMatcher(object):
+    """
+    Assign elements to sites, in priority and creation time order, where the
+    jobs running at the same or higher priority are below the site threshold.
+
+    The jobs running at each site are kept as cumulative counts by priority,
+    so the jobs at or above a priority are found with a bisection instead of
+    a sum over all the priorities for every element and site.
+    """
+    def __init__(self, thresholds, siteJobCounts):
+        """
+        thresholds: {site: maximum number of running jobs}
+        siteJobCounts: {site: {priority: number of running jobs}}, updated
+                       with the jobs of the matched elements
+        """
+        self.thresholds = thresholds
+        self.siteJobCounts = siteJobCounts
+        self.sites = frozenset(thresholds)
+        # priorities in ascending order and jobs running at or above them
+        self.priorities = {}
+        self.cumulativeJobs = {}
+        # jobs assigned by this matcher, always at or above the current priority
+        self.assignedJobs = {}
+        for site in self.sites:
+            jobCounts = siteJobCounts.get(site, {})
+            priorities = sorted(jobCounts)
+            cumulativeJobs = [0] * len(priorities)
+            total = 0
+            for i in xrange(len(priorities) - 1, -1, -1):
+                total += jobCounts[priorities[i]]
+                cumulativeJobs[i] = total
+            self.priorities[site] = priorities
+            self.cumulativeJobs[site] = cumulativeJobs
+            self.assignedJobs[site] = 0
+
+    def runningJobs(self, site, priority):
+        """
+        Number of jobs running at site with priority higher or equal to
+        priority, including the jobs of the elements already matched.
+        Only valid for priorities in decreasing order, as matchElements does.
+        """
+        index = bisect_left(self.priorities[site], priority)
+        cumulativeJobs = self.cumulativeJobs[site]
+        running = cumulativeJobs[index] if index < len(cumulativeJobs) else 0
+        return running + self.assignedJobs[site]
+
+    def matchElements(self, elements, chooseSite=random.choice):
+        """
+        Return a list of (element, site) for all the elements in priority
+        and creation time order, site is None if no site can run it.
+        The site is picked with chooseSite among all the possible sites.
+        """
+        results = []
+        sortedElements = sorted(elements, key=lambda x: (-x['Priority'], x['CreationTime']))
+        for element in sortedElements:
+            prio = element['Priority']
+            possibleSites = [site for site in element.filterSites(self.sites)
+                             if self.runningJobs(site, prio) < self.thresholds[site]]
+            if not possibleSites:
+                results.append((element, None))
+                continue
+
+            site = chooseSite(possibleSites)
+            jobs = element['Jobs'] * element.get('blowupFactor', 1.0)
+            self.assignedJobs[site] += jobs
+            siteJobCounts = self.siteJobCounts.setdefault(site, {})
+            siteJobCounts[prio] = siteJobCounts.get(prio, 0) + jobs
+            results.append((element, site))
+        return results
@@ -10,6 +10,8 @@ Created on Mar 13, 2013
 
 import json
 import os
+import threading
+import time
 
 from random import random
 
@@ -70,3 +72,69 @@ class DbsApi():
                 if block["block"]["block_name"] == block_name:
                     return [block["block"]]
         return []
+
+
+class LoadedDbsApi(object):
+    """
+    _LoadedDbsApi_
+
+    In memory stand-in for a DBS writer under load, for benchmarks of the
+    DBS3 upload poller.  All the apis with the same url share the blocks
+    and the server: an insert takes latency seconds while at most capacity
+    inserts are running, and gets slower as the server is overloaded.
+    When overloaded, inserts fail with a proxy error with probability
+    proxyErrorRate, after the block was stored.
+    """
+    servers = {}
+    serversLock = threading.Lock()
+
+    def __init__(self, url, latency = 0.01, capacity = 4, proxyErrorRate = 0.5):
+        """
+        _init_
+
+        Attach to the server for url, create it if needed.
+        """
+        self.dbsPath = url
+        with self.serversLock:
+            self.server = self.servers.setdefault(url, {'lock': threading.Lock(),
+                                                        'blocks': {}, 'running': 0,
+                                                        'calls': 0})
+        self.latency = latency
+        self.capacity = capacity
+        self.proxyErrorRate = proxyErrorRate
+
+    def insertBulkBlock(self, blockDump):
+        """
+        _insertBulkBlock_
+
+        Store the block information.
+        """
+        name = blockDump["block"]["block_name"]
+        server = self.server
+        with server['lock']:
+            server['running'] += 1
+            server['calls'] += 1
+            overload = max(0, server['running'] - self.capacity)
+        try:
+            time.sleep(self.latency * (1 + overload))
+            with server['lock']:
+                if name in server['blocks']:
+                    raise Exception("Block %s already exists" % name)
+                server['blocks'][name] = blockDump["block"]
+            if overload and random() < self.proxyErrorRate:
+                raise Exception("Proxy Error, this is a mock proxy error.")
+        finally:
+            with server['lock']:
+                server['running'] -= 1
+        return
+
+    def listBlocks(self, block_name):
+        """
+        _listBlocks_
+
+        Return the requested block information if it exists.
+        """
+        with self.server['lock']:
+            if block_name in self.server['blocks']:
+                return [self.server['blocks'][block_name]]
+        return []
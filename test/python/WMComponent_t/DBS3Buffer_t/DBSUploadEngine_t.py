@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+"""
+_DBSUploadEngine_t_
+
+Unit tests for the DBS3 upload engine, against the in memory DBS emulator.
+"""
+from __future__ import print_function
+
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMComponent.DBS3Buffer.DBSUploadEngine import DBSUploadEngine, classifyUploadError
+from WMQuality.Emulators.DBSClient.DBS3API import LoadedDbsApi
+
+
+class FakeHTTPError(Exception):
+    """
+    Exception with an HTTP code like the ones of the DBS client.
+    """
+    def __init__(self, code, msg):
+        Exception.__init__(self, msg)
+        self.code = code
+
+
+class FailingDbsApi(object):
+    """
+    DbsApi failing with the given exceptions before inserting the block.
+    """
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def insertBulkBlock(self, blockDump):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return
+
+
+class SlowDbsApi(object):
+    """
+    DbsApi taking fileLatency seconds per file of the block to insert it,
+    the duplicated blocks fail right away.
+    """
+    def __init__(self, fileLatency, duplicates):
+        self.fileLatency = fileLatency
+        self.duplicates = duplicates
+
+    def insertBulkBlock(self, blockDump):
+        name = blockDump["block"]["block_name"]
+        if name in self.duplicates:
+            raise Exception("Block %s already exists" % name)
+        time.sleep(self.fileLatency * max(1, len(blockDump["files"])))
+        return
+
+
+def makeBlock(name, nFiles = 0):
+    """
+    Minimal encoded block
+    """
+    return {"block": {"block_name": name},
+            "files": [{"logical_file_name": "%s/%d.root" % (name, i)} for i in range(nFiles)]}
+
+
+def uploadBlocks(engine, names):
+    """
+    Upload the blocks and return the results by block name.
+    """
+    engine.start()
+    for name in names:
+        engine.put(name, makeBlock(name))
+    results = {}
+    for _ in names:
+        result = engine.results.get(timeout = 60)
+        results[result['name']] = result
+    engine.stop()
+    return results
+
+
+class DBSUploadEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        LoadedDbsApi.servers = {}
+        return
+
+    def testClassifyErrors(self):
+        """
+        _testClassifyErrors_
+
+        Upload errors are classified by HTTP code and message.
+        """
+        name = "/A/B/C#1"
+        self.assertEqual(classifyUploadError(name, Exception("Block %s already exists" % name)), 'duplicate')
+        self.assertEqual(classifyUploadError(name, Exception("Proxy Error")), 'proxy')
+        self.assertEqual(classifyUploadError(name, FakeHTTPError(502, "Bad Gateway")), 'proxy')
+        self.assertEqual(classifyUploadError(name, FakeHTTPError(503, "Unavailable")), 'transient')
+        self.assertEqual(classifyUploadError(name, FakeHTTPError(400, "Bad Request")), 'error')
+        self.assertEqual(classifyUploadError(name, Exception("Bad block")), 'error')
+        return
+
+    def testUpload(self):
+        """
+        _testUpload_
+
+        Upload blocks to the emulator, each worker keeps its api.
+        """
+        apis = []
+
+        def apiFactory():
+            apis.append(LoadedDbsApi("test", latency = 0.001, capacity = 4))
+            return apis[-1]
+
+        engine = DBSUploadEngine(apiFactory, maxConcurrency = 4, retryDelay = 0.01)
+        names = ["/A/B/C#%d" % i for i in range(50)]
+        results = uploadBlocks(engine, names)
+
+        self.assertEqual(sorted(results), sorted(names))
+        for result in results.values():
+            self.assertEqual(result['success'], "uploaded")
+        self.assertTrue(len(apis) <= 4)
+        self.assertEqual(len(LoadedDbsApi.servers["test"]['blocks']), 50)
+        stats = engine.stats()
+        self.assertEqual(stats['uploaded'], 50)
+        self.assertEqual(stats['error'], 0)
+        self.assertTrue(stats['throughput'] > 0)
+        self.assertTrue(stats['latencyMax'] >= stats['latencyP95'] >= 0.001)
+
+        engine.resetStats()
+        self.assertEqual(engine.stats()['uploaded'], 0)
+        return
+
+    def testRetries(self):
+        """
+        _testRetries_
+
+        Transient and proxy errors are retried, proxy errors left after
+        the retries put the block on the check list.
+        """
+        engine = DBSUploadEngine(None, maxRetries = 2, retryDelay = 0.01)
+        dbsApi = FailingDbsApi([Exception("Proxy Error"), FakeHTTPError(503, "Unavailable")])
+        self.assertEqual(engine.upload(dbsApi, "a", makeBlock("a"))['success'], "uploaded")
+        self.assertEqual(dbsApi.calls, 3)
+        self.assertEqual(engine.stats()['retries'], 2)
+
+        dbsApi = FailingDbsApi([Exception("Proxy Error")] * 3)
+        self.assertEqual(engine.upload(dbsApi, "b", makeBlock("b"))['success'], "check")
+        self.assertEqual(dbsApi.calls, 3)
+
+        dbsApi = FailingDbsApi([FakeHTTPError(503, "Unavailable")] * 3)
+        self.assertEqual(engine.upload(dbsApi, "c", makeBlock("c"))['success'], "error")
+
+        dbsApi = FailingDbsApi([Exception("Block d already exists")])
+        self.assertEqual(engine.upload(dbsApi, "d", makeBlock("d"))['success'], "uploaded")
+        self.assertEqual(dbsApi.calls, 1)
+
+        dbsApi = FailingDbsApi([Exception("Invalid block")])
+        result = engine.upload(dbsApi, "e", makeBlock("e"))
+        self.assertEqual(result['success'], "error")
+        self.assertTrue("Invalid block" in result['error'])
+        self.assertEqual(dbsApi.calls, 1)
+        self.assertEqual(engine.active, 0)
+        return
+
+    def testAdaptiveConcurrency(self):
+        """
+        _testAdaptiveConcurrency_
+
+        The concurrency backs off when the emulator is overloaded and the
+        blocks hit by proxy errors end up uploaded.
+        """
+        engine = DBSUploadEngine(lambda: LoadedDbsApi("test", latency = 0.005, capacity = 2,
+                                                      proxyErrorRate = 1.0),
+                                 maxConcurrency = 16, maxRetries = 5, retryDelay = 0.01)
+        names = ["/A/B/C#%d" % i for i in range(100)]
+        results = uploadBlocks(engine, names)
+
+        for result in results.values():
+            self.assertEqual(result['success'], "uploaded")
+        stats = engine.stats()
+        self.assertTrue(stats['retries'] > 0)
+        self.assertTrue(stats['concurrency'] < 16)
+        return
+
+    def testLatencyBaseline(self):
+        """
+        _testLatencyBaseline_
+
+        Duplicated blocks don't set the base latency, the latency of the
+        inserts is compared per file and the base latency follows DBS
+        when it gets slower.
+        """
+        engine = DBSUploadEngine(None, maxConcurrency = 8, latencyWindow = 10)
+        dbsApi = SlowDbsApi(0.01, set(["dup"]))
+        self.assertEqual(engine.upload(dbsApi, "dup", makeBlock("dup", 10))['success'], "uploaded")
+        self.assertEqual(engine.baseLatency(), None)
+        for i in range(20):
+            name = "/A/B/C#%d" % i
+            self.assertEqual(engine.upload(dbsApi, name, makeBlock(name, 1 + i % 5))['success'], "uploaded")
+        self.assertEqual(engine.stats()['concurrency'], 8)
+
+        # DBS gets slower for good
+        dbsApi.fileLatency = 0.05
+        engine.upload(dbsApi, "/A/B/C#20", makeBlock("/A/B/C#20", 1))
+        self.assertEqual(engine.stats()['concurrency'], 4)
+        for i in range(21, 40):
+            name = "/A/B/C#%d" % i
+            engine.upload(dbsApi, name, makeBlock(name, 1))
+        self.assertTrue(engine.baseLatency() >= 0.05)
+        # and the concurrency grows again
+        limit = engine.limit
+        engine.upload(dbsApi, "/A/B/C#40", makeBlock("/A/B/C#40", 1))
+        self.assertTrue(engine.limit > limit)
+        return
+
+    @attr('performance')
+    def testBenchmark(self):
+        """
+        _testBenchmark_
+
+        Upload blocks to an emulator overloaded above 4 inserts with a fixed
+        and an adaptive concurrency.
+        """
+        nBlocks = 400
+        for maxConcurrency, latencyFactor in [(4, 1000), (16, 1000), (16, 2.0)]:
+            LoadedDbsApi.servers = {}
+            engine = DBSUploadEngine(lambda: LoadedDbsApi("bench", latency = 0.01, capacity = 4,
+                                                          proxyErrorRate = 0.2),
+                                     maxConcurrency = maxConcurrency, retryDelay = 0.05,
+                                     latencyFactor = latencyFactor)
+            startTime = time.time()
+            uploadBlocks(engine, ["/A/B/C#%d" % i for i in range(nBlocks)])
+            elapsed = time.time() - startTime
+            stats = engine.stats()
+            print("%d workers, latency factor %s: %d blocks in %.2f secs, %d retries, %d to check, "
+                  "latency p95 %.3f secs, max lag %.2f secs, %d DBS calls" %
+                  (maxConcurrency, latencyFactor, stats['uploaded'], elapsed, stats['retries'],
+                   stats['check'], stats['latencyP95'], stats['lagMax'],
+                   LoadedDbsApi.servers["bench"]['calls']))
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
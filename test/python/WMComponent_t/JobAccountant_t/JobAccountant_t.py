@@ -662,6 +662,43 @@ class JobAccountantTest(unittest.TestCase):
 
         return
 
+    def testPipelinedSlices(self):
+        """
+        _testPipelinedSlices_
+
+        Verify that jobs accounted in several slices, with the job reports
+        loaded ahead of the accounting, are accounted correctly.
+        """
+        self.setupDBForSplitJobSuccess()
+        self.testJobB["state"] = "complete"
+        self.testJobC["state"] = "complete"
+        self.stateChangeAction.execute(jobs = [self.testJobB, self.testJobC])
+
+        config = self.createConfig()
+        config.JobAccountant.accountantWorkSize = 1
+        config.JobAccountant.accountantPipelineDepth = 2
+
+        accountant = JobAccountantPoller(config)
+        accountant.setup()
+        accountant.algorithm()
+
+        fwjrBasePath = os.path.join(WMCore.WMBase.getTestBase(),
+                                    "WMComponent_t/JobAccountant_t/fwjrs/")
+        for testJob, fwjrName in [(self.testJobA, "SplitSuccessA.pkl"),
+                                  (self.testJobB, "SplitSuccessB.pkl"),
+                                  (self.testJobC, "SplitSuccessC.pkl")]:
+            jobReport = Report()
+            jobReport.unpersist(fwjrBasePath + fwjrName)
+            self.verifyFileMetaData(testJob["id"], jobReport.getAllFilesFromStep("cmsRun1"), site = "T2_CH_CERN")
+            self.verifyJobSuccess(testJob["id"])
+
+        self.recoOutputFileset.loadData()
+        self.alcaOutputFileset.loadData()
+        self.assertEqual(len(self.recoOutputFileset.getFiles(type = "list")), 3)
+        self.assertEqual(len(self.alcaOutputFileset.getFiles(type = "list")), 3)
+        self.assertEqual(len(self.testSubscription.filesOfStatus("Completed")), 1)
+        return
+
     def setupDBForMergedSkimSuccess(self):
         """
         _setupDBForMergedSkimSuccess_
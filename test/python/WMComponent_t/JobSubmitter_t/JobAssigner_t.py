@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+"""
+_JobAssigner_t_
+
+Unit tests and benchmark for the JobSubmitter site assignment engine.
+"""
+from __future__ import print_function
+
+import copy
+import json
+import os
+import random
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMComponent.JobSubmitter.JobAssigner import JobAssigner
+
+
+def makeThresholds(sites, taskTypes, pendingSlots, runningSlots, pendingJobs=0, runningJobs=0):
+    """
+    _makeThresholds_
+
+    Build a dictionary like the one returned by
+    ResourceControl.listThresholdsForSubmit
+    """
+    rcThresholds = {}
+    for siteName in sites:
+        rcThresholds[siteName] = {"state": "Normal",
+                                  "total_pending_slots": pendingSlots,
+                                  "total_running_slots": runningSlots,
+                                  "total_pending_jobs": pendingJobs,
+                                  "total_running_jobs": runningJobs,
+                                  "thresholds": {}}
+        for taskType, priority in taskTypes.items():
+            rcThresholds[siteName]["thresholds"][taskType] = {"pending_slots": pendingSlots,
+                                                              "max_slots": runningSlots,
+                                                              "task_pending_jobs": pendingJobs,
+                                                              "task_running_jobs": runningJobs,
+                                                              "priority": priority}
+    return rcThresholds
+
+
+def makeSnapshot(nSites, nJobs, nPriorities=10, seed=1234):
+    """
+    _makeSnapshot_
+
+    Generate a random set of thresholds and cached jobs, as they would be
+    found in the JobSubmitterPoller.
+    """
+    rand = random.Random(seed)
+    sites = ["T2_XX_Site%d" % i for i in range(nSites)]
+    taskTypes = {"Processing": 0, "Production": 0, "Merge": 5, "LogCollect": 5}
+    rcThresholds = makeThresholds(sites, taskTypes, 0, 0)
+    for siteName in sites:
+        siteInfo = rcThresholds[siteName]
+        siteInfo["total_pending_slots"] = rand.randint(0, 300)
+        siteInfo["total_running_slots"] = rand.randint(0, 3000)
+        siteInfo["total_pending_jobs"] = rand.randint(0, 300)
+        siteInfo["total_running_jobs"] = rand.randint(0, 3000)
+        for taskInfo in siteInfo["thresholds"].values():
+            taskInfo["pending_slots"] = rand.randint(0, 200)
+            taskInfo["max_slots"] = rand.randint(0, 2000)
+            taskInfo["task_pending_jobs"] = rand.randint(0, 200)
+            taskInfo["task_running_jobs"] = rand.randint(0, 2000)
+
+    jobs = []
+    groups = [(rand.choice(list(taskTypes.keys())), rand.sample(sites, rand.randint(1, 20)))
+              for _ in range(max(1, nJobs // 500))]
+    for jobID in range(nJobs):
+        jobType, possibleSites = rand.choice(groups)
+        jobs.append({"id": jobID, "type": jobType, "possibleLocations": possibleSites,
+                     "timestamp": jobID, "priority": rand.randint(0, nPriorities - 1)})
+    return rcThresholds, jobs
+
+
+def loadSnapshot(path):
+    """
+    _loadSnapshot_
+
+    Load a snapshot of thresholds and cached jobs saved as JSON with a
+    "thresholds" and a "jobs" key, each job with an id, type, timestamp,
+    priority and possibleLocations.
+    """
+    with open(path) as snapshotFile:
+        snapshot = json.load(snapshotFile)
+    return snapshot["thresholds"], snapshot["jobs"]
+
+
+def legacyAssign(rcThresholds, cachedJobs, maxJobs):
+    """
+    _legacyAssign_
+
+    The assignment loop the JobSubmitterPoller used before the JobAssigner,
+    kept to check that the results did not change.
+    """
+    assigned = []
+    for jobPrio in sorted(cachedJobs, reverse=True):
+        if len(assigned) >= maxJobs:
+            break
+        for job in sorted(cachedJobs[jobPrio].values(), key=lambda x: x['timestamp']):
+            jobType = job['type']
+            for siteName in job['possibleLocations']:
+                if siteName not in rcThresholds:
+                    continue
+                try:
+                    siteInfo = rcThresholds[siteName]
+                    taskInfo = siteInfo['thresholds'][jobType]
+                except KeyError:
+                    continue
+                if siteInfo["total_pending_jobs"] >= siteInfo["total_pending_slots"] or \
+                   taskInfo["task_pending_jobs"] >= taskInfo["pending_slots"]:
+                    continue
+                if siteInfo["total_pending_jobs"] + siteInfo["total_running_jobs"] >= \
+                   siteInfo["total_pending_slots"] + siteInfo["total_running_slots"]:
+                    continue
+                if taskInfo["task_pending_jobs"] + taskInfo["task_running_jobs"] >= \
+                   taskInfo["pending_slots"] + taskInfo["max_slots"]:
+                    continue
+                siteInfo["total_pending_jobs"] += 1
+                taskInfo["task_pending_jobs"] += 1
+                assigned.append((jobPrio, job['id'], siteName, taskInfo["priority"]))
+                break
+            if len(assigned) >= maxJobs:
+                break
+    return assigned
+
+
+class JobAssignerTest(unittest.TestCase):
+    """
+    _JobAssignerTest_
+
+    Test the site assignment engine of the JobSubmitter
+    """
+
+    def fillAssigner(self, jobs):
+        """
+        _fillAssigner_
+
+        Queue the jobs in a new JobAssigner and in a cachedJobs like
+        dictionary.
+        """
+        assigner = JobAssigner()
+        cachedJobs = {}
+        for job in jobs:
+            assigner.addJob(job["priority"], job)
+            cachedJobs.setdefault(job["priority"], {})[job["id"]] = job
+        return assigner, cachedJobs
+
+    def testAssignment(self):
+        """
+        _testAssignment_
+
+        Jobs go to the first site with free slots, by priority and age.
+        """
+        rcThresholds = makeThresholds(["T1_US_FNAL", "T2_CH_CERN"], {"Processing": 0, "Merge": 5}, 2, 10)
+        jobs = [{"id": 1, "type": "Processing", "possibleLocations": ["T1_US_FNAL", "T2_CH_CERN"],
+                 "timestamp": 30, "priority": 1},
+                {"id": 2, "type": "Processing", "possibleLocations": ["T1_US_FNAL"],
+                 "timestamp": 10, "priority": 1},
+                {"id": 3, "type": "Merge", "possibleLocations": ["T1_US_FNAL"],
+                 "timestamp": 50, "priority": 2},
+                {"id": 4, "type": "Processing", "possibleLocations": ["T1_US_FNAL"],
+                 "timestamp": 40, "priority": 1},
+                {"id": 5, "type": "Processing", "possibleLocations": ["T1_IT_CNAF"],
+                 "timestamp": 0, "priority": 1}]
+        assigner, _ = self.fillAssigner(jobs)
+        assigner.setThresholds(rcThresholds)
+
+        result = assigner.assign(10)
+        self.assertEqual(result, [(2, 3, "T1_US_FNAL", 5),
+                                  (1, 2, "T1_US_FNAL", 0),
+                                  (1, 1, "T2_CH_CERN", 0)])
+        self.assertEqual(rcThresholds["T1_US_FNAL"]["total_pending_jobs"], 2)
+        self.assertEqual(rcThresholds["T1_US_FNAL"]["thresholds"]["Processing"]["task_pending_jobs"], 1)
+        self.assertEqual(rcThresholds["T2_CH_CERN"]["total_pending_jobs"], 1)
+
+        # remove the assigned jobs and open more slots
+        for jobPrio, jobID, _, _ in result:
+            assigner.removeJob(jobPrio, jobID)
+        rcThresholds = makeThresholds(["T1_US_FNAL", "T2_CH_CERN"], {"Processing": 0, "Merge": 5}, 2, 10)
+        assigner.setThresholds(rcThresholds)
+        self.assertEqual(assigner.assign(10), [(1, 4, "T1_US_FNAL", 0)])
+        self.assertEqual(assigner.numberOfJobs(), 2)
+
+        assigner.reset()
+        self.assertEqual(assigner.assign(10), [])
+        return
+
+    def testRemoveAndAddBack(self):
+        """
+        _testRemoveAndAddBack_
+
+        A job removed and added back before the next assignment is still
+        assigned, only its old entry is dropped.
+        """
+        rcThresholds = makeThresholds(["T1_US_FNAL"], {"Processing": 0}, 10, 10)
+        jobs = [{"id": 1, "type": "Processing", "possibleLocations": ["T1_US_FNAL"],
+                 "timestamp": 10, "priority": 1},
+                {"id": 2, "type": "Processing", "possibleLocations": ["T1_US_FNAL"],
+                 "timestamp": 20, "priority": 1}]
+        assigner, _ = self.fillAssigner(jobs)
+        assigner.setThresholds(rcThresholds)
+        self.assertEqual(len(assigner.assign(10)), 2)
+
+        # job 1 failed to submit and is back in the cache, job 2 went through
+        assigner.removeJob(1, 1)
+        assigner.removeJob(1, 2)
+        assigner.addJob(1, jobs[0])
+        self.assertEqual(assigner.numberOfJobs(), 1)
+
+        assigner.setThresholds(makeThresholds(["T1_US_FNAL"], {"Processing": 0}, 10, 10))
+        self.assertEqual(assigner.assign(10), [(1, 1, "T1_US_FNAL", 0)])
+        self.assertEqual(assigner.numberOfJobs(), 1)
+        return
+
+    def testMaxJobs(self):
+        """
+        _testMaxJobs_
+
+        No more than maxJobs jobs are assigned per call.
+        """
+        rcThresholds, jobs = makeSnapshot(20, 2000)
+        assigner, _ = self.fillAssigner(jobs)
+        assigner.setThresholds(rcThresholds)
+        self.assertTrue(len(assigner.assign(5)) <= 5)
+        return
+
+    def testLegacyCompatibility(self):
+        """
+        _testLegacyCompatibility_
+
+        The engine must hand out the same slots as the old assignment loop.
+        """
+        for seed in range(5):
+            rcThresholds, jobs = makeSnapshot(50, 20000, seed=seed)
+            legacyThresholds = copy.deepcopy(rcThresholds)
+
+            assigner, cachedJobs = self.fillAssigner(jobs)
+            assigner.setThresholds(rcThresholds)
+            result = assigner.assign(5000)
+
+            self.assertTrue(len(result) > 0)
+            self.assertEqual(result, legacyAssign(legacyThresholds, cachedJobs, 5000))
+            self.assertEqual(rcThresholds, legacyThresholds)
+        return
+
+    @attr('performance')
+    def testBenchmark(self):
+        """
+        _testBenchmark_
+
+        Time the assignment of a snapshot of thresholds and cached jobs. The
+        snapshot is read from the file in the JOBASSIGNER_SNAPSHOT environment
+        variable, or generated with 500 sites and 1M jobs.
+        """
+        snapshotPath = os.getenv("JOBASSIGNER_SNAPSHOT", None)
+        if snapshotPath:
+            rcThresholds, jobs = loadSnapshot(snapshotPath)
+        else:
+            rcThresholds, jobs = makeSnapshot(500, 1000000)
+        legacyThresholds = copy.deepcopy(rcThresholds)
+
+        startTime = time.time()
+        assigner, cachedJobs = self.fillAssigner(jobs)
+        print("Queued %d jobs in %.3f seconds" % (len(jobs), time.time() - startTime))
+
+        for cycle in range(3):
+            assigner.setThresholds(copy.deepcopy(rcThresholds))
+            startTime = time.time()
+            result = assigner.assign(5000)
+            print("Cycle %d: assigned %d jobs in %.3f seconds" % (cycle, len(result), time.time() - startTime))
+            for jobPrio, jobID, _, _ in result:
+                assigner.removeJob(jobPrio, jobID)
+
+        startTime = time.time()
+        result = legacyAssign(legacyThresholds, cachedJobs, 5000)
+        print("Old loop: assigned %d jobs in %.3f seconds" % (len(result), time.time() - startTime))
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
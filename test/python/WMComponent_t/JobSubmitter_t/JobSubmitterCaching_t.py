@@ -194,5 +194,48 @@ class JobSubmitterCachingTest(unittest.TestCase):
                          "Error: The job cache should be empty.  Contains: %i" % len(mySubmitterPoller.cachedJobIDs))
         return
 
+    def testIncrementalCaching(self):
+        """
+        _testIncrementalCaching_
+
+        Verify that the incremental cache refresh picks up new jobs and drops
+        the killed ones.
+        """
+        config = self.createConfig()
+        config.JobSubmitter.incrementalRefresh = True
+        mySubmitterPoller = JobSubmitterPoller(config)
+        mySubmitterPoller.getThresholds()
+        mySubmitterPoller.refreshCache()
+
+        self.assertEqual(len(mySubmitterPoller.cachedJobIDs), 0)
+        self.assertNotEqual(mySubmitterPoller.refreshHighWaterMark, None)
+
+        self.injectJobs()
+        mySubmitterPoller.refreshCache()
+
+        # the jobs were found through the delta query
+        self.assertEqual(mySubmitterPoller.refreshPollingCount, 1)
+        self.assertEqual(len(mySubmitterPoller.cachedJobIDs), 20)
+        self.assertEqual(sorted(mySubmitterPoller.cachedJobPrio.keys()),
+                         sorted(mySubmitterPoller.cachedJobIDs))
+
+        killWorkflow("wf001", jobCouchConfig = config)
+        mySubmitterPoller.refreshCache()
+
+        self.assertEqual(mySubmitterPoller.refreshPollingCount, 2)
+        self.assertEqual(len(mySubmitterPoller.cachedJobIDs), 10)
+        self.assertEqual(len(mySubmitterPoller.cachedJobPrio), 10)
+        self.assertEqual(sum([len(x) for x in mySubmitterPoller.cachedJobs.values()]), 10)
+
+        # force a full refresh
+        mySubmitterPoller.refreshPollingCount = mySubmitterPoller.skipRefreshCount
+        killWorkflow("wf002", jobCouchConfig = config)
+        mySubmitterPoller.refreshCache()
+
+        self.assertEqual(mySubmitterPoller.refreshPollingCount, 0)
+        self.assertEqual(len(mySubmitterPoller.cachedJobIDs), 0)
+        self.assertEqual(len(mySubmitterPoller.cachedJobPrio), 0)
+        return
+
 if __name__ == "__main__":
     unittest.main()
@@ -11,11 +11,13 @@ import threading
 import time
 import unittest
 import logging
+from httplib import HTTPException
 
-from WMComponent.PhEDExInjector.PhEDExInjectorPoller import PhEDExInjectorPoller
+from WMComponent.PhEDExInjector.PhEDExInjectorPoller import PhEDExInjectorPoller, coalesceInjections
 from WMComponent.DBS3Buffer.DBSBufferFile import DBSBufferFile
 from WMComponent.DBS3Buffer.DBSBufferBlock import DBSBufferBlock
 
+from WMCore.Services.EmulatorSwitch import EmulatorHelper
 from WMCore.Services.PhEDEx.PhEDEx import PhEDEx
 from WMCore.Services.UUID import makeUUID
 
@@ -74,6 +76,7 @@ class PhEDExInjectorPollerTest(unittest.TestCase):
         Delete the database.
         """
         self.testInit.clearDatabase()
+        EmulatorHelper.resetEmulators()
 
     def stuffDatabase(self):
         """
@@ -332,5 +335,122 @@ class PhEDExInjectorPollerTest(unittest.TestCase):
 
         return
 
+    def testPollerCoalesced(self):
+        """
+        _testPollerCoalesced_
+
+        Inject the files of both datasets together in PhEDEx emulators from
+        several threads, with a single status update.  When a drop fails
+        its datasets are injected one by one.
+        """
+        self.stuffDatabase()
+        EmulatorHelper.setEmulators(phedex = True, dbs = False, siteDB = False)
+
+        config = self.createConfig()
+        config.PhEDExInjector.coalesceInjections = True
+        config.PhEDExInjector.injectionMaxFiles = 3
+        config.PhEDExInjector.injectionThreads = 2
+
+        poller = PhEDExInjectorPoller(config)
+        poller.setup(parameters = None)
+
+        statusUpdates = []
+        setStatus = poller.setStatus.execute
+
+        def recordStatus(lfns, status, conn = None, transaction = False):
+            statusUpdates.append(sorted(lfns))
+            return setStatus(lfns, status, conn = conn, transaction = transaction)
+        poller.setStatus.execute = recordStatus
+
+        lfnsA = sorted([x["lfn"] for x in self.testFilesA])
+        lfnsB = sorted([x["lfn"] for x in self.testFilesB])
+
+        # the three files of dataset A then the two of dataset B
+        poller.injectFiles()
+        self.assertEqual(len(poller.injectionPhEDEx), 2)
+        self.assertEqual(statusUpdates, [sorted(lfnsA + lfnsB)])
+        self.assertEqual(poller.getUninjected.execute(), {})
+
+        # a single drop, failing because of dataset B
+        setStatus(lfnsA + lfnsB, 0)
+        poller.injectionMaxFiles = 5000
+        statusUpdates[:] = []
+
+        def injectBlocks(location, xmlData):
+            if self.testDatasetB in xmlData:
+                return {"error": "bad dataset"}
+            return {}
+        for phedex in poller.injectionPhEDEx:
+            phedex.injectBlocks = injectBlocks
+
+        poller.injectFiles()
+        self.assertEqual(statusUpdates, [lfnsA])
+        uninjectedFiles = poller.getUninjected.execute()
+        self.assertEqual(uninjectedFiles.keys(), ["srm-cms.cern.ch"])
+        self.assertEqual(uninjectedFiles["srm-cms.cern.ch"].keys(), [self.testDatasetB])
+        self.assertEqual(poller.blocksToRecover, [])
+
+        # an HTTP 400 because of dataset B, the blocks are recovered once
+        setStatus(lfnsA, 0)
+        statusUpdates[:] = []
+
+        def injectBlocks400(location, xmlData):
+            if self.testDatasetB in xmlData:
+                ex = HTTPException()
+                ex.status = 400
+                ex.result = "bad dataset"
+                raise ex
+            return {}
+        for phedex in poller.injectionPhEDEx:
+            phedex.injectBlocks = injectBlocks400
+
+        poller.injectFiles()
+        self.assertEqual(statusUpdates, [lfnsA])
+        self.assertEqual(poller.getUninjected.execute()["srm-cms.cern.ch"].keys(), [self.testDatasetB])
+
+        recoveredBlocks = []
+
+        def getInjectedFiles(block):
+            recoveredBlocks.extend(block.keys())
+            return []
+        poller.phedex.getInjectedFiles = getInjectedFiles
+        poller.recoverInjectedFiles()
+        self.assertEqual(sorted(recoveredBlocks), sorted([self.blockAName, self.blockBName]))
+        self.assertEqual(poller.blocksToRecover, [])
+        return
+
+    def testCoalesceInjections(self):
+        """
+        _testCoalesceInjections_
+
+        Verify that the datasets for a node are injected together, with
+        whole blocks and a bounded number of files per injection.
+        """
+        def makeBlock(blockName, nFiles):
+            files = [{"lfn": "%s_%d" % (blockName, i), "size": 1, "checksum": {"cksum": "1"}}
+                     for i in range(nFiles)]
+            return {"is-open": "y", "files": files}
+
+        injections = {"T1_US_FNAL_Buffer": {"/A/B/C": {"blockA": makeBlock("blockA", 2),
+                                                         "blockB": makeBlock("blockB", 2)},
+                                              "/D/E/F": {"blockC": makeBlock("blockC", 5)}},
+                      "T2_CH_CERN": {"/G/H/I": {"blockD": makeBlock("blockD", 1)},
+                                     "/J/K/L": {"blockE": makeBlock("blockE", 1)}}}
+
+        drops = coalesceInjections(injections, 4)
+        self.assertEqual(len(drops), 3)
+        self.assertEqual([location for location, _, _ in drops],
+                         ["T1_US_FNAL_Buffer", "T1_US_FNAL_Buffer", "T2_CH_CERN"])
+        self.assertEqual(sorted(drops[0][1]["/A/B/C"]), ["blockA", "blockB"])
+        self.assertEqual(len(drops[0][2]), 4)
+        # a block over the limit is not split
+        self.assertEqual(drops[1][1].keys(), ["/D/E/F"])
+        self.assertEqual(len(drops[1][2]), 5)
+        self.assertEqual(sorted(drops[2][1]), ["/G/H/I", "/J/K/L"])
+        self.assertEqual(sorted(drops[2][2]), ["blockD_0", "blockE_0"])
+
+        self.assertEqual(len(coalesceInjections(injections, 5000)), 2)
+        return
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+"""
+_SimpleCondorPlugin_t_
+
+Unit tests for the job tracking of the SimpleCondorPlugin, against a fake
+schedd.  The condor python bindings are replaced by empty modules when
+they are not installed, the fake schedd is all the tests need.
+"""
+from __future__ import print_function
+
+import new
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+
+try:
+    import htcondor
+    import classad
+except ImportError:
+    htcondor = sys.modules['htcondor'] = types.ModuleType('htcondor')
+    classad = sys.modules['classad'] = types.ModuleType('classad')
+    classad.quote = lambda value: '"%s"' % value
+
+from WMCore.BossAir.Plugins import SimpleCondorPlugin as PluginModule
+from WMCore.BossAir.Plugins.BasePlugin import BossAirPluginException
+from WMCore.BossAir.Plugins.SimpleCondorPlugin import SimpleCondorPlugin
+
+
+class FakeSchedd(object):
+    """
+    Schedd with a queue and a history of job ads, recording the queries.
+    """
+    def __init__(self):
+        self.queue = {}
+        self.historyAds = {}
+        self.queries = []
+
+    def setJob(self, gridId, status, entered, site=None, inQueue=True):
+        clusterId, procId = [int(x) for x in gridId.split('.')]
+        jobAd = {'ClusterId': clusterId, 'ProcId': procId, 'JobStatus': status,
+                 'EnteredCurrentStatus': entered, 'MATCH_EXP_JOBGLIDEIN_CMSSite': site}
+        self.queue.pop(gridId, None)
+        self.historyAds.pop(gridId, None)
+        if inQueue:
+            self.queue[gridId] = jobAd
+        else:
+            self.historyAds[gridId] = jobAd
+
+    @staticmethod
+    def matches(jobAd, constraint):
+        for term in constraint.split(' && ')[1:]:
+            if term.startswith('EnteredCurrentStatus >= '):
+                if jobAd['EnteredCurrentStatus'] < int(term.split()[-1]):
+                    return False
+            elif term.startswith('member(ClusterId, {'):
+                clusterIds = term[len('member(ClusterId, {'):-2].split(', ')
+                if str(jobAd['ClusterId']) not in clusterIds:
+                    return False
+        return True
+
+    def xquery(self, constraint, attributes):
+        self.queries.append(('xquery', constraint, attributes))
+        return [dict([(x, jobAd[x]) for x in attributes])
+                for jobAd in self.queue.values() if self.matches(jobAd, constraint)]
+
+    def history(self, constraint, attributes, match):
+        self.queries.append(('history', constraint, match))
+        result = [jobAd for jobAd in self.historyAds.values() if self.matches(jobAd, constraint)]
+        return result[:match] if match >= 0 else result
+
+
+class SimpleCondorPluginTest(unittest.TestCase):
+
+    def setUp(self):
+        self.schedd = FakeSchedd()
+        self.now = 100000
+        htcondor.Schedd = lambda: self.schedd
+        self.originalTime = PluginModule.time.time
+        PluginModule.time.time = lambda: self.now
+        self.jobs = {}
+
+    def tearDown(self):
+        PluginModule.time.time = self.originalTime
+
+    def makePlugin(self, incrementalTracking):
+        """
+        Plugin with only the tracking attributes
+        """
+        plugin = new.instance(SimpleCondorPlugin)
+        plugin.agent = 'testAgent'
+        plugin.incrementalTracking = incrementalTracking
+        plugin.fullTrackInterval = 3600
+        plugin.trackTimeMargin = 60
+        plugin.jobAdCache = {}
+        plugin.lastTrackTime = None
+        plugin.lastFullTrackTime = None
+        return plugin
+
+    def addJob(self, gridId, status='Idle'):
+        self.jobs[gridId] = {'jobid': len(self.jobs), 'gridid': gridId, 'status': status}
+
+    def track(self, plugin):
+        """
+        Track the jobs and drop the complete ones like BossAirAPI does
+        """
+        self.schedd.queries = []
+        running, changed, complete = plugin.track(self.jobs.values())
+        for job in complete:
+            del self.jobs[job['gridid']]
+        return (sorted([x['gridid'] for x in running]), sorted([x['gridid'] for x in changed]),
+                sorted([x['gridid'] for x in complete]))
+
+    def testFullTracking(self):
+        """
+        _testFullTracking_
+
+        Every poll queries the whole queue and the history of the jobs
+        which left it, limited to the number of these jobs.
+        """
+        plugin = self.makePlugin(False)
+        for i in range(3):
+            self.addJob("1.%d" % i)
+            self.schedd.setJob("1.%d" % i, 1, self.now)
+        self.assertEqual(self.track(plugin), (["1.0", "1.1", "1.2"], [], []))
+        self.assertEqual([x[0] for x in self.schedd.queries], ['xquery'])
+
+        self.now += 300
+        self.schedd.setJob("1.0", 2, self.now, site="T2_CH_CERN")
+        self.schedd.setJob("1.1", 4, self.now, inQueue=False)
+        self.assertEqual(self.track(plugin), (["1.0", "1.2"], ["1.0", "1.1"], ["1.1"]))
+        self.assertEqual(self.jobs["1.0"]['location'], "T2_CH_CERN")
+        history = [x for x in self.schedd.queries if x[0] == 'history']
+        self.assertEqual(len(history), 1)
+        self.assertTrue("member(ClusterId, {1})" in history[0][1])
+        self.assertEqual(history[0][2], 1)
+
+        # jobs unknown to the queue and the history are complete
+        self.schedd.queue.pop("1.2")
+        self.assertEqual(self.track(plugin), (["1.0"], ["1.2"], ["1.2"]))
+        self.assertEqual(self.jobs["1.0"]['status'], "Running")
+        return
+
+    def testIncrementalTracking(self):
+        """
+        _testIncrementalTracking_
+
+        Only the changed ads and the ids of the queue are queried between
+        the full queries, the history only for the jobs which left it.
+        """
+        plugin = self.makePlugin(True)
+        for i in range(4):
+            self.addJob("2.%d" % i)
+            self.schedd.setJob("2.%d" % i, 1, self.now)
+        self.assertEqual(self.track(plugin), (["2.0", "2.1", "2.2", "2.3"], [], []))
+        self.assertEqual(len(plugin.jobAdCache), 4)
+
+        # nothing changed, no history query
+        self.now += 300
+        self.assertEqual(self.track(plugin), (["2.0", "2.1", "2.2", "2.3"], [], []))
+        self.assertEqual(self.schedd.queries,
+                         [('xquery', 'WMAgent_AgentName == "testAgent" && EnteredCurrentStatus >= 99940',
+                           SimpleCondorPlugin.trackAttributes),
+                          ('xquery', 'WMAgent_AgentName == "testAgent"', ['ClusterId', 'ProcId'])])
+
+        # a job starts running, one completes, one is removed and lost from the history
+        self.now += 300
+        self.schedd.setJob("2.0", 2, self.now - 10, site="T1_US_FNAL")
+        self.schedd.setJob("2.1", 4, self.now - 10, inQueue=False)
+        self.schedd.queue.pop("2.2")
+        self.assertEqual(self.track(plugin), (["2.0", "2.3"], ["2.0", "2.1", "2.2"], ["2.1", "2.2"]))
+        history = [x for x in self.schedd.queries if x[0] == 'history']
+        self.assertEqual(len(history), 1)
+        self.assertTrue("member(ClusterId, {2})" in history[0][1])
+        self.assertTrue("EnteredCurrentStatus >= 100240" in history[0][1])
+        self.assertEqual(history[0][2], 2)
+        self.assertEqual(sorted(plugin.jobAdCache), ["2.0", "2.3"])
+        self.assertEqual(self.jobs["2.0"]['location'], "T1_US_FNAL")
+
+        # the full query resynchronizes the cache
+        self.now += 3600
+        self.schedd.setJob("2.3", 5, 0)
+        self.assertEqual(self.track(plugin), (["2.0"], ["2.3"], ["2.3"]))
+        self.assertEqual([x[0] for x in self.schedd.queries], ['xquery'])
+        self.assertEqual(sorted(plugin.jobAdCache), ["2.0"])
+        return
+
+    def testComplete(self):
+        """
+        _testComplete_
+
+        Failed job reports are created for the jobs without a report, the
+        jobs which could not be completed are reported after the others.
+        """
+        tempDir = tempfile.mkdtemp()
+        try:
+            plugin = self.makePlugin(False)
+            jobs = [{'id': i, 'gridid': "3.%d" % i, 'cache_dir': os.path.join(tempDir, "job_%d" % i),
+                     'retry_count': 0} for i in range(6)]
+            # job 5 can't get a cache directory
+            with open(os.path.join(tempDir, "notADir"), 'w') as notADir:
+                notADir.write("")
+            jobs[5]['cache_dir'] = os.path.join(tempDir, "notADir", "job_5")
+
+            for completeThreads in [1, 4]:
+                plugin.completeThreads = completeThreads
+                # jobs 0 and 1 have a report, 2 and 3 only a cache directory,
+                # 4 and 5 nothing
+                for job in jobs[:5]:
+                    if os.path.exists(job['cache_dir']):
+                        shutil.rmtree(job['cache_dir'])
+                for job in jobs[:4]:
+                    os.mkdir(job['cache_dir'])
+                for job in jobs[:2]:
+                    with open(os.path.join(job['cache_dir'], "Report.0.pkl"), 'w') as reportFile:
+                        reportFile.write("report")
+                with open(os.path.join(jobs[3]['cache_dir'], "condor.3.3.err"), 'w') as errFile:
+                    errFile.write("the error\n")
+
+                self.assertRaises(BossAirPluginException, plugin.complete, jobs)
+                for job in jobs[:5]:
+                    reportName = os.path.join(job['cache_dir'], "Report.0.pkl")
+                    self.assertTrue(os.path.getsize(reportName) > 0)
+                self.assertEqual(open(os.path.join(jobs[0]['cache_dir'], "Report.0.pkl")).read(), "report")
+                self.assertFalse(os.path.exists(jobs[5]['cache_dir']))
+
+                self.assertEqual(plugin.completeJob(jobs[0]), (False, None))
+                self.assertEqual(plugin.completeJob(jobs[5])[0], False)
+                self.assertTrue("3.5" in plugin.completeJob(jobs[5])[1])
+        finally:
+            shutil.rmtree(tempDir)
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
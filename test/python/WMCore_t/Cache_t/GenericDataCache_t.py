@@ -6,6 +6,7 @@ Test class for the WMConfigCache
 from __future__ import print_function, division
 
 import unittest
+import threading
 import time
 from WMCore.Cache.GenericDataCache import GenericDataCache, CacheExistException, \
                           CacheWithWrongStructException, MemoryCacheStruct
@@ -31,8 +32,106 @@ class GenericDataCacheTest(unittest.TestCase):
         time.sleep(2)
         after = mc2.getData()
         self.assertFalse(before == after)
-        self.assertFalse(mc2.lastUpdate == -1)
-        
+        self.assertFalse(mc2.lastUpdated == -1)
+
+        # not refreshed before it expires
+        self.assertEqual(mc2.getData(), after)
+        self.assertEqual(mc2.getStats()["refreshes"], 2)
+        return
+
+    def testSingleFlight(self):
+        """
+        _testSingleFlight_
+
+        Concurrent calls on an empty cache only call the function once.
+        """
+        calls = []
+        def slowFunc():
+            calls.append(1)
+            time.sleep(0.5)
+            return len(calls)
+
+        mc = MemoryCacheStruct(60, slowFunc)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(mc.getData())) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [1] * 10)
+        stats = mc.getStats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 9)
+        self.assertTrue(stats["lastRefreshTime"] >= 0.5)
+        return
+
+    def testStaleWhileRevalidate(self):
+        """
+        _testStaleWhileRevalidate_
+
+        Expired data is served while it is refreshed in the background, and
+        kept if the refresh fails.
+        """
+        values = [1]
+        def func():
+            time.sleep(0.5)
+            if values[0] is None:
+                raise RuntimeError("backend down")
+            return values[0]
+
+        mc = MemoryCacheStruct(0, func, staleWhileRevalidate=True)
+        self.assertEqual(mc.getData(), 1)
+        time.sleep(1.1)
+
+        values[0] = 2
+        startTime = time.time()
+        self.assertEqual(mc.getData(), 1)
+        self.assertTrue(time.time() - startTime < 0.5)
+        time.sleep(1)
+        self.assertEqual(mc.data, 2)
+        self.assertEqual(mc.getStats()["staleHits"], 1)
+
+        values[0] = None
+        time.sleep(1.1)
+        self.assertEqual(mc.getData(), 2)
+        time.sleep(1)
+        self.assertEqual(mc.data, 2)
+        self.assertEqual(mc.getStats()["refreshErrors"], 1)
+
+        # too stale data is not served any more
+        mc = MemoryCacheStruct(0, lambda: values[0], staleWhileRevalidate=True, maxStale=0)
+        values[0] = 3
+        self.assertEqual(mc.getData(), 3)
+        values[0] = 4
+        time.sleep(1.1)
+        self.assertEqual(mc.getData(), 4)
+        return
+
+    def testEviction(self):
+        """
+        _testEviction_
+
+        Only the data of the most recently used caches is kept.
+        """
+        for i in range(3):
+            GenericDataCache.registerCache("evict%d" % i, MemoryCacheStruct(60, lambda x: x, {'x': i}))
+
+        try:
+            GenericDataCache.setEvictionPolicy(maxCachedData=2)
+            for i in range(3):
+                self.assertEqual(GenericDataCache.getCacheData("evict%d" % i).getData(), i)
+                time.sleep(1.1)
+
+            self.assertEqual(GenericDataCache.getCacheData("evict0").lastUpdated, -1)
+            self.assertFalse(GenericDataCache.getCacheData("evict2").lastUpdated == -1)
+            self.assertEqual(GenericDataCache.getCacheData("evict0").getData(), 0)
+
+            stats = GenericDataCache.getCacheStats()
+            self.assertEqual(stats["evict0"]["refreshes"], 2)
+        finally:
+            GenericDataCache.setEvictionPolicy()
         return
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+_JobStore_t_
+
+Unittests for the job pack files and the JobStore
+"""
+
+import os
+import unittest
+
+from WMQuality.TestInit import TestInit
+
+from WMCore.DataStructs.Job import Job
+from WMCore.DataStructs.JobStore import JobStore, JobPack, JobPackException, \
+                                        jobPackPath, JOB_PICKLE_NAME, JOB_PACK_NAME
+
+
+class JobStoreTest(unittest.TestCase):
+    def setUp(self):
+        """
+        _setUp_
+
+        Create a temporary directory for the job collections.
+        """
+        self.testInit = TestInit(__file__)
+        self.testDir = self.testInit.generateWorkDir()
+        return
+
+    def tearDown(self):
+        self.testInit.delWorkDir()
+        return
+
+    def makeJobs(self, collection, firstID, nJobs):
+        """
+        _makeJobs_
+
+        Create jobs with their cache directories in a job collection.
+        """
+        jobs = []
+        for jobID in range(firstID, firstID + nJobs):
+            job = Job("Job%d" % jobID)
+            job["id"] = jobID
+            job["cache_dir"] = os.path.join(self.testDir, collection, "job_%d" % jobID)
+            setattr(job.getBaggage(), "seed", jobID)
+            os.makedirs(job["cache_dir"])
+            jobs.append(job)
+        return jobs
+
+    def testPack(self):
+        """
+        _testPack_
+
+        Write a pack, read jobs back from it and add jobs to it.
+        """
+        jobs = self.makeJobs("JobCollection_1_0", 1, 100)
+        packPath = jobPackPath(jobs[0]["cache_dir"])
+        self.assertEqual(packPath, os.path.join(self.testDir, "JobCollection_1_0", JOB_PACK_NAME))
+
+        jobPack = JobPack(packPath)
+        jobPack.write(jobs)
+        self.assertFalse([x for x in os.listdir(os.path.dirname(packPath)) if ".tmp." in x])
+
+        jobPack = JobPack(packPath)
+        self.assertEqual(sorted(jobPack.ids()), list(range(1, 101)))
+        for jobID in [57, 1, 100, 3]:
+            job = jobPack.load(jobID)
+            self.assertEqual(job["name"], "Job%d" % jobID)
+            self.assertEqual(job.getBaggage().seed, jobID)
+        self.assertEqual(jobPack.load(101), None)
+
+        jobPack.write(self.makeJobs("JobCollection_1_0", 101, 10))
+        jobPack.close()
+        self.assertEqual(sorted(JobPack(packPath).ids()), list(range(1, 111)))
+        self.assertEqual(JobPack(packPath).load(42)["name"], "Job42")
+
+        with open(os.path.join(self.testDir, "notAPack"), "w") as badFile:
+            badFile.write("something else")
+        self.assertRaises(JobPackException, JobPack(os.path.join(self.testDir, "notAPack")).ids)
+        self.assertRaises(JobPackException, JobPack(os.path.join(self.testDir, "missing")).ids)
+        return
+
+    def testJobStore(self):
+        """
+        _testJobStore_
+
+        Save jobs as pickle files and in packs and load them back.
+        """
+        pickledJobs = self.makeJobs("JobCollection_1_0", 1, 10)
+        JobStore().addJob(pickledJobs[0])
+        self.assertTrue(os.path.isfile(os.path.join(pickledJobs[0]["cache_dir"], JOB_PICKLE_NAME)))
+        for job in pickledJobs[1:]:
+            JobStore().addJob(job)
+
+        jobStore = JobStore(usePack=True)
+        packedJobs = self.makeJobs("JobCollection_2_0", 11, 10) + self.makeJobs("JobCollection_2_1", 21, 10)
+        for job in packedJobs:
+            jobStore.addJob(job)
+        self.assertFalse(os.path.exists(jobPackPath(packedJobs[0]["cache_dir"])))
+        jobStore.flush()
+        self.assertTrue(os.path.isfile(jobPackPath(packedJobs[0]["cache_dir"])))
+        self.assertTrue(os.path.isfile(jobPackPath(packedJobs[-1]["cache_dir"])))
+        self.assertFalse(os.path.exists(os.path.join(packedJobs[0]["cache_dir"], JOB_PICKLE_NAME)))
+
+        jobStore = JobStore()
+        for job in pickledJobs + packedJobs:
+            loadedJob = jobStore.loadJob(job["cache_dir"], job["id"])
+            self.assertEqual(loadedJob["name"], job["name"])
+            self.assertEqual(loadedJob.getBaggage().seed, job["id"])
+        self.assertEqual(len(jobStore.packs), 2)
+
+        missingJob = self.makeJobs("JobCollection_2_1", 31, 1)[0]
+        self.assertEqual(jobStore.loadJob(missingJob["cache_dir"], missingJob["id"]), None)
+
+        jobStore.clear()
+        self.assertEqual(jobStore.packs, {})
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""
+_LumiIndex_t_
+
+Unittests and benchmark for the run/lumi interval index
+"""
+from __future__ import print_function
+
+import random
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.DataStructs.LumiIndex import LumiIndex, compactRanges, intersectRanges, \
+                                         unionRanges, subtractRanges
+from WMCore.DataStructs.Mask import Mask
+from WMCore.JobSplitting.LumiBased import isGoodLumi
+
+
+def makeLumiMask(nRuns, nRanges, seed=1234):
+    """
+    _makeLumiMask_
+
+    Build a random lumi mask with string run numbers as keys.
+    """
+    rand = random.Random(seed)
+    lumiMask = {}
+    for run in range(1, nRuns + 1):
+        lumiMask[str(run)] = []
+        lumi = 1
+        for _ in range(nRanges):
+            lumi += rand.randint(1, 10)
+            lastLumi = lumi + rand.randint(0, 20)
+            lumiMask[str(run)].append([lumi, lastLumi])
+            lumi = lastLumi + 1
+    return lumiMask
+
+
+def scanRanges(ranges, lumi):
+    """
+    _scanRanges_
+
+    The linear lookup the masks used before the index.
+    """
+    for pair in ranges:
+        if pair[0] <= lumi and pair[1] >= lumi:
+            return True
+    return False
+
+
+class LumiIndexTest(unittest.TestCase):
+    """
+    _LumiIndexTest_
+
+    Test the run/lumi interval index
+    """
+
+    def testRangeOperations(self):
+        """
+        _testRangeOperations_
+
+        Compare compaction, intersection, union and subtraction of ranges
+        with the same operations on sets of lumis.
+        """
+        def lumiSet(ranges):
+            return set([x for first, last in ranges for x in range(first, last + 1)])
+
+        rand = random.Random(42)
+        for _ in range(500):
+            aRanges = [[x, x + rand.randint(0, 8)] for x in rand.sample(range(1, 80), rand.randint(0, 8))]
+            bRanges = [[x, x + rand.randint(0, 8)] for x in rand.sample(range(1, 80), rand.randint(0, 8))]
+            aCompact = compactRanges(aRanges)
+            bCompact = compactRanges(bRanges)
+
+            for result, expected in [(aCompact, lumiSet(aRanges)),
+                                     (intersectRanges(aCompact, bCompact), lumiSet(aRanges) & lumiSet(bRanges)),
+                                     (unionRanges(aCompact, bCompact), lumiSet(aRanges) | lumiSet(bRanges)),
+                                     (subtractRanges(aCompact, bCompact), lumiSet(aRanges) - lumiSet(bRanges))]:
+                self.assertEqual(lumiSet(result), expected)
+                # sorted, disjoint and not contiguous
+                for previous, current in zip(result, result[1:]):
+                    self.assertTrue(previous[1] + 1 < current[0])
+
+        self.assertEqual(compactRanges([[5, 6], [1, 2], [3, 4], [10, 10], [1]]), [[1, 6], [10, 10]])
+        return
+
+    def testContains(self):
+        """
+        _testContains_
+
+        Look up lumis and check that the index follows changes to the ranges.
+        """
+        lumiMask = {"1": [[10, 20], [1, 5], [30, 30]], "2": []}
+        lumiIndex = LumiIndex(lumiMask)
+
+        self.assertEqual(len(lumiIndex), 2)
+        self.assertTrue("1" in lumiIndex)
+        self.assertFalse("3" in lumiIndex)
+        for lumi in range(0, 40):
+            self.assertEqual(lumiIndex.contains("1", lumi), scanRanges(lumiMask["1"], lumi))
+        self.assertFalse(lumiIndex.contains("2", 1))
+        self.assertFalse(lumiIndex.contains("3", 1))
+        self.assertEqual(lumiIndex.getRanges("1"), [[1, 5], [10, 20], [30, 30]])
+
+        lumiMask["1"].append([31, 35])
+        lumiMask["2"] = [[1, 1]]
+        self.assertTrue(lumiIndex.contains("1", 33))
+        self.assertTrue(lumiIndex.contains("2", 1))
+        self.assertEqual(lumiIndex.filterLumis([("1", 3), ("1", 7), ("2", 1)]), [("1", 3), ("2", 1)])
+
+        openIndex = LumiIndex({"1": [[5, 0]]}, openEnded=True)
+        self.assertFalse(openIndex.contains("1", 4))
+        self.assertTrue(openIndex.contains("1", 5000))
+        return
+
+    def testMaskAndSplitting(self):
+        """
+        _testMaskAndSplitting_
+
+        The Mask and the splitting lumi checks give the same answers with
+        the index.
+        """
+        lumiMask = makeLumiMask(5, 50)
+        lumiIndex = LumiIndex(lumiMask)
+        mask = Mask()
+        for run, ranges in lumiMask.items():
+            for lumiRange in ranges:
+                mask.addRunAndLumis(int(run), lumiRange)
+
+        for run in range(0, 7):
+            for lumi in range(0, 2000, 7):
+                expected = scanRanges(lumiMask.get(str(run), []), lumi)
+                self.assertEqual(mask.runLumiInMask(run, lumi), expected)
+                self.assertEqual(isGoodLumi(lumiMask, run, lumi), expected)
+                self.assertEqual(isGoodLumi(lumiIndex, run, lumi), expected)
+
+        self.assertTrue(isGoodLumi(LumiIndex({}), 1, 1))
+        return
+
+    @attr('performance')
+    def testBenchmark(self):
+        """
+        _testBenchmark_
+
+        Time the membership checks of 200k lumis against a long lumi
+        mask, with the linear scans and with the index.
+        """
+        lumiMask = makeLumiMask(100, 1000)
+        rand = random.Random(1)
+        lumis = [(str(rand.randint(1, 100)), rand.randint(1, 20000)) for _ in range(200000)]
+
+        startTime = time.time()
+        scanned = [scanRanges(lumiMask.get(run, []), lumi) for run, lumi in lumis]
+        scanTime = time.time() - startTime
+
+        startTime = time.time()
+        lumiIndex = LumiIndex(lumiMask)
+        indexed = [lumiIndex.contains(run, lumi) for run, lumi in lumis]
+        indexTime = time.time() - startTime
+
+        self.assertEqual(scanned, indexed)
+        print("Checked %d lumis: %.3f seconds with scans, %.3f seconds with the index" %
+              (len(lumis), scanTime, indexTime))
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -363,6 +363,58 @@ class CMSCouchTest(unittest.TestCase):
         self.assertEqual(1, len(self.db.allDocs({'limit':1}, ["1", "3"])['rows']))
         self.assertTrue('error' in self.db.allDocs(keys = ["1", "4"])['rows'][1])
 
+    def testBackgroundCommit(self):
+        """
+        Test that full queues are posted by the worker thread and that commit
+        flushes them before the rest of the queue
+        """
+        db = self.server.connectDatabase(self.db.name, size = 10)
+        db.startBackgroundCommit(maxPending = 1)
+
+        for i in range(55):
+            db.queue({'_id': str(i), 'counter': i})
+        self.assertEqual(len(db._queue), 5)
+
+        db.commit()
+        self.assertEqual(len(db._queue), 0)
+        self.assertEqual(db.info()['doc_count'], 55)
+
+        conflicts = []
+        def callback(database, data, result):
+            conflicts.append(result['id'])
+            return result
+
+        for i in range(11):
+            db.queue({'_id': str(i), 'counter': i}, callback = callback)
+        db.commit(callback = callback)
+        db.stopBackgroundCommit()
+        self.assertEqual(sorted(conflicts, key = int), [str(i) for i in range(11)])
+        return
+
+    def testUpdateBulkDocuments(self):
+        """
+        Test updating documents through _all_docs and _bulk_docs
+        """
+        self.db.queue(Document(id = "1", inputDict = {'counter': 0}))
+        self.db.queue(Document(id = "2", inputDict = {'counter': 5}))
+        self.db.commit()
+
+        def bump(docId, doc):
+            if doc is None:
+                if docId == "4":
+                    return None
+                doc = {'counter': 0}
+            doc['counter'] += 1
+            return doc
+
+        failed = self.db.updateBulkDocuments(["1", "2", "3", "4", "1"], bump, chunkSize = 2)
+        self.assertEqual(failed, [])
+        self.assertEqual(self.db.document("1")['counter'], 1)
+        self.assertEqual(self.db.document("2")['counter'], 6)
+        self.assertEqual(self.db.document("3")['counter'], 1)
+        self.assertFalse(self.db.documentExists("4"))
+        return
+
 if __name__ == "__main__":
     if len(sys.argv) >1 :
         suite = unittest.TestSuite()
@@ -284,6 +284,89 @@ class DBCoreTest(unittest.TestCase):
 
         return
 
+    def testProcessDataBulkSelect(self):
+        """
+        _testProcessDataBulkSelect_
+
+        Verify that a SELECT with a single varying bind returns the same rows
+        when it is run as IN list queries.
+        """
+        binds = []
+        for i in range(1201):
+            binds.append({"one": i, "two": 7, "three": str(i * 3)})
+
+        insertSQL = "INSERT INTO test_tablea VALUES (:one, :two, :three)"
+        selectSQL = \
+          """SELECT column1, column2, column3 FROM test_tablea
+             WHERE column1 = :one AND column2 = :two"""
+
+        myThread = threading.currentThread()
+        myThread.dbi.processData(insertSQL, binds = binds)
+
+        selectBinds = [{"one": x["one"], "two": 7} for x in binds]
+        bulkSQL, bulkBinds = myThread.dbi.bulkSelectBinds(selectSQL, selectBinds[:3])
+        self.assertTrue("column1 IN (:one_in0, :one_in1, :one_in2)" in bulkSQL)
+        self.assertEqual(bulkBinds, {"two": 7, "one_in0": 0, "one_in1": 1, "one_in2": 2})
+
+        resultSets = myThread.dbi.processData(selectSQL, selectBinds, bulkSelect = True)
+        self.assertEqual(len(resultSets), 3)
+
+        results = []
+        for resultSet in resultSets:
+            results.extend([tuple(x) for x in resultSet.fetchall()])
+        self.assertEqual(sorted(results),
+                         [(x["one"], 7, x["three"]) for x in binds])
+
+        # the varying bind is used twice, fall back to one query per bind
+        selectSQL = "SELECT :one AS one, column3 FROM test_tablea WHERE column1 = :one"
+        self.assertEqual(myThread.dbi.bulkSelectBinds(selectSQL, selectBinds[:3]),
+                         (None, None))
+        resultSets = myThread.dbi.processData(selectSQL, selectBinds[:3], bulkSelect = True)
+        results = []
+        for resultSet in resultSets:
+            results.extend(resultSet.fetchall())
+        self.assertEqual(len(results), 3)
+        return
+
+    def testProcessDataStream(self):
+        """
+        _testProcessDataStream_
+
+        Verify that processDataStream returns the same rows as processData,
+        split in batches that share the key list of their cursor.
+        """
+        binds = []
+        for i in range(2500):
+            binds.append({"one": i, "two": i * 2, "three": str(i * 3)})
+
+        insertSQL = "INSERT INTO test_tablea VALUES (:one, :two, :three)"
+        selectSQL = "SELECT column1, column2, column3 FROM test_tablea"
+        selectBindSQL = \
+          """SELECT column1, column2, column3 FROM test_tablea
+             WHERE column1 = :one AND column2 = :two AND column3 = :three"""
+
+        myThread = threading.currentThread()
+        myThread.dbi.processData(insertSQL, binds = binds)
+
+        batches = list(myThread.dbi.processDataStream(selectSQL, batchSize = 1000))
+        self.assertEqual([len(x.fetchall()) for x in batches], [1000, 1000, 500])
+        for batch in batches:
+            self.assertTrue(batch.keys is batches[0].keys)
+            self.assertEqual([x.lower() for x in batch.keys],
+                             ["column1", "column2", "column3"])
+
+        streamRows = []
+        for batch in myThread.dbi.processDataStream(selectBindSQL, binds[:600]):
+            streamRows.extend([tuple(x) for x in batch.fetchall()])
+
+        results = []
+        for resultSet in myThread.dbi.processData(selectBindSQL, binds[:600]):
+            results.extend([tuple(x) for x in resultSet.fetchall()])
+
+        self.assertEqual(len(streamRows), 600)
+        self.assertEqual(sorted(streamRows), sorted(results))
+        return
+
     def testInsertHugeNumber(self):
         """
         _testInsertHugeNumber_
@@ -94,6 +94,25 @@ insert into test (bind1, bind2) values (:bind1, :bind2) """
         output = dbformatter.formatOneDict(result)
         self.assertEqual(output, {'bind2': 'value2a', 'bind1': 'value1a'})
 
+    @attr("integration")
+    def testStreamFormatting(self):
+        """
+        Test the generator formats on top of processDataStream
+        """
+        myThread = threading.currentThread()
+        dbformatter = DBFormatter(myThread.logger, myThread.dbi)
+
+        result = myThread.dbi.processDataStream(myThread.select, batchSize = 2)
+        output = list(dbformatter.formatStream(result))
+        self.assertEqual(output, [('value1a', 'value2a'), ('value1b', 'value2b'),
+                                  ('value1c', 'value2d')])
+
+        result = myThread.dbi.processDataStream(myThread.select, batchSize = 2)
+        output = list(dbformatter.formatDictStream(result))
+        self.assertEqual(output, [{'bind2': 'value2a', 'bind1': 'value1a'}, \
+                                  {'bind2': 'value2b', 'bind1': 'value1b'}, \
+                                  {'bind2': 'value2d', 'bind1': 'value1c'}])
+
 
 if __name__ == "__main__":
     unittest.main()
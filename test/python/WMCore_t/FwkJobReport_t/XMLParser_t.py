@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+_XMLParser_t_
+
+Compare the streaming framework job report parser with the tree parser.
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.FwkJobReport.Report import Report
+from WMCore.FwkJobReport.XMLParser import xmlToJobReport, xmlToJobReportStreaming
+from WMCore.WMBase import getTestBase
+
+
+def makeLargeReport(fileName, nFiles, nLumis):
+    """
+    _makeLargeReport_
+
+    Write a job report with nFiles input and output files, each with nLumis
+    lumi sections, and the performance report of the processing report.
+    """
+    perfReport = open(os.path.join(getTestBase(), "WMCore_t/FwkJobReport_t/PerformanceReport.xml")).read()
+    perfReport = perfReport[perfReport.index("<PerformanceReport>"):perfReport.index("</PerformanceReport>")]
+    runs = "<Runs>\n<Run ID=\"1\">\n%s</Run>\n</Runs>\n" % \
+           "".join(["   <LumiSection ID=\"%d\"/>\n" % x for x in range(1, nLumis + 1)])
+
+    with open(fileName, "w") as report:
+        report.write("<FrameworkJobReport>\n")
+        for i in range(nFiles):
+            report.write("<InputFile>\n<State  Value=\"closed\"/>\n<LFN>/store/data/Run/Primary/RAW/v1/%d.root</LFN>\n"
+                         "<PFN>root://eoscms//store/data/Run/Primary/RAW/v1/%d.root</PFN>\n<Catalog></Catalog>\n"
+                         "<ModuleLabel>source</ModuleLabel>\n<GUID>%d</GUID>\n<Branches>\n  <Branch>a</Branch>\n</Branches>\n"
+                         "<InputType>primaryFiles</InputType>\n<InputSourceClass>PoolSource</InputSourceClass>\n"
+                         "<EventsRead>%d</EventsRead>\n%s</InputFile>\n" % (i, i, i, nLumis * 10, runs))
+        for i in range(nFiles):
+            report.write("<File>\n<State  Value=\"closed\"/>\n<LFN></LFN>\n<PFN>output%d.root</PFN>\n<Catalog></Catalog>\n"
+                         "<ModuleLabel>output%d</ModuleLabel>\n<GUID>%d</GUID>\n<Branches>\n  <Branch>a</Branch>\n</Branches>\n"
+                         "<OutputModuleClass>PoolOutputModule</OutputModuleClass>\n<TotalEvents>%d</TotalEvents>\n"
+                         "<BranchHash>abc</BranchHash>\n%s<Inputs>\n<Input>\n<LFN>/store/data/Run/Primary/RAW/v1/%d.root</LFN>\n"
+                         "<PFN>%d.root</PFN>\n</Input>\n</Inputs>\n</File>\n" % (i, i, i, nLumis * 10, runs, i, i))
+        report.write("%s</PerformanceReport>\n</FrameworkJobReport>\n" % perfReport)
+    return
+
+
+class XMLParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        self.reportDir = os.path.join(getTestBase(), "WMCore_t/FwkJobReport_t")
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+        return
+
+    def parseBoth(self, xmlFile):
+        """
+        _parseBoth_
+
+        Parse a report with both parsers, return the reports.
+        """
+        treeReport = Report("cmsRun1")
+        streamReport = Report("cmsRun1")
+        xmlToJobReport(treeReport, xmlFile)
+        xmlToJobReportStreaming(streamReport, xmlFile)
+        return treeReport, streamReport
+
+    def testRegression(self):
+        """
+        _testRegression_
+
+        Both parsers give the same report for all the test reports.
+        """
+        xmlFiles = [x for x in os.listdir(self.reportDir) if x.endswith(".xml")]
+        self.assertTrue(len(xmlFiles) > 10)
+        for xmlFile in xmlFiles:
+            xmlPath = os.path.join(self.reportDir, xmlFile)
+            try:
+                treeReport, streamReport = self.parseBoth(xmlPath)
+            except Exception:
+                # broken reports have to fail with both
+                self.assertRaises(Exception, xmlToJobReport, Report("cmsRun1"), xmlPath)
+                self.assertRaises(Exception, xmlToJobReportStreaming, Report("cmsRun1"), xmlPath)
+                continue
+            self.assertEqual(treeReport.data.dictionary_whole_tree_(),
+                             streamReport.data.dictionary_whole_tree_(), xmlFile)
+
+        xmlPath = os.path.join(self.testDir, "large.xml")
+        makeLargeReport(xmlPath, 5, 1000)
+        treeReport, streamReport = self.parseBoth(xmlPath)
+        self.assertEqual(treeReport.data.dictionary_whole_tree_(),
+                         streamReport.data.dictionary_whole_tree_())
+        self.assertEqual(len(streamReport.getAllFilesFromStep("cmsRun1")), 5)
+        self.assertEqual(len(streamReport.getInputFilesFromStep("cmsRun1")[0]["runs"].pop().lumis), 1000)
+        return
+
+    def testBadXML(self):
+        """
+        _testBadXML_
+
+        Truncated reports fail to parse in Report.parse as before.
+        """
+        from WMCore.FwkJobReport.Report import FwkJobReportException
+        xmlPath = os.path.join(self.testDir, "truncated.xml")
+        content = open(os.path.join(self.reportDir, "CMSSWProcessingReport.xml")).read()
+        with open(xmlPath, "w") as truncated:
+            truncated.write(content[:len(content) // 2])
+
+        myReport = Report("cmsRun1")
+        self.assertRaises(FwkJobReportException, myReport.parse, xmlPath)
+        self.assertEqual(myReport.getStepErrors("cmsRun1")['error0'].exitCode, 50115)
+        return
+
+    @attr('performance')
+    def testBenchmark(self):
+        """
+        _testBenchmark_
+
+        Time both parsers on a report with 100k lumi sections.
+        """
+        xmlPath = os.path.join(self.testDir, "large.xml")
+        makeLargeReport(xmlPath, 10, 10000)
+
+        startTime = time.time()
+        xmlToJobReport(Report("cmsRun1"), xmlPath)
+        treeTime = time.time() - startTime
+
+        startTime = time.time()
+        xmlToJobReportStreaming(Report("cmsRun1"), xmlPath)
+        streamTime = time.time() - startTime
+
+        print("Parsed %d MB report: %.3f seconds with the tree parser, %.3f seconds streaming" %
+              (os.path.getsize(xmlPath) // 1024 // 1024, treeTime, streamTime))
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,11 +6,31 @@ General test of Lexicon
 
 """
 
+from __future__ import print_function
+
 import logging
+import re
+import time
 import unittest
 
+from nose.plugins.attrib import attr
+
 from WMCore.Lexicon import *
 
+# representative LFNs, good and bad
+SAMPLE_LFNS = ['/store/mc/Fall10/DYToMuMu_M-20_TuneZ2_7TeV-pythia6/AODSIM/START38_V12-v1/0003/C0F3344F-6EC8-DF11-8ED6-E41F13181020.root',
+               '/store/unmerged/Run2012A/SingleMu/RAW-RECO/v1/000/191/043/00000/1A2B3C4D-5E6F-E111-0000-001D09F29114.root',
+               '/store/data/Run2010A/Cosmics/RECO/v4/000/143/316/0000/F65F4AFE-14AC-DF11-B3BE-00215E21F32E.root',
+               '/store/user/ewv/Higgs-123/PrivateSample/v1/1000/a_X-2.root',
+               '/store/temp/group/Exotica/Higgs-123/PrivateSample/a/b/a_X-2.root',
+               '/store/lhe/10001/part_1.lhe.xz',
+               '/store/results/higgs/StoreResults/Electron/StoreResults-v1/USER/PrivateSample/0000/a_X-2.root',
+               '/store/unmerged/logs/prod/2016/6/1/WF/Task/0000/0/logArchive.tar.gz',
+               '/store/data/Run2010A/Cosmics/RECO/v4/000/143/316/0000/F65F4AFE;rm -rf.root',
+               '/store/user/ewv/Higgs-123/',
+               'store/data/a/b/c',
+               '']
+
 class LexiconTest(unittest.TestCase):
     def testDBSUser(self):
 
@@ -790,6 +810,75 @@ class LexiconTest(unittest.TestCase):
                     'http://[2001:0db8:85a3:08d3:1319:8a2z:0370:7344]/',]:
             self.assertRaises(AssertionError, validateUrl, url)
             
+    def testCombinedLFN(self):
+        """
+        _testCombinedLFN_
+
+        The combined LFN expressions match the same LFNs as the separate ones.
+        """
+        for candidate in SAMPLE_LFNS:
+            for combined, regexps in [(LFN_RE, LFN_REGEXPS), (LFN_BASE_RE, LFN_BASE_REGEXPS)]:
+                expected = any([re.match(x, candidate) for x in regexps])
+                self.assertEqual(re.match(combined, candidate) is not None, expected, candidate)
+        return
+
+    def testValidateMany(self):
+        """
+        _testValidateMany_
+
+        Validate lists of candidates without exceptions.
+        """
+        expected = []
+        for candidate in SAMPLE_LFNS:
+            try:
+                expected.append(lfn(candidate))
+            except AssertionError:
+                expected.append(False)
+        self.assertEqual(validateMany('lfn', SAMPLE_LFNS), expected)
+        self.assertEqual(validateMany('lfn', SAMPLE_LFNS + [None]), expected + [False])
+        self.assertEqual(validateMany('cmsname', ['T2_CH_CERN', 'T2_CH', 'T2-CH_CERN']), [True, True, False])
+        self.assertEqual(validateMany(primaryDatasetType, ['mc', 'MC']), [True, False])
+        self.assertEqual(validateMany('dataset', ['/a/b/RECO', '/a/b/c', None]), [True, False, False])
+        self.assertEqual(validateMany('procversion', [1, 'v1']), [True, False])
+        self.assertEqual(validateMany('lfn', []), [])
+        return
+
+    @attr('performance')
+    def testLFNBenchmark(self):
+        """
+        _testLFNBenchmark_
+
+        Time the LFN validation with the separate expressions, compiled on
+        every check, and with the combined precompiled one.
+        """
+        candidates = SAMPLE_LFNS * 5000
+
+        def sequentialLFN(candidate):
+            for regexp in LFN_REGEXPS:
+                if re.compile(regexp).match(candidate) is not None:
+                    return True
+            return False
+
+        startTime = time.time()
+        sequential = [sequentialLFN(x) for x in candidates]
+        sequentialTime = time.time() - startTime
+
+        startTime = time.time()
+        for candidate in candidates:
+            try:
+                lfn(candidate)
+            except AssertionError:
+                pass
+        checkTime = time.time() - startTime
+
+        startTime = time.time()
+        self.assertEqual(validateMany('lfn', candidates), sequential)
+        manyTime = time.time() - startTime
+
+        print("Validated %d LFNs: %.3f seconds sequentially, %.3f seconds with lfn(), %.3f seconds with validateMany" %
+              (len(candidates), sequentialTime, checkTime, manyTime))
+        return
+
     def testPrimaryDatasetType(self):
         self.assertRaises(AssertionError, primaryDatasetType, "MC")
         self.assertTrue(primaryDatasetType("mc"), "mc should be allowed")
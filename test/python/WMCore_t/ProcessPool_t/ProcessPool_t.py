@@ -7,7 +7,8 @@ Unit tests for the ProcessPool class.
 import unittest
 import nose
 
-from WMCore.ProcessPool.ProcessPool import ProcessPool
+from WMCore.ProcessPool.ProcessPool import ProcessPool, ProcessPoolTransport, \
+                                          AdaptiveProcessPool
 from WMQuality.TestInit import TestInit
 
 class ProcessPoolTest(unittest.TestCase):
@@ -122,8 +123,108 @@ class ProcessPoolTest(unittest.TestCase):
             self.assertEqual(len(result), len(input),
                              "Error: Wrong number of results returned.")
 
+    def testD_BinaryTransport(self):
+        """
+        _testBinaryTransport_
+
+        Check that the binary transport batches items in multipart messages
+        and that they come back unchanged.
+        """
+        class FakeSocket(object):
+            def __init__(self):
+                self.messages = []
+            def send(self, message):
+                self.messages.append([message])
+            def send_multipart(self, frames):
+                self.messages.append(frames)
+            def recv(self):
+                return self.messages.pop(0)[0]
+            def recv_multipart(self):
+                return self.messages.pop(0)
+
+        work = [{"jobID": i, "fwjrPath": "/some/path/Report.%d.pkl" % i} for i in range(25)]
+
+        socket = FakeSocket()
+        transport = ProcessPoolTransport("binary", batchSize = 10)
+        self.assertEqual(transport.send(socket, work), 3)
+        self.assertEqual([len(x) for x in socket.messages], [10, 10, 5])
+        result = []
+        while socket.messages:
+            result.extend(transport.recv(socket))
+        self.assertEqual(result, work)
+
+        transport = ProcessPoolTransport("json")
+        self.assertEqual(transport.send(socket, work), 25)
+        self.assertEqual(transport.recv(socket), [work[0]])
+        return
 
+    def testE_BinaryProcessPool(self):
+        """
+        _testBinaryProcessPool_
 
+        Run a pool with the binary transport and stream its results.
+        """
+        raise nose.SkipTest
+        config = self.testInit.getConfiguration()
+        config.Agent.useHeartbeat = False
+        self.testInit.generateWorkDir(config)
+
+        processPool = ProcessPool("ProcessPool_t.ProcessPoolTestWorker",
+                                  totalSlaves = 3,
+                                  componentDir = config.General.workDir,
+                                  namespace = "WMCore_t",
+                                  config = config,
+                                  transport = "binary",
+                                  batchSize = 10)
+
+        input = ["COMMAND%s" % i for i in range(1000)]
+        processPool.enqueue(input)
+        result = []
+        for item in processPool.iterDequeue(len(input)):
+            result.append(item)
+
+        self.assertEqual(sorted(result), sorted(input))
+        return
+
+    def testF_AdaptiveProcessPool(self):
+        """
+        _testAdaptiveProcessPool_
+
+        Run an adaptive pool, it should grow with the queued work, report
+        metrics for its slaves and shrink back once they are idle.
+        """
+        raise nose.SkipTest
+        config = self.testInit.getConfiguration()
+        config.Agent.useHeartbeat = False
+        self.testInit.generateWorkDir(config)
+
+        processPool = AdaptiveProcessPool("ProcessPool_t.ProcessPoolTestWorker",
+                                          totalSlaves = 1,
+                                          componentDir = config.General.workDir,
+                                          namespace = "WMCore_t",
+                                          config = config,
+                                          transport = "binary",
+                                          batchSize = 10,
+                                          maxSlaves = 3,
+                                          idleTimeout = 600)
+
+        input = ["COMMAND%s" % i for i in range(1000)]
+        processPool.enqueue(input)
+        result = processPool.dequeue(len(input))
+        self.assertEqual(sorted(result), sorted(input))
+
+        metrics = processPool.getMetrics()
+        self.assertTrue(len(metrics) > 1)
+        self.assertEqual(sum([x['processed'] for x in metrics.values()]), len(input))
+        for slaveMetrics in metrics.values():
+            self.assertTrue(slaveMetrics['rss'] > 0)
+
+        processPool.idleTimeout = 0
+        processPool.enqueue(["One"])
+        self.assertEqual(processPool.dequeue(1), ["One"])
+        self.assertEqual(len(processPool.getMetrics()), 1)
+        processPool.close()
+        return
 
 
 if __name__ == "__main__":
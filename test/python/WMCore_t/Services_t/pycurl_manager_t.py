@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+"""
+_pycurl_manager_t_
+
+Unit tests for the pycurl_manager RequestHandler, against a local HTTPS
+server with a self signed certificate.
+"""
+from __future__ import print_function
+
+import BaseHTTPServer
+import SocketServer
+import httplib
+import json
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+import urlparse
+
+from nose.plugins.attrib import attr
+
+from WMCore.Services.pycurl_manager import RequestHandler
+
+
+class TestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Answer the query parameters as JSON, after the delay parameter
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        url = urlparse.urlsplit(self.path)
+        params = dict(urlparse.parse_qsl(url.query))
+        time.sleep(float(params.get('delay', 0)))
+        if url.path == '/missing':
+            self.send_response(404)
+            body = 'not found'
+        else:
+            self.send_response(200)
+            body = json.dumps({'path': url.path, 'query': params})
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Threaded HTTPS server counting its connections
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, certfile):
+        BaseHTTPServer.HTTPServer.__init__(self, ('localhost', 0), TestHandler)
+        self.socket = ssl.wrap_socket(self.socket, certfile=certfile, server_side=True)
+        self.lock = threading.Lock()
+        self.connections = 0
+
+
+class RequestHandlerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        certfile = os.path.join(self.tempDir, 'server.pem')
+        try:
+            subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+                                   '-subj', '/CN=localhost', '-days', '1',
+                                   '-keyout', certfile, '-out', certfile],
+                                  stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+        except (OSError, subprocess.CalledProcessError):
+            shutil.rmtree(self.tempDir)
+            raise unittest.SkipTest("openssl is needed to create the test server certificate")
+        self.server = TestServer(certfile)
+        self.url = 'https://localhost:%d' % self.server.server_address[1]
+        self.serverThread = threading.Thread(target=self.server.serve_forever)
+        self.serverThread.setDaemon(True)
+        self.serverThread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tempDir)
+
+    def testRequest(self):
+        """
+        _testRequest_
+
+        The requests from a thread reuse the same connection.
+        """
+        mgr = RequestHandler()
+        for i in range(20):
+            _, data = mgr.request(self.url + '/data', {'i': i}, decode=True)
+            self.assertEqual(data, {'path': '/data', 'query': {'i': str(i)}})
+        self.assertEqual(self.server.connections, 1)
+
+        # an other thread has its own handles
+        results = []
+        thread = threading.Thread(target=lambda: results.append(mgr.getdata(self.url + '/other', {})))
+        thread.start()
+        thread.join()
+        self.assertEqual(json.loads(results[0])['path'], '/other')
+        self.assertEqual(self.server.connections, 2)
+
+        # HTTP errors keep the handle
+        self.assertRaises(httplib.HTTPException, mgr.request, self.url + '/missing', {})
+        mgr.request(self.url + '/data', {})
+        self.assertEqual(self.server.connections, 2)
+
+        mgr.close_handles()
+        mgr.request(self.url + '/data', {})
+        self.assertEqual(self.server.connections, 3)
+
+        mgr = RequestHandler({'keepalive': False})
+        for i in range(3):
+            mgr.request(self.url + '/data', {})
+        self.assertEqual(self.server.connections, 6)
+        return
+
+    def testMultiRequest(self):
+        """
+        _testMultiRequest_
+
+        The requests of a multirequest run concurrently.
+        """
+        mgr = RequestHandler()
+        parray = [{'i': str(i), 'delay': '0.2'} for i in range(20)]
+        startTime = time.time()
+        results = list(mgr.multirequest(self.url + '/multi', parray, concurrency=10))
+        elapsed = time.time() - startTime
+
+        self.assertEqual(len(results), 20)
+        self.assertEqual(sorted([int(x['i']) for x in results]), range(20))
+        for result in results:
+            self.assertEqual(result['query']['i'], result['i'])
+        self.assertTrue(elapsed < 2, "multirequest took %.2f secs" % elapsed)
+        self.assertEqual(self.server.connections, 10)
+
+        # the connections are kept for the next calls
+        list(mgr.multirequest(self.url + '/multi', parray[:10]))
+        self.assertEqual(self.server.connections, 10)
+        return
+
+    @attr('performance')
+    def testBenchmark(self):
+        """
+        _testBenchmark_
+
+        Time requests with new and reused handles, and multirequests with
+        different concurrencies.
+        """
+        nRequests = 200
+        for keepalive in [False, True]:
+            mgr = RequestHandler({'keepalive': keepalive})
+            latencies = []
+            startTime = time.time()
+            for i in range(nRequests):
+                requestStart = time.time()
+                mgr.request(self.url + '/data', {'i': i})
+                latencies.append(time.time() - requestStart)
+            elapsed = time.time() - startTime
+            latencies.sort()
+            print("keepalive %s: %d requests in %.2f secs, %.1f requests/sec, latency mean %.2f p95 %.2f msecs" %
+                  (keepalive, nRequests, elapsed, nRequests / elapsed,
+                   1000 * sum(latencies) / nRequests, 1000 * latencies[int(0.95 * nRequests)]))
+
+        parray = [{'i': str(i), 'delay': '0.01'} for i in range(nRequests)]
+        for concurrency in [1, 10, 50]:
+            mgr = RequestHandler()
+            startTime = time.time()
+            list(mgr.multirequest(self.url + '/multi', parray, concurrency=concurrency))
+            elapsed = time.time() - startTime
+            print("multirequest concurrency %d: %d requests in %.2f secs, %.1f requests/sec" %
+                  (concurrency, nRequests, elapsed, nRequests / elapsed))
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
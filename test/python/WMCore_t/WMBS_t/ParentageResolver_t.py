@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+"""
+_ParentageResolver_t_
+
+Unit tests for the WMBS ParentageResolver class.
+"""
+from __future__ import print_function
+
+import logging
+import random
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+from sqlalchemy import create_engine, event
+
+from WMCore.Database.DBCore import DBInterface
+from WMCore.WMBS.MySQL.Files.GetParentInfo import GetParentInfo
+from WMCore.WMBS.ParentageResolver import ParentageResolver
+
+
+class FakeGetParentInfo(object):
+    """
+    Give the same rows as the Files.GetParentInfo DAO for an in memory
+    parentage, and count the calls.
+    """
+    def __init__(self, merged, parents):
+        self.merged = merged
+        self.parents = parents
+        self.calls = 0
+
+    def execute(self, childLFNs, conn = None, transaction = False):
+        self.calls += 1
+        result = []
+        for childLFN in childLFNs:
+            for parentLFN in self.parents.get(childLFN, []):
+                grandParents = self.parents.get(parentLFN, []) or [None]
+                for grandParentLFN in grandParents:
+                    result.append({"id": 1, "lfn": parentLFN, "merged": self.merged[parentLFN],
+                                   "gplfn": grandParentLFN, "child_lfn": childLFN,
+                                   "gpmerged": self.merged.get(grandParentLFN)})
+        return result
+
+
+def makeSQLiteGetParentInfo(merged, parents):
+    """
+    Files.GetParentInfo DAO on an in memory SQLite copy of the WMBS file
+    tables, with the list of the SELECTs sent to the database.
+    """
+    engine = create_engine("sqlite://")
+    selects = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def countSelects(conn, cursor, statement, parameters, context, executemany):
+        if statement.strip().lower().startswith("select"):
+            selects.append(statement)
+
+    dbi = DBInterface(logging.getLogger(), engine)
+    dbi.processData(["CREATE TABLE wmbs_file_details (id INTEGER PRIMARY KEY, lfn VARCHAR(500), merged INTEGER)",
+                     "CREATE TABLE wmbs_file_parent (child INTEGER, parent INTEGER)",
+                     "CREATE UNIQUE INDEX wmbs_file_details_lfn ON wmbs_file_details (lfn)",
+                     "CREATE INDEX wmbs_file_parent_child ON wmbs_file_parent (child)",
+                     "CREATE INDEX wmbs_file_parent_parent ON wmbs_file_parent (parent)"])
+    fileIds = dict([(lfn, index + 1) for index, lfn in enumerate(sorted(merged))])
+    dbi.processData("INSERT INTO wmbs_file_details (id, lfn, merged) VALUES (:id, :lfn, :merged)",
+                    [{"id": fileIds[lfn], "lfn": lfn, "merged": merged[lfn]} for lfn in sorted(merged)])
+    parentBinds = []
+    for lfn in sorted(parents):
+        for parentLFN in parents[lfn]:
+            parentBinds.append({"child": fileIds[lfn], "parent": fileIds[parentLFN]})
+    dbi.processData("INSERT INTO wmbs_file_parent (child, parent) VALUES (:child, :parent)", parentBinds)
+    return GetParentInfo(logging.getLogger(), dbi), selects
+
+
+def makeRandomParentage(nFiles, seed):
+    """
+    Random parentage DAG where each file has up to three parents among the
+    six files before it, a fifth of the files being merged.
+    """
+    rand = random.Random(seed)
+    merged = {}
+    parents = {}
+    for i in range(nFiles):
+        lfn = "/store/random/%d.root" % i
+        merged[lfn] = int(rand.random() < 0.2)
+        candidates = range(max(0, i - 6), i)
+        parents[lfn] = ["/store/random/%d.root" % x
+                        for x in rand.sample(candidates, rand.randint(0, min(len(candidates), 3)))]
+    return merged, parents
+
+
+def findParentRecursive(getParentInfoAction, lfn):
+    """
+    Former JobFactory.findParent, one query per file and generation.
+    """
+    newParents = set()
+    for parentInfo in getParentInfoAction.execute([lfn]):
+        if int(parentInfo["merged"]) == 1:
+            newParents.add(parentInfo["lfn"])
+        elif parentInfo['gpmerged'] == None:
+            continue
+        elif int(parentInfo["gpmerged"]) == 1:
+            newParents.add(parentInfo["gplfn"])
+        else:
+            newParents.update(findParentRecursive(getParentInfoAction, parentInfo['gplfn']))
+    return newParents
+
+
+def makeRedneckChains(nChains, depth, nOutputs):
+    """
+    Build chains of depth unmerged files on top of a merged file, with
+    nOutputs files produced from the chains.
+    """
+    merged = {}
+    parents = {}
+    for chain in range(nChains):
+        parentLFN = "/store/data/merged/%d.root" % chain
+        merged[parentLFN] = 1
+        for level in range(depth):
+            lfn = "/store/unmerged/%d/%d.root" % (chain, level)
+            merged[lfn] = 0
+            parents[lfn] = [parentLFN]
+            parentLFN = lfn
+    outputs = []
+    for i in range(nOutputs):
+        lfn = "/store/unmerged/output/%d.root" % i
+        merged[lfn] = 0
+        parents[lfn] = ["/store/unmerged/%d/%d.root" % (i % nChains, depth - 1),
+                        "/store/unmerged/%d/%d.root" % ((i + 1) % nChains, depth - 1)]
+        outputs.append(lfn)
+    return merged, parents, outputs
+
+
+class ParentageResolverTest(unittest.TestCase):
+
+    def testFindParents(self):
+        """
+        _testFindParents_
+
+        The resolver finds the same parents as the former recursive lookup,
+        with one query per generation.
+        """
+        merged = {"/merged/a.root": 1, "/merged/b.root": 1, "/unmerged/c.root": 0,
+                  "/unmerged/d.root": 0, "/unmerged/e.root": 0, "/unmerged/f.root": 0,
+                  "/unmerged/g.root": 0, "/unmerged/h.root": 0, "/unmerged/orphan.root": 0}
+        parents = {"/unmerged/c.root": ["/merged/a.root"],
+                   "/unmerged/d.root": ["/unmerged/c.root"],
+                   "/unmerged/e.root": ["/unmerged/d.root", "/merged/b.root"],
+                   "/unmerged/f.root": ["/unmerged/e.root"],
+                   "/unmerged/g.root": ["/unmerged/orphan.root"],
+                   "/unmerged/h.root": ["/unmerged/f.root", "/unmerged/c.root"]}
+        lfns = sorted(merged.keys()) + ["/unknown.root"]
+
+        getParentInfo = FakeGetParentInfo(merged, parents)
+        resolver = ParentageResolver(getParentInfo)
+        result = resolver.findParents(lfns)
+        for lfn in lfns:
+            self.assertEqual(result[lfn], findParentRecursive(getParentInfo, lfn), lfn)
+        self.assertEqual(result["/unmerged/h.root"], set(["/merged/a.root", "/merged/b.root"]))
+        self.assertEqual(result["/unmerged/g.root"], set())
+
+        getParentInfo.calls = 0
+        resolver.clear()
+        resolver.findParents(["/unmerged/h.root"])
+        self.assertEqual(getParentInfo.calls, 3)
+        # the grand parents were resolved on the way
+        self.assertEqual(resolver.findParents(["/unmerged/e.root", "/unmerged/c.root"]),
+                         {"/unmerged/e.root": set(["/merged/a.root", "/merged/b.root"]),
+                          "/unmerged/c.root": set(["/merged/a.root"])})
+        self.assertEqual(getParentInfo.calls, 3)
+        return
+
+    def testDeepChains(self):
+        """
+        _testDeepChains_
+
+        Resolve outputs of deep redneck chains.
+        """
+        merged, parents, outputs = makeRedneckChains(10, 30, 50)
+        getParentInfo = FakeGetParentInfo(merged, parents)
+        result = ParentageResolver(getParentInfo).findParents(outputs)
+        # each generation goes up by a parent and a grand parent
+        self.assertEqual(getParentInfo.calls, 16)
+        for lfn in outputs:
+            self.assertEqual(result[lfn], findParentRecursive(getParentInfo, lfn))
+            self.assertEqual(len(result[lfn]), 2)
+        return
+
+    def testRandomParentage(self):
+        """
+        _testRandomParentage_
+
+        The resolver finds the same parents as the recursive lookup for
+        random parentage, with files shared between several descendants.
+        """
+        for seed in range(300):
+            merged, parents = makeRandomParentage(30, seed)
+            lfns = sorted(merged)
+            getParentInfo = FakeGetParentInfo(merged, parents)
+            expected = dict([(lfn, findParentRecursive(getParentInfo, lfn)) for lfn in lfns])
+
+            self.assertEqual(ParentageResolver(getParentInfo).findParents(lfns), expected)
+
+            # the files without children first, the others from the resolved parents
+            withChildren = set()
+            for parentLFNs in parents.values():
+                withChildren.update(parentLFNs)
+            resolver = ParentageResolver(getParentInfo)
+            resolver.findParents([x for x in lfns if x not in withChildren])
+            result = resolver.findParents(lfns)
+            for lfn in lfns:
+                self.assertEqual(result[lfn], expected[lfn], "seed %d: %s" % (seed, lfn))
+        return
+
+    def testBulkSelect(self):
+        """
+        _testBulkSelect_
+
+        Each generation is resolved with one SELECT per 500 files.
+        """
+        merged, parents, outputs = makeRedneckChains(10, 2, 1200)
+        getParentInfo, selects = makeSQLiteGetParentInfo(merged, parents)
+        resolver = ParentageResolver(getParentInfo)
+        result = resolver.findParents(outputs)
+        for lfn in outputs:
+            self.assertEqual(result[lfn], findParentRecursive(FakeGetParentInfo(merged, parents), lfn))
+            self.assertEqual(len(result[lfn]), 2)
+        # 3 SELECTs for the outputs, one for the first level of the chains
+        self.assertEqual(len(selects), 4)
+        self.assertTrue(" IN (" in selects[0])
+        return
+
+    @attr('performance')
+    def testBenchmark(self):
+        """
+        _testBenchmark_
+
+        Time the parents lookup for the outputs of deep redneck chains,
+        counting the SELECTs sent to the database.
+        """
+        merged, parents, outputs = makeRedneckChains(200, 20, 2000)
+
+        getParentInfo, selects = makeSQLiteGetParentInfo(merged, parents)
+        startTime = time.time()
+        for lfn in outputs:
+            findParentRecursive(getParentInfo, lfn)
+        recursiveTime = time.time() - startTime
+        recursiveSelects = len(selects)
+
+        getParentInfo, selects = makeSQLiteGetParentInfo(merged, parents)
+        startTime = time.time()
+        ParentageResolver(getParentInfo).findParents(outputs)
+        resolverTime = time.time() - startTime
+
+        print("Parents of %d files: %d SELECTs in %.3f secs recursively, %d SELECTs in %.3f secs resolved in bulk" %
+              (len(outputs), recursiveSelects, recursiveTime, len(selects), resolverTime))
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
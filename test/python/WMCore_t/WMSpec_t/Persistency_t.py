@@ -1,10 +1,84 @@
-from WMCore.WMSpec.Persistency import PersistencyHelper
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import time
 import unittest
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from nose.plugins.attrib import attr
+
+from WMCore.FwkJobReport.Report import Report
+from WMCore.WMSpec.Persistency import PersistencyHelper, PERSIST_PICKLE, PERSIST_BINARY, PERSIST_GZIP
 from WMCore.WMSpec.WMStep import WMStep, makeWMStep
+from WMCore.WMSpec.WMWorkload import WMWorkload, WMWorkloadHelper
+
+
+def makeChainWorkload(nTasks):
+    """
+    _makeChainWorkload_
+
+    Build a workload with a chain of tasks, each with a merge task and a
+    CMSSW step with a few output modules.
+    """
+    workload = WMWorkloadHelper(WMWorkload("ChainWorkload"))
+    parentTask = workload.newTask("Task1")
+    for i in range(1, nTasks + 1):
+        parentTask.setTaskType("Processing")
+        cmsswStep = parentTask.makeStep("cmsRun1")
+        cmsswStep.setStepType("CMSSW")
+        parentTask.applyTemplates()
+        cmsswHelper = cmsswStep.getTypeHelper()
+        for module in range(5):
+            cmsswHelper.addOutputModule("Output%d" % module,
+                                        primaryDataset="Primary%d" % i,
+                                        processedDataset="Processed-v%d" % module,
+                                        dataTier="RECO",
+                                        lfnBase="/store/unmerged/Era/Primary%d/RECO/v%d" % (i, module),
+                                        mergedLFNBase="/store/data/Era/Primary%d/RECO/v%d" % (i, module))
+        parentTask.setSiteWhitelist(["T1_US_FNAL", "T2_CH_CERN"])
+        parentTask.addTask("Task%dMerge" % i).setTaskType("Merge")
+        if i < nTasks:
+            parentTask = parentTask.addTask("Task%d" % (i + 1))
+    return workload
+
+
+def makeReport(nSteps, nFiles):
+    """
+    _makeReport_
+
+    Build a report with a few steps with output files.
+    """
+    report = Report()
+    for step in range(nSteps):
+        stepName = "cmsRun%d" % (step + 1)
+        report.addStep(stepName)
+        report.addOutputModule("Output")
+        for i in range(nFiles):
+            outputFile = report.addOutputFile("Output", {"lfn": "/store/data/Era/Primary/RECO/v1/000/%d/%d.root" % (step, i),
+                                                         "pfn": "file.root", "module_label": "Output",
+                                                         "events": 1000, "size": 2000000})
+            setattr(outputFile.runs, "1", range(i * 10, i * 10 + 10))
+        report.setStepStartTime(stepName)
+        report.setStepStopTime(stepName)
+    return report
 
 
 class PersistencyTest(unittest.TestCase):
 
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+        return
+
     def testSplitUrl(self):
         helper = PersistencyHelper()
         url = 'https://cmsreqmgr.cern.ch/couchdb/mydb/doc/spec'
@@ -19,6 +93,74 @@ class PersistencyTest(unittest.TestCase):
         self.assertEqual(dbname, 'mydb')
         self.assertEqual(doc, 'doc/spec')
 
+    def testPersistModes(self):
+        """
+        _testPersistModes_
+
+        Save workloads and reports in all the modes and load them back,
+        including files written by plain pickle.dump as before.
+        """
+        workload = makeChainWorkload(3)
+        taskPaths = workload.listAllTaskPathNames()
+        report = makeReport(2, 5)
+        specFile = os.path.join(self.testDir, "spec.pkl")
+        reportFile = os.path.join(self.testDir, "Report.pkl")
+
+        for persistMode in [None, PERSIST_PICKLE, PERSIST_BINARY, PERSIST_GZIP]:
+            workload.save(specFile, persistMode)
+            for fileName in [specFile, "file:" + specFile, "file://" + specFile]:
+                loadedWorkload = WMWorkloadHelper()
+                loadedWorkload.load(fileName)
+                self.assertEqual(loadedWorkload.listAllTaskPathNames(), taskPaths)
+
+            report.save(reportFile, persistMode)
+            loadedReport = Report()
+            loadedReport.load(reportFile)
+            self.assertEqual(len(loadedReport.getAllFilesFromStep("cmsRun2")), 5)
+
+        with open(specFile, "rb") as handle:
+            self.assertEqual(handle.read(2), "\x1f\x8b")
+        self.assertRaises(ValueError, workload.save, specFile, "xml")
+
+        with open(specFile, "w") as handle:
+            pickle.dump(workload.data, handle)
+        loadedWorkload = WMWorkloadHelper()
+        loadedWorkload.load(specFile)
+        self.assertEqual(loadedWorkload.listAllTaskPathNames(), taskPaths)
+
+        with open(reportFile, "w") as handle:
+            pickle.dump(report.data, handle)
+        loadedReport = Report()
+        loadedReport.unpersist(reportFile, "cmsRun1")
+        self.assertEqual(len(loadedReport.getAllFilesFromStep("cmsRun1")), 5)
+        return
+
+    @attr('performance')
+    def testBenchmark(self):
+        """
+        _testBenchmark_
+
+        Time the save and load of a large chained workload and of a
+        multi-step report in all the modes.
+        """
+        objects = [("workload", makeChainWorkload(20), WMWorkloadHelper),
+                   ("report", makeReport(5, 200), Report)]
+        for name, persisted, persistClass in objects:
+            for persistMode in [PERSIST_PICKLE, PERSIST_BINARY, PERSIST_GZIP]:
+                fileName = os.path.join(self.testDir, "%s-%s.pkl" % (name, persistMode))
+                startTime = time.time()
+                for _ in range(10):
+                    persisted.save(fileName, persistMode)
+                saveTime = (time.time() - startTime) / 10
+
+                startTime = time.time()
+                for _ in range(10):
+                    persistClass().load(fileName)
+                loadTime = (time.time() - startTime) / 10
+                print("%s %s: %d bytes, save %.4f s, load %.4f s" %
+                      (name, persistMode, os.path.getsize(fileName), saveTime, loadTime))
+        return
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -5,9 +5,14 @@ _WMWorkload_t_
 Unittest for WMWorkload class
 """
 
+from __future__ import print_function
+
 import os
+import time
 import unittest
 
+from nose.plugins.attrib import attr
+
 from WMCore.WMSpec.WMWorkload import WMWorkload, WMWorkloadHelper, WMWorkloadException
 from WMCore.WMSpec.WMTask import WMTask, WMTaskHelper
 from WMCore.WMSpec.WMSpecErrors import WMSpecFactoryException
@@ -1856,5 +1861,91 @@ class WMWorkloadTest(unittest.TestCase):
         return
 
 
+    def testTaskPathIndex(self):
+        """
+        _testTaskPathIndex_
+
+        Look up tasks by path, with tasks added, removed and renamed between
+        the lookups, and look up the output filesets of the output modules.
+        """
+        testWorkload = self.makeTestWorkload()[0]
+        for taskPath in testWorkload.listAllTaskPathNames():
+            self.assertEqual(testWorkload.getTaskByPath(taskPath).getPathName(), taskPath)
+        self.assertEqual(testWorkload.getTaskByPath("/TestWorkload/ProcessingTask/Missing"), None)
+        self.assertRaises(RuntimeError, testWorkload.getTaskByPath, "/OtherWorkload/ProcessingTask")
+        self.assertRaises(RuntimeError, testWorkload.getTaskByPath, "/TestWorkload/MissingTask")
+
+        # subtasks added through a task helper
+        mergeTask = testWorkload.getTaskByPath("/TestWorkload/ProcessingTask/MergeTask")
+        mergeTask.addTask("NewTask")
+        self.assertEqual(testWorkload.getTaskByPath("/TestWorkload/ProcessingTask/MergeTask/NewTask").name(),
+                         "NewTask")
+
+        # top level tasks added and removed
+        testWorkload.newTask("OtherTask")
+        self.assertEqual(testWorkload.getTaskByPath("/TestWorkload/OtherTask").name(), "OtherTask")
+        testWorkload.removeTask("OtherTask")
+        self.assertRaises(RuntimeError, testWorkload.getTaskByPath, "/TestWorkload/OtherTask")
+
+        # a new workload loaded in the helper
+        testWorkload.setName("TestWorkloadRenamed")
+        testWorkload.getTask("ProcessingTask").setPathName("/TestWorkloadRenamed/ProcessingTask")
+        self.assertEqual(testWorkload.getTaskByPath("/TestWorkloadRenamed/ProcessingTask").name(), "ProcessingTask")
+        testWorkload.data = self.makeTestWorkload()[0].data
+        self.assertEqual(testWorkload.getTaskByPath("/TestWorkload/ProcessingTask/MergeTask/NewTask"), None)
+
+        procTask = testWorkload.getTaskByPath("/TestWorkload/ProcessingTask")
+        mergeTask = testWorkload.getTaskByPath("/TestWorkload/ProcessingTask/MergeTask")
+        mergeTask.setInputReference(procTask.getStep("cmsRun1"), outputModule="OutputA")
+        testWorkload.clearTaskIndex()
+        self.assertEqual(testWorkload.getOutputFilesetName("/TestWorkload/ProcessingTask", "OutputA"),
+                         "/TestWorkload/ProcessingTask/MergeTask/merged-Merged")
+        self.assertEqual(testWorkload.getOutputFilesetName("/TestWorkload/ProcessingTask", "OutputB"),
+                         "/TestWorkload/ProcessingTask/unmerged-OutputB")
+        self.assertEqual(testWorkload.getOutputFilesetName("/TestWorkload/ProcessingTask/MergeTask", "Merged"),
+                         "/TestWorkload/ProcessingTask/MergeTask/merged-Merged")
+        self.assertEqual(testWorkload.getOutputFilesetName("/TestWorkload/ProcessingTask", "Missing"), None)
+        return
+
+    @attr('performance')
+    def testTaskPathBenchmark(self):
+        """
+        _testTaskPathBenchmark_
+
+        Time the task lookups by path on a chain of 20 tasks, each with a
+        merge task.
+        """
+        testWorkload = WMWorkloadHelper(WMWorkload("ChainWorkload"))
+        parentTask = testWorkload.newTask("Task1")
+        for i in range(2, 21):
+            parentTask.addTask("Task%dMerge" % (i - 1)).setTaskType("Merge")
+            parentTask = parentTask.addTask("Task%d" % i)
+            parentTask.setTaskType("Processing")
+        taskPaths = testWorkload.listAllTaskPathNames()
+        self.assertEqual(len(taskPaths), 39)
+
+        def scanTaskByPath(taskPath):
+            for task in testWorkload.getTask("Task1").taskIterator():
+                if task.getPathName() == taskPath:
+                    return task
+            return None
+
+        nLookups = 100
+        startTime = time.time()
+        for _ in range(nLookups):
+            scanned = [scanTaskByPath(x).name() for x in taskPaths]
+        scanTime = time.time() - startTime
+
+        startTime = time.time()
+        for _ in range(nLookups):
+            indexed = [testWorkload.getTaskByPath(x).name() for x in taskPaths]
+        indexTime = time.time() - startTime
+
+        self.assertEqual(scanned, indexed)
+        print("%d task lookups: %.3f seconds with scans, %.3f seconds with the index" %
+              (nLookups * len(taskPaths), scanTime, indexTime))
+        return
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+_DataCache_t_
+
+Unittests for the WMStats active data cache
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from WMCore.WMStats.DataStructs.DataCache import DataCache
+
+
+class DataCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        DataCache._lastedActiveDataFromAgent = {}
+        DataCache._changeSequences = {}
+        DataCache.setSnapshotFile(None)
+        return
+
+    def tearDown(self):
+        DataCache.setSnapshotFile(None)
+        DataCache._lastedActiveDataFromAgent = {}
+        DataCache._changeSequences = {}
+        shutil.rmtree(self.testDir)
+        return
+
+    def makeJobData(self):
+        return {"req1": {"RequestName": "req1", "RequestStatus": "running-open",
+                         "AgentJobInfo": {"agent1": {"workflow": "req1", "agent_url": "agent1",
+                                                     "timestamp": 100, "status": {"success": 1}}}},
+                "req2": {"RequestName": "req2", "RequestStatus": "assigned"}}
+
+    def testIncrementalUpdate(self):
+        """
+        _testIncrementalUpdate_
+
+        Apply request and job info changes on top of a full rebuild.
+        """
+        self.assertTrue(DataCache.islatestJobDataExpired())
+        self.assertEqual(DataCache.getlatestJobData(), None)
+        DataCache.updateJobData({"req3": {"RequestName": "req3"}})
+        self.assertEqual(DataCache.getlatestJobData(), None)
+
+        DataCache.setlatestJobData(self.makeJobData(), {"reqmgr": 10, "wmstats": 20})
+        self.assertFalse(DataCache.islatestJobDataExpired())
+        self.assertEqual(DataCache.getChangeSequences(), {"reqmgr": 10, "wmstats": 20})
+
+        DataCache.updateJobData({"req1": {"RequestName": "req1", "RequestStatus": "completed"},
+                                 "req3": {"RequestName": "req3", "RequestStatus": "new"}},
+                                ["req2", "unknown"],
+                                [{"workflow": "req1", "agent_url": "agent1", "timestamp": 50},
+                                 {"workflow": "req1", "agent_url": "agent2", "timestamp": 150},
+                                 {"workflow": "req3", "agent_url": "agent1", "timestamp": 150},
+                                 {"workflow": "unknown", "agent_url": "agent1", "timestamp": 150}],
+                                {"reqmgr": 12, "wmstats": 25})
+
+        jobData = DataCache.getlatestJobData()
+        self.assertEqual(sorted(jobData.keys()), ["req1", "req3"])
+        self.assertEqual(jobData["req1"]["RequestStatus"], "completed")
+        self.assertEqual(sorted(jobData["req1"]["AgentJobInfo"].keys()), ["agent1", "agent2"])
+        self.assertEqual(jobData["req1"]["AgentJobInfo"]["agent1"]["timestamp"], 100)
+        self.assertEqual(jobData["req3"]["AgentJobInfo"]["agent1"]["timestamp"], 150)
+        self.assertEqual(DataCache.getChangeSequences(), {"reqmgr": 12, "wmstats": 25})
+        return
+
+    def testCopyOnWrite(self):
+        """
+        _testCopyOnWrite_
+
+        The data handed out before an incremental update is not modified.
+        """
+        DataCache.setlatestJobData(self.makeJobData(), {"reqmgr": 10, "wmstats": 20})
+        jobData = DataCache.getlatestJobData()
+        requestDoc = {"RequestName": "req2", "RequestStatus": "acquired"}
+
+        DataCache.updateJobData({"req2": requestDoc, "req3": {"RequestName": "req3"}}, ["req1"],
+                                [{"workflow": "req2", "agent_url": "agent1", "timestamp": 150},
+                                 {"workflow": "req3", "agent_url": "agent1", "timestamp": 150}])
+        self.assertEqual(jobData, self.makeJobData())
+        self.assertEqual(requestDoc, {"RequestName": "req2", "RequestStatus": "acquired"})
+
+        newJobData = DataCache.getlatestJobData()
+        self.assertEqual(sorted(newJobData.keys()), ["req2", "req3"])
+        self.assertEqual(newJobData["req2"]["RequestStatus"], "acquired")
+        self.assertEqual(newJobData["req2"]["AgentJobInfo"]["agent1"]["timestamp"], 150)
+
+        # the job info of a request kept from the previous data is copied too
+        DataCache.updateJobData(agentJobInfo=[{"workflow": "req2", "agent_url": "agent2", "timestamp": 200}])
+        self.assertEqual(newJobData["req2"]["AgentJobInfo"].keys(), ["agent1"])
+        self.assertEqual(sorted(DataCache.getlatestJobData()["req2"]["AgentJobInfo"].keys()),
+                         ["agent1", "agent2"])
+        return
+
+    def testSnapshot(self):
+        """
+        _testSnapshot_
+
+        A process reads the cache updated by another one from the snapshot.
+        """
+        snapshotFile = os.path.join(self.testDir, "datacache.pkl")
+        DataCache.setSnapshotFile(snapshotFile)
+        DataCache.setlatestJobData(self.makeJobData(), {"reqmgr": 10, "wmstats": 20})
+        self.assertTrue(os.path.isfile(snapshotFile))
+
+        # another process starting with an empty cache
+        DataCache._lastedActiveDataFromAgent = {}
+        DataCache._changeSequences = {}
+        DataCache.setSnapshotFile(snapshotFile)
+        self.assertFalse(DataCache.islatestJobDataExpired())
+        self.assertEqual(DataCache.getlatestJobData(), self.makeJobData())
+        self.assertEqual(DataCache.getChangeSequences(), {"reqmgr": 10, "wmstats": 20})
+
+        # an update from the other process is picked up
+        time.sleep(0.01)
+        DataCache.updateJobData(removed=["req2"], changeSequences={"reqmgr": 11})
+        DataCache._lastedActiveDataFromAgent = {}
+        DataCache.setSnapshotFile(snapshotFile)
+        self.assertEqual(sorted(DataCache.getlatestJobData().keys()), ["req1"])
+        self.assertEqual(DataCache.getChangeSequences(), {"reqmgr": 11, "wmstats": 20})
+        self.assertEqual([x for x in os.listdir(self.testDir) if ".tmp." in x], [])
+
+        # a corrupted snapshot keeps the data in memory
+        with open(snapshotFile, "w") as snapshot:
+            snapshot.write("garbage")
+        self.assertEqual(sorted(DataCache.getlatestJobData().keys()), ["req1"])
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -73,5 +73,17 @@ class WorkQueueElementTest(unittest.TestCase):
         self.assertEqual('something_new', ele.id)
         self.assertNotEqual(before_id, ele.id)
 
+    def testFilterSites(self):
+        """filterSites agrees with passesSiteRestriction"""
+        sites = ['sitea', 'siteb', 'sitec', 'sited']
+        for inputs, whitelist, blacklist, noLocationUpdate in itertools.product(
+                Inputs, [[], ['sitea', 'sitec']], [[], ['sitea']], [False, True]):
+            ele = WorkQueueElement(RequestName='test', Inputs=inputs,
+                                   PileupData={'/mc/GEN-SIM': ['sitea', 'sited']},
+                                   SiteWhitelist=whitelist, SiteBlacklist=blacklist,
+                                   NoLocationUpdate=noLocationUpdate)
+            self.assertEqual(ele.filterSites(sites),
+                             set([site for site in sites if ele.passesSiteRestriction(site)]))
+
 if __name__ == '__main__':
     unittest.main()
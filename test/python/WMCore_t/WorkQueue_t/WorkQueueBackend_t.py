@@ -83,6 +83,27 @@ class WorkQueueBackendTest(unittest.TestCase):
                           'backend_test_3','backend_test_low'])
 
 
+    def testWorkflowChunks(self):
+        """Work for a list of workflows is queried in parallel chunks"""
+        elements = [WorkQueueElement(RequestName = 'backend_test_%d' % i,
+                                     WMSpec = self.processingSpec,
+                                     Status = 'Available',
+                                     Jobs = 10, Priority = i) for i in range(5)]
+        self.backend.insertElements(elements)
+        wfs = ['backend_test_%d' % i for i in range(5)] + ['backend_test_other']
+        work = self.backend.availableWork({'place' : 1000}, {}, wfs = wfs)
+        self.assertEqual([x['RequestName'] for x in work[0]],
+                         ['backend_test_%d' % i for i in range(4, -1, -1)])
+
+        options = {'include_docs' : True, 'descending' : True, 'resources' : {'place' : 1000}}
+        results = []
+        for queryThreads in [1, 3]:
+            self.backend.queryThreads = queryThreads
+            results.append(self.backend.availableByPriorityForWorkflows(options, wfs, chunkSize = 2))
+        self.assertEqual(len(results[0]), 5)
+        self.assertEqual(results[0], results[1])
+
+
     def testDuplicateInsertion(self):
         """Try to insert elements multiple times"""
         element1 = CouchWorkQueueElement(self.couch_db,
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+    WorkQueueMatcher unit tests
+"""
+from __future__ import (print_function, division)
+
+import copy
+import json
+import os
+import random
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.WMBase import getTestBase
+from WMCore.WorkQueue.DataStructs.WorkQueueElement import WorkQueueElement
+from WMCore.WorkQueue.WorkQueueMatcher import WorkQueueMatcher
+
+
+def matchElementsBySite(elements, thresholds, siteJobCounts, sites):
+    """
+    Former matching in WorkQueueBackend.availableWork, trying the sites
+    in the given order for each element.
+    """
+    matched = []
+    sortedElements = sorted(elements, key=lambda element: element['CreationTime'])
+    sortedElements.sort(key=lambda x: x['Priority'], reverse=True)
+    for element in sortedElements:
+        prio = element['Priority']
+        possibleSite = None
+        for site in sites:
+            if element.passesSiteRestriction(site):
+                curJobCount = sum(map(lambda x: x[1] if x[0] >= prio else 0, siteJobCounts.get(site, {}).items()))
+                if curJobCount < thresholds[site]:
+                    possibleSite = site
+                    break
+        if possibleSite:
+            matched.append((element, possibleSite))
+            siteJobCounts.setdefault(possibleSite, {})
+            siteJobCounts[possibleSite][prio] = siteJobCounts[possibleSite].setdefault(prio, 0) + \
+                                                element['Jobs'] * element.get('blowupFactor', 1.0)
+    return matched
+
+
+class WorkQueueMatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        filePath = os.path.join(getTestBase(),
+                                "WMCore_t/WorkQueue_t/DataStructs_t/wq_available_elements.json")
+        with open(filePath, "r") as f:
+            self.gqElements = [WorkQueueElement(**ele) for ele in json.load(f)]
+
+        # the sites of the snapshot and a few hundred more, with jobs
+        # already running at the snapshot priorities
+        sites = set()
+        for element in self.gqElements:
+            sites.update(element['SiteWhitelist'])
+        sites.update(["T2_XX_Site%d" % i for i in range(500)])
+        priorities = sorted(set([ele['Priority'] for ele in self.gqElements])) + [0, 200000]
+        rand = random.Random(1234)
+        self.thresholds = dict([(site, rand.randint(0, 5000)) for site in sites])
+        self.siteJobCounts = dict([(site, dict([(prio, rand.randint(0, 1000)) for prio in rand.sample(priorities, 3)]))
+                                   for site in sites])
+
+    def testMatchElements(self):
+        """Same matches as the former availableWork matching"""
+        sites = sorted(self.thresholds)
+        for thresholds in [self.thresholds, dict([(site, 10 ** 9) for site in sites]),
+                           dict([(site, 0) for site in sites])]:
+            siteJobCounts = copy.deepcopy(self.siteJobCounts)
+            expected = matchElementsBySite(self.gqElements, thresholds, siteJobCounts, sites)
+
+            matcherJobCounts = copy.deepcopy(self.siteJobCounts)
+            matcher = WorkQueueMatcher(thresholds, matcherJobCounts)
+            # the former matching tried the sites in a random order
+            results = matcher.matchElements(self.gqElements, chooseSite=min)
+            self.assertEqual(len(results), len(self.gqElements))
+            matched = [(element, site) for element, site in results if site]
+            self.assertEqual([(x.id, site) for x, site in matched], [(x.id, site) for x, site in expected])
+            self.assertEqual(matcherJobCounts, siteJobCounts)
+
+        self.assertTrue(len(matchElementsBySite(self.gqElements, self.thresholds, {}, sites)) > 0)
+
+    def testRandomSite(self):
+        """Matched elements never go over the site thresholds"""
+        thresholds = {'T1_UK_RAL': 1000, 'T1_US_FNAL': 1000}
+        elements = [WorkQueueElement(RequestName='test%d' % i, Jobs=100, Priority=1, CreationTime=i,
+                                     SiteWhitelist=['T1_UK_RAL', 'T1_US_FNAL']) for i in range(30)]
+        siteJobCounts = {'T1_UK_RAL': {2: 500}}
+        results = WorkQueueMatcher(thresholds, siteJobCounts).matchElements(elements)
+        self.assertEqual(len([site for _, site in results if site]), 15)
+        self.assertEqual(siteJobCounts, {'T1_UK_RAL': {2: 500, 1: 500}, 'T1_US_FNAL': {1: 1000}})
+
+    @attr('performance')
+    def testBenchmark(self):
+        """Time the former and the new matching on the elements snapshot"""
+        sites = list(self.thresholds)
+
+        startTime = time.time()
+        for _ in range(3):
+            random.shuffle(sites)
+            matchElementsBySite(self.gqElements, self.thresholds, copy.deepcopy(self.siteJobCounts), sites)
+        formerTime = (time.time() - startTime) / 3
+
+        startTime = time.time()
+        for _ in range(3):
+            WorkQueueMatcher(self.thresholds, copy.deepcopy(self.siteJobCounts)).matchElements(self.gqElements)
+        matcherTime = (time.time() - startTime) / 3
+
+        print("Matched %d elements to %d sites: %.3f seconds before, %.3f seconds with WorkQueueMatcher" %
+              (len(self.gqElements), len(sites), formerTime, matcherTime))
+
+
+if __name__ == '__main__':
+    unittest.main()